@@ -0,0 +1,23 @@
+"""
+Gunicorn config of the ASGI deployment profile, the `web` entry of the
+Procfile becomes:
+
+    web: gunicorn condominios.asgi:application -c condominios/gunicorn_asgi.py
+
+Every worker is an uvicorn event loop; the async views (`/v1/async/...`)
+wait on the database in a pool of ASYNC_DATABASE_WORKERS threads instead
+of blocking the worker. The sync views keep working, one at a time per
+worker, so keep the WSGI profile of the Procfile for sync-heavy traffic.
+"""
+
+# Python
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = 'uvicorn.workers.UvicornWorker'
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = 5
+accesslog = '-'
+errorlog = '-'
@@ -10,8 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 import os
+import tempfile
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -53,7 +54,7 @@ STATIC_ROOT = os.path.join(PROJECT_DIR, 'static')
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'gestion_condominios.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAdminUser',
@@ -68,6 +69,9 @@ REST_FRAMEWORK = {
 
 
 MIDDLEWARE = [
+    'gestion_condominios.middleware.PerformanceMiddleware',
+    'gestion_condominios.middleware.CompressionMiddleware',
+    'gestion_condominios.middleware.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,6 +80,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'gestion_condominios.middleware.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'condominios.urls'
@@ -109,10 +114,55 @@ DATABASES = {
         'USER': config('RDS_USERNAME'),
         'PASSWORD': config('RDS_PASSWORD'),
         'HOST': config('RDS_HOSTNAME'),
-        'PORT': config('RDS_PORT')
+        'PORT': config('RDS_PORT'),
+        # Persistent connections, pinged at the start of every request
+        # (gestion_condominios.routers.close_unusable_connections).
+        'CONN_MAX_AGE': config('CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config('CONN_HEALTH_CHECKS', default=True, cast=bool),
     }
 }
 
+# Read replicas, comma separated hosts with the credentials of the primary.
+# The tests read them from the test database of the primary.
+DATABASE_REPLICAS = []
+for number, host in enumerate(config('RDS_REPLICA_HOSTNAMES', default='', cast=Csv()), start=1):
+    DATABASES[f'replica{number}'] = dict(DATABASES['default'], HOST=host, TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['gestion_condominios.routers.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# With several gunicorn workers use a shared backend (e.g. memcached), so the
+# invalidations of one worker reach the others. The token cache and the response
+# cache are only enabled with SHARED_CACHE.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
+# Whether every worker process uses the same cache (memcached, Redis). The signals
+# invalidate the cached tokens and responses in the cache of the process that made
+# the change only: with the memory of each process CachedTokenAuthentication and
+# CachedResponseMixin don't cache, or a deactivated user would stay authenticated
+# and the other workers would serve stale responses (and 304s) until the timeout.
+SHARED_CACHE = config('SHARED_CACHE', default='locmem' not in CACHES['default']['BACKEND'], cast=bool)
+
+# Seconds a token stays cached by CachedTokenAuthentication.
+AUTH_TOKEN_CACHE_TIMEOUT = 300
+
+# Seconds a response stays in the response cache, writes invalidate it before.
+RESPONSE_CACHE_TIMEOUT = 600
+
+# Compression of the responses (gestion_condominios.compression), brotli needs the `brotli` module.
+COMPRESSION_MIN_BYTES = config('COMPRESSION_MIN_BYTES', default=1024, cast=int)
+COMPRESSION_GZIP_LEVEL = config('COMPRESSION_GZIP_LEVEL', default=6, cast=int)
+COMPRESSION_BROTLI_QUALITY = config('COMPRESSION_BROTLI_QUALITY', default=5, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -134,6 +184,55 @@ AUTH_PASSWORD_VALIDATORS = [
 
 PASSWORD_RESET_TIMEOUT_DAYS = 2
 
+# Threads used to hash passwords in bulk operations and by the async views.
+PASSWORD_HASHING_WORKERS = config('PASSWORD_HASHING_WORKERS', default=4, cast=int)
+
+# Threads of every ASGI worker running the queries of the async read views.
+ASYNC_DATABASE_WORKERS = config('ASYNC_DATABASE_WORKERS', default=10, cast=int)
+
+# Performance logs (gestion_condominios.middleware.PerformanceMiddleware): the requests slower
+# than PERFORMANCE_SLOW_REQUEST_MS as warnings, every request with PERFORMANCE_LOG_LEVEL=INFO.
+PERFORMANCE_SLOW_REQUEST_MS = config('PERFORMANCE_SLOW_REQUEST_MS', default=500, cast=int)
+PERFORMANCE_SLOW_SAMPLE_RATE = config('PERFORMANCE_SLOW_SAMPLE_RATE', default=0.2, cast=float)
+PERFORMANCE_MAX_LOGGED_QUERIES = config('PERFORMANCE_MAX_LOGGED_QUERIES', default=100, cast=int)
+
+# Request metrics of every worker process (gestion_condominios.metrics), one file by process.
+METRICS_DIR = config('METRICS_DIR', default=os.path.join(tempfile.gettempdir(), 'condominios-metrics'))
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5, cast=float)
+
+# Capture of the slow queries (gestion_condominios.slow_queries), 0 disables it.
+SLOW_QUERY_THRESHOLD_MS = config('SLOW_QUERY_THRESHOLD_MS', default=0, cast=float)
+SLOW_QUERY_LOG_SIZE = config('SLOW_QUERY_LOG_SIZE', default=200, cast=int)
+SLOW_QUERY_MAX_FINGERPRINTS = config('SLOW_QUERY_MAX_FINGERPRINTS', default=200, cast=int)
+
+# Delta sync (gestion_condominios.sync): seconds of rows sent again to cover the late
+# commits and the replica lag, and days the deleted rows are remembered.
+SYNC_SAFETY_MARGIN = config('SYNC_SAFETY_MARGIN', default=30, cast=int)
+SYNC_TOMBSTONE_RETENTION_DAYS = config('SYNC_TOMBSTONE_RETENTION_DAYS', default=30, cast=int)
+
+# Requests of a batch (gestion_condominios.batch).
+BATCH_MAX_REQUESTS = config('BATCH_MAX_REQUESTS', default=20, cast=int)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'gestion_condominios.performance': {
+            'handlers': ['console'],
+            'level': config('PERFORMANCE_LOG_LEVEL', default='WARNING'),
+            'propagate': False,
+        },
+        'gestion_condominios.slow_queries': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.1/topics/i18n/
@@ -159,4 +258,9 @@ EMAIL_HOST_USER = 'condominios.proyecto@gmail.com'
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 EMAL_PORT = 587
 
+# Outbox of the emails sent by the `send_queued_emails` worker.
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 60 # seconds, doubled on every failed attempt
+EMAIL_OUTBOX_LEASE = 300 # seconds the claimed emails wait for their worker before another one takes them
+
 STATIC_URL = '/static/'
@@ -6,4 +6,6 @@ admin.site.register(Department)
 admin.site.register(ProfileHabitant)
 admin.site.register(Comment)
 admin.site.register(FinancialStat)
-admin.site.register(PriorityOrUpgrade)
\ No newline at end of file
+admin.site.register(PriorityOrUpgrade)
+admin.site.register(QueuedEmail)
+admin.site.register(FinancialSummary)
\ No newline at end of file
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class GestionCondominiosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'gestion_condominios'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,199 @@
+"""
+Async views for the ASGI server.
+
+The event loop never hashes a password or waits on the database: that work
+runs in the bounded pool of `hashing`, so a burst of logins queues in the
+pool instead of blocking every worker. The read views run the DRF views
+in the database pool, Django 3.2 has no async ORM.
+
+Under ASGI Django runs every sync view on one thread per worker, the
+async views let a worker wait on ASYNC_DATABASE_WORKERS queries at once.
+"""
+
+# Python
+import asyncio
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# Django
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.contrib.auth.models import User
+
+# Django REST Framework
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+
+# Serializers
+from .serializers import ChangePasswordSerializer, UserBaseModelSerializer, UserLoginSerializer
+
+# Authentication
+from .authentication import CachedTokenAuthentication
+
+# Views
+from .views import (
+    NamesCondominiumsAPIView, CondominiumAPIView, GetPriorityOrUpgradeAPIView, FinancialStatusRetriveAPIView,
+)
+
+# Hashing
+from .hashing import executor
+
+# Instrumentation
+from .instrumentation import timing
+
+# Every thread keeps its own database connection, the size of the pool
+# bounds the connections of a worker.
+database_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DATABASE_WORKERS,
+    thread_name_prefix='async-database',
+)
+
+
+def _call(function, *args):
+    try:
+        return function(*args)
+    finally:
+        # The pool threads keep their own database connections.
+        close_old_connections()
+
+
+async def run_in_pool(function, *args, pool=executor):
+    """ Run blocking code (password hashing, ORM) in a pool, the hashing pool by default. """
+    loop = asyncio.get_running_loop()
+    # The context has the database routing of the request.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(pool, partial(context.run, _call, function, *args))
+
+
+def json_response(data, status_code=status.HTTP_200_OK, headers=None):
+    """ Same body as the DRF views with JSONRenderer. """
+    response = HttpResponse(JSONRenderer().render(data), status=status_code, content_type='application/json')
+    for header, value in (headers or {}).items():
+        response[header] = value
+    return response
+
+
+def method_not_allowed(request):
+    return json_response(
+        {'detail': f'Method "{request.method}" not allowed.'},
+        status.HTTP_405_METHOD_NOT_ALLOWED,
+    )
+
+
+def parse_json(request):
+    try:
+        return json.loads(request.body or b'{}'), None
+    except ValueError as error:
+        return None, json_response({'detail': f'JSON parse error - {error}'}, status.HTTP_400_BAD_REQUEST)
+
+
+def authenticate_token(request):
+    """ User of the `Authorization: Token <key>` header, None if it is missing. """
+    credentials = CachedTokenAuthentication().authenticate(request)
+    return credentials[0] if credentials else None
+
+
+def not_authenticated(detail='Authentication credentials were not provided.'):
+    return json_response(
+        {'detail': str(detail)},
+        status.HTTP_401_UNAUTHORIZED,
+        {'WWW-Authenticate': CachedTokenAuthentication().authenticate_header(None)},
+    )
+
+
+def _login(data):
+    serializer = UserLoginSerializer(data=data)
+    if not serializer.is_valid():
+        return serializer.errors, status.HTTP_400_BAD_REQUEST
+    user, token = serializer.save()
+    return {'token': token, 'user': UserBaseModelSerializer(user).data}, status.HTTP_200_OK
+
+
+async def login(request):
+    """ Async version of `login/`. """
+    if request.method != 'POST':
+        return method_not_allowed(request)
+    data, error = parse_json(request)
+    if error:
+        return error
+    data, status_code = await run_in_pool(_login, data)
+    return json_response(data, status_code)
+
+
+def _update_password(request, pk, data):
+    try:
+        if authenticate_token(request) is None:
+            return None, status.HTTP_401_UNAUTHORIZED
+    except AuthenticationFailed as error:
+        return error.detail, status.HTTP_401_UNAUTHORIZED
+    try:
+        user = User.objects.get(pk=pk)
+    except User.DoesNotExist:
+        return {'detail': 'Not found.'}, status.HTTP_404_NOT_FOUND
+
+    serializer = ChangePasswordSerializer(data=data)
+    if not serializer.is_valid():
+        return serializer.errors, status.HTTP_400_BAD_REQUEST
+    if not user.check_password(serializer.data.get('old_password')):
+        return {'old_password': ['Wrong password.']}, status.HTTP_400_BAD_REQUEST
+    user.set_password(serializer.data.get('new_password'))
+    user.save()
+    return 'Password change successfully', status.HTTP_200_OK
+
+
+async def update_password(request, pk):
+    """ Async version of `update/<pk>/`. """
+    if request.method not in ('PUT', 'PATCH'):
+        return method_not_allowed(request)
+    data, error = parse_json(request)
+    if error:
+        return error
+    data, status_code = await run_in_pool(_update_password, request, pk, data)
+    if status_code == status.HTTP_401_UNAUTHORIZED:
+        return not_authenticated(*([data] if data else []))
+    return json_response(data, status_code)
+
+
+def _dispatch(view, request, args, kwargs):
+    response = view(request, *args, **kwargs)
+    # Render in the pool, Django would render it on the thread of the sync views.
+    if hasattr(response, 'render'):
+        with timing('render_time'):
+            response.render()
+    return response
+
+
+def async_read_view(view_class):
+    """
+    Async version of a read-only DRF view.
+
+    The whole view (authentication, permissions, response cache, queries
+    and rendering) runs in the database pool, so the response is the one
+    of the sync view.
+    """
+    view = view_class.as_view()
+
+    async def read_view(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            return method_not_allowed(request)
+        return await run_in_pool(_dispatch, view, request, args, kwargs, pool=database_executor)
+
+    read_view.__doc__ = f'Async version of {view_class.__name__}.'
+    read_view.csrf_exempt = True
+    return read_view
+
+
+names_condominiums = async_read_view(NamesCondominiumsAPIView)
+condominium = async_read_view(CondominiumAPIView)
+priority_or_upgrade = async_read_view(GetPriorityOrUpgradeAPIView)
+financial_status = async_read_view(FinancialStatusRetriveAPIView)
+
+
+# Token authentication, no CSRF cookie involved. The csrf_exempt decorator
+# would hide that these views are coroutines.
+login.csrf_exempt = True
+update_password.csrf_exempt = True
@@ -0,0 +1,37 @@
+""" Authentication classes. """
+
+# Django
+from django.conf import settings
+from django.core.cache import cache
+
+# Django REST Framework
+from rest_framework.authentication import TokenAuthentication
+
+
+def token_cache_key(key):
+    return f'auth-token:{key}'
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that keeps the token and its user in the cache.
+
+    A cache hit authenticates the request without any query. The entries
+    expire after AUTH_TOKEN_CACHE_TIMEOUT seconds and are deleted by the
+    signals when the token is deleted or the user changes (deactivation,
+    new password).
+
+    The cache is only used when SHARED_CACHE: the deletions of the signals
+    don't reach the memory of the other worker processes.
+    """
+
+    def authenticate_credentials(self, key):
+        if not settings.SHARED_CACHE:
+            return super().authenticate_credentials(key)
+        cache_key = token_cache_key(key)
+        credentials = cache.get(cache_key)
+        if credentials is None:
+            # Raises AuthenticationFailed for unknown tokens and inactive users.
+            credentials = super().authenticate_credentials(key)
+            cache.set(cache_key, credentials, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+        return credentials
@@ -0,0 +1,122 @@
+"""
+Several requests to the API in one round trip.
+
+Every sub-request is resolved against `gestion_condominios.urls` and runs
+its view in the process, as the user authenticated by the batch request:
+no token lookup nor middleware again, the same database connection and
+the same per-request state. The sub-requests run in order and aren't
+atomic, a failed one doesn't stop the next ones.
+
+The reads of the safe sub-requests go to the read replica of their own
+until a sub-request writes; the following ones read from the primary.
+"""
+
+# Python
+import asyncio
+import io
+import json
+from urllib.parse import urlsplit
+
+# Django
+from django.core.handlers.exception import response_for_exception
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve, reverse
+
+# Asgiref
+from asgiref.sync import async_to_sync
+
+# Routers
+from .routers import end_request, start_request
+
+# Instrumentation
+from .instrumentation import timing
+
+BODY_HEADERS = ('Content-Type', 'ETag', 'Cache-Control', 'Location')
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def sub_request(request, method, path, body, match):
+    """ Django request of a sub-request, authenticated as the batch request. """
+    url = urlsplit(path)
+    data = b'' if body is None else json.dumps(body).encode()
+    sub = HttpRequest()
+    sub.method = method
+    sub.path = sub.path_info = url.path
+    sub.META = {key: value for key, value in request.META.items() if not key.startswith(('CONTENT_', 'HTTP_IF_'))}
+    sub.META.update(
+        REQUEST_METHOD=method, PATH_INFO=url.path, QUERY_STRING=url.query,
+        CONTENT_TYPE='application/json', CONTENT_LENGTH=str(len(data)),
+    )
+    sub.GET = QueryDict(url.query)
+    sub.COOKIES = request.COOKIES
+    sub._stream = io.BytesIO(data)
+    sub._read_started = False
+    sub.resolver_match = match
+    # The DRF Request of the view authenticates a request with these
+    # attributes with ForcedAuthentication (the hook of APIRequestFactory),
+    # skipping its authenticators. They are private to DRF: check them on
+    # every upgrade of djangorestframework (pinned to 3.12.4).
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    return sub
+
+
+def envelope_entry(response, method):
+    """ JSON of a sub-response, the JSON bodies are embedded without parsing them again. """
+    if response.streaming:
+        # A HEAD doesn't read the streamed list, nor run its queries.
+        content = b''.join(response.streaming_content) if method != 'HEAD' else b''
+        response.close()
+    else:
+        if hasattr(response, 'render') and not response.is_rendered:
+            with timing('render_time'):
+                response.render()
+        content = response.content if method != 'HEAD' else b''
+    headers = {name: response[name] for name in BODY_HEADERS if response.has_header(name)}
+    if not content:
+        body = b'null'
+    elif response.get('Content-Type', '').startswith('application/json'):
+        body = content
+    else:
+        body = json.dumps(content.decode(response.charset, 'replace')).encode()
+    return b'{"status":%d,"headers":%s,"body":%s}' % (response.status_code, json.dumps(headers).encode(), body)
+
+
+def error_entry(status_code, detail):
+    return json.dumps({'status': status_code, 'headers': {}, 'body': {'detail': detail}}).encode()
+
+
+def run(request, sub_requests):
+    """ Run the sub-requests (dicts of method, path and body), returns the JSON of the batch response. """
+    prefix = reverse('show-api')
+    entries = []
+    wrote = False
+    for item in sub_requests:
+        method, path = item['method'], item['path']
+        # The paths may omit the prefix of the API.
+        path = path if path.startswith(prefix) else prefix + path.lstrip('/')
+        try:
+            match = resolve(urlsplit(path).path[len(prefix) - 1:], urlconf='gestion_condominios.urls')
+        except Resolver404:
+            entries.append(error_entry(404, f'No route for {path}.'))
+            continue
+        if match.url_name == 'batch':
+            entries.append(error_entry(400, 'A batch can\'t contain another batch.'))
+            continue
+
+        sub = sub_request(request, method, path, item.get('body'), match)
+        wrote = wrote or method not in SAFE_METHODS
+        token = start_request(read_only=not wrote)
+        try:
+            try:
+                if asyncio.iscoroutinefunction(match.func):
+                    response = async_to_sync(match.func)(sub, *match.args, **match.kwargs)
+                else:
+                    response = match.func(sub, *match.args, **match.kwargs)
+            except Exception as exc:
+                response = response_for_exception(sub, exc)
+            # The streamed lists run their queries while they are read.
+            entries.append(envelope_entry(response, method))
+        finally:
+            end_request(token)
+    return b'{"responses":[' + b','.join(entries) + b']}'
@@ -0,0 +1,87 @@
+""" Helpers of the benchmark management commands (`bench_*`). """
+
+# Python
+import json
+import statistics
+import threading
+from contextlib import contextmanager
+
+# Django
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+
+@contextmanager
+def benchmark_database(verbosity=0):
+    """
+    Run the benchmark on a throwaway test database, like the test runner.
+
+    The configured database is never written; with SQLite the test
+    database lives in memory.
+    """
+    setup_test_environment(debug=False)
+    old_config = setup_databases(verbosity, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity)
+        teardown_test_environment()
+
+
+class QueryCounter:
+    """
+    Count the queries of every connection of every thread.
+
+    CaptureQueriesContext only sees the connection of the current thread,
+    the async views query from the threads of their pools.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def add_to(self, sender=None, connection=None, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    @contextmanager
+    def installed(self):
+        connection_created.connect(self.add_to)
+        for connection in connections.all():
+            self.add_to(connection=connection)
+        try:
+            yield self
+        finally:
+            connection_created.disconnect(self.add_to)
+
+
+def percentile(values, fraction):
+    """ Nearest-rank percentile of a list of numbers. """
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies):
+    """ p50, p95 and mean of latencies in seconds, reported in milliseconds. """
+    return {
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+    }
+
+
+def write_results(path, results):
+    """ Write the results as JSON so they can be compared between commits. """
+    with open(path, 'w') as output:
+        json.dump(results, output, indent=2, sort_keys=True)
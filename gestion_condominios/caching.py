@@ -0,0 +1,118 @@
+"""
+Response cache with ETags for the read endpoints.
+
+Every cached object has a generation in the cache and the responses are
+stored under it, so the signals invalidate every variant of a response
+(query parameters included) by replacing the generation.
+"""
+
+# Python
+import hashlib
+import uuid
+
+# Django
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags, quote_etag
+
+# Django REST Framework
+from rest_framework import status
+from rest_framework.response import Response
+
+# Routers
+from .routers import use_primary
+
+
+def generation_key(scope, object_id=None):
+    return f'response-generation:{scope}:{object_id}'
+
+
+def invalidate(scope, *object_ids):
+    """ Drop the cached responses of the objects, or of the whole scope without ids. """
+    keys = [generation_key(scope, object_id) for object_id in object_ids or [None]]
+    cache.delete_many(keys)
+
+
+def get_generation(scope, object_id=None):
+    key = generation_key(scope, object_id)
+    generation = cache.get(key)
+    if generation is None:
+        # add() keeps the generation of a concurrent request.
+        cache.add(key, uuid.uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def build_etag(*parts):
+    return quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def etag_matches(request, etag):
+    # Weak comparison: the compressed responses have the weak version of the ETag.
+    if_none_match = [
+        value[2:] if value.startswith('W/') else value
+        for value in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    ]
+    return etag in if_none_match or '*' in if_none_match
+
+
+class CachedResponseMixin:
+    """
+    Cache the data of GET responses and answer a matching `If-None-Match` with a 304.
+
+    A cache hit runs neither the serializers nor a query (with the cached
+    token authentication). `get_etag_parts()` returns the `updated_at`
+    values (and counts) the response is built from. The response carries
+    its cache key for the compressed bytes of `CompressionMiddleware`.
+
+    A cache miss reads from the primary: a replica behind it would fill
+    the cache with the data from before a write, until the timeout.
+
+    Without SHARED_CACHE nothing is cached, the new generations of the
+    signals wouldn't reach the other worker processes: the ETag is built
+    from the current data on every request and still answers the 304s.
+    """
+    cache_scope = None
+
+    def get_cache_object_id(self):
+        return self.kwargs.get('pk')
+
+    def get_etag_parts(self):
+        raise NotImplementedError('`get_etag_parts()` must be implemented.')
+
+    def get(self, request, *args, **kwargs):
+        path = request.get_full_path()
+        if not settings.SHARED_CACHE:
+            etag = build_etag(path, self.get_etag_parts())
+            if etag_matches(request, etag):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+            response = super().get(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                response['ETag'] = etag
+            return response
+
+        object_id = self.get_cache_object_id()
+        key = 'response:{}:{}:{}:{}'.format(
+            self.cache_scope,
+            object_id,
+            get_generation(self.cache_scope, object_id),
+            hashlib.md5(path.encode()).hexdigest(),
+        )
+        entry = cache.get(key)
+        if entry is None:
+            use_primary()
+            # The ETag is read before the data: a concurrent write gives a
+            # new generation, never fresh data under an old ETag.
+            etag = build_etag(path, self.get_etag_parts())
+            response = super().get(request, *args, **kwargs)
+            if not isinstance(response, Response) or response.status_code != status.HTTP_200_OK:
+                return response
+            entry = (etag, response.data)
+            cache.set(key, entry, settings.RESPONSE_CACHE_TIMEOUT)
+
+        etag, data = entry
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        response = Response(data, headers={'ETag': etag})
+        response.response_cache_key = key
+        return response
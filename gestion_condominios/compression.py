@@ -0,0 +1,91 @@
+"""
+Compression of the responses negotiated with `Accept-Encoding`, by `CompressionMiddleware`.
+
+Brotli is used when the `brotli` module is installed and the client
+accepts it, gzip otherwise. Responses under COMPRESSION_MIN_BYTES aren't
+compressed, the streamed lists always are. The ETag of a compressed
+response becomes weak: the bytes differ, the data is the same.
+
+The responses of the response cache (`caching`) carry their cache key;
+their compressed bytes are stored next to them, so a cache hit isn't
+compressed again.
+"""
+
+# Python
+import gzip
+import zlib
+
+# Django
+from django.conf import settings
+from django.core.cache import cache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+
+def accepted_encoding(header):
+    """ Best encoding of `Accept-Encoding` we support, None for identity. """
+    weights = {}
+    for part in header.split(','):
+        name, _, parameters = part.partition(';')
+        weight = 1.0
+        for parameter in parameters.split(';'):
+            key, _, value = parameter.strip().partition('=')
+            if key == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if name.strip():
+            weights[name.strip().lower()] = weight
+    # Ties go to the first one, the smallest output.
+    supported = ('br', 'gzip') if brotli else ('gzip',)
+    weight, _, encoding = max(
+        (weights.get(encoding, weights.get('*', 0.0)), -index, encoding) for index, encoding in enumerate(supported)
+    )
+    return encoding if weight > 0 else None
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    # No timestamp in the header: the same content gives the same bytes.
+    return gzip.compress(content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def compress_stream(chunks, encoding):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        for chunk in chunks:
+            yield compressor.process(chunk)
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def compressed_content(response, encoding):
+    """ Compressed content of the response, from the cache for the responses of the response cache. """
+    key = getattr(response, 'response_cache_key', None)
+    if key is None:
+        return compress(response.content, encoding)
+    key = f'{key}:{encoding}'
+    content = cache.get(key)
+    if content is None:
+        content = compress(response.content, encoding)
+        cache.set(key, content, settings.RESPONSE_CACHE_TIMEOUT)
+    return content
+
+
+def weaken_etag(response):
+    etag = response.get('ETag')
+    if etag and not etag.startswith('W/'):
+        response['ETag'] = f'W/{etag}'
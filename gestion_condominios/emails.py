@@ -0,0 +1,132 @@
+""" Email outbox: emails are queued in the database and sent by a worker. """
+
+# Python
+from datetime import timedelta
+
+# Django
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection, transaction
+from django.template.loader import get_template
+from django.utils import timezone
+
+# Models
+from .models import QueuedEmail
+
+
+def build_queued_email(email, subject, template_path, context):
+    """ Render the template into an unsaved QueuedEmail. """
+    return QueuedEmail(
+        to_email=email,
+        subject=subject,
+        html_body=get_template(template_path).render(context),
+    )
+
+
+def queue_email(email, subject, template_path, context):
+    """ Store the email in the outbox, it is sent once the transaction commits. """
+    queued_email = build_queued_email(email, subject, template_path, context)
+    queued_email.save()
+    return queued_email
+
+
+def queue_emails(emails):
+    """ Store a batch of emails, `emails` are the arguments of `queue_email`. """
+    return QueuedEmail.objects.bulk_create(
+        build_queued_email(*email) for email in emails
+    )
+
+
+def to_message(queued_email):
+    """ Build the message of a QueuedEmail. """
+    mail = EmailMultiAlternatives(
+        subject=queued_email.subject,
+        body='',
+        from_email=settings.EMAIL_HOST_USER,
+        to=[queued_email.to_email]
+    )
+    mail.attach_alternative(queued_email.html_body, 'text/html')
+    return mail
+
+
+def retry_delay(attempts):
+    """ Exponential backoff: the base delay doubles on every failed attempt. """
+    return timedelta(seconds=settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def claim_queued_emails(batch_size):
+    """
+    Lease the pending emails that are due to this worker.
+
+    Their next attempt moves EMAIL_OUTBOX_LEASE seconds ahead, in a short
+    transaction, so the other workers skip them while they are sent; the
+    emails of a worker that dies are sent by another one after the lease.
+    """
+    with transaction.atomic():
+        queued_emails = list(
+            QueuedEmail.objects
+            .select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+            .filter(status=QueuedEmail.PENDING, next_attempt_at__lte=timezone.now())
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        QueuedEmail.objects.filter(pk__in=[queued_email.pk for queued_email in queued_emails]).update(
+            next_attempt_at=timezone.now() + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE),
+        )
+    return queued_emails
+
+
+def record_failure(queued_email, error):
+    """ Count the failed attempt: the email is retried with backoff, until EMAIL_OUTBOX_MAX_ATTEMPTS. """
+    queued_email.attempts += 1
+    queued_email.last_error = repr(error)
+    if queued_email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        queued_email.status = QueuedEmail.FAILED
+    else:
+        queued_email.next_attempt_at = timezone.now() + retry_delay(queued_email.attempts)
+    queued_email.save()
+
+
+def send_queued_emails(batch_size=50):
+    """
+    Send the pending emails that are due, reusing one connection for all of them.
+
+    The emails are claimed first (`claim_queued_emails`) so several workers
+    can run at the same time, and no transaction is open while the mail
+    server answers: every email is marked as soon as it is sent. Failed
+    emails are retried with backoff until EMAIL_OUTBOX_MAX_ATTEMPTS is
+    reached. Returns the number of sent and failed emails.
+    """
+    sent = failed = 0
+    queued_emails = claim_queued_emails(batch_size)
+    if not queued_emails:
+        return sent, failed
+
+    mail_connection = get_connection(fail_silently=False)
+    try:
+        try:
+            mail_connection.open()
+        except Exception as error:
+            # The mail server is down: every claimed email failed an attempt.
+            for queued_email in queued_emails:
+                record_failure(queued_email, error)
+            return sent, len(queued_emails)
+        for queued_email in queued_emails:
+            try:
+                mail_connection.send_messages([to_message(queued_email)])
+            except Exception as error:
+                failed += 1
+                record_failure(queued_email, error)
+                # A broken connection is opened again by the next send_messages().
+                mail_connection.close()
+            else:
+                sent += 1
+                queued_email.attempts += 1
+                queued_email.status = QueuedEmail.SENT
+                queued_email.sent_at = timezone.now()
+                queued_email.last_error = ''
+                # The body has the temporary password of the user.
+                queued_email.html_body = ''
+                queued_email.save()
+    finally:
+        mail_connection.close()
+    return sent, failed
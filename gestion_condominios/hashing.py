@@ -0,0 +1,20 @@
+""" Password hashing in a bounded thread pool. """
+
+# Python
+from concurrent.futures import ThreadPoolExecutor
+
+# Django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+# hashlib releases the GIL while it hashes, so the threads of the pool run
+# in parallel and the pool size bounds the CPU used by hashing.
+executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASHING_WORKERS,
+    thread_name_prefix='password-hashing',
+)
+
+
+def hash_passwords(passwords):
+    """ Hash the passwords in parallel, keeping their order. """
+    return list(executor.map(make_password, passwords))
@@ -0,0 +1,102 @@
+"""
+Per-request performance metrics.
+
+`PerformanceMiddleware` puts a `RequestMetrics` in the context of the
+request. The queries of every connection (including the threads of the
+async pools, which run a copy of the context) are added to it, and the
+middleware times the view and the rendering of its DRF response: the
+time of the view outside its queries is spent serializing. Serializing
+and rendering exclude the queries they run, those count as database
+time. The responses rendered by the view itself (async views, batches)
+use `timing('render_time')`.
+
+Outside a request the hooks only read the context variable.
+"""
+
+# Python
+import contextlib
+import contextvars
+import time
+
+# Django
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+class RequestMetrics:
+    """ Counters of a request, times in seconds. """
+
+    def __init__(self, max_queries=100):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+        # The first `max_queries` queries (sql, seconds), logged for the slow requests.
+        self.query_log = []
+        self.max_queries = max_queries
+        self._view = None
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.db_time += duration
+        if len(self.query_log) < self.max_queries:
+            self.query_log.append((sql, duration))
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    def start_view(self):
+        self._view = (time.perf_counter(), self.db_time, self.render_time)
+
+    def finish_view(self):
+        """ Add the time of the view since `start_view()`, without its queries and rendering, to serializing. """
+        if self._view is None:
+            return
+        start, db_time, render_time = self._view
+        self._view = None
+        elapsed = time.perf_counter() - start - (self.db_time - db_time) - (self.render_time - render_time)
+        self.serialize_time += elapsed
+
+
+current_metrics = contextvars.ContextVar('current_metrics', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """ Execute wrapper of every connection, adds the query to the metrics of the request. """
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - start)
+
+
+def add_query_recorder(sender=None, connection=None, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextlib.contextmanager
+def timing(attribute):
+    """ Add the time of the block (without its queries) to `attribute` of the metrics of the request. """
+    metrics = current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    start, db_time = time.perf_counter(), metrics.db_time
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start - (metrics.db_time - db_time)
+        setattr(metrics, attribute, getattr(metrics, attribute) + elapsed)
+
+
+def install():
+    """ Hook the metrics into the database connections, once. """
+    connection_created.connect(add_query_recorder)
+    for connection in connections.all():
+        add_query_recorder(connection=connection)
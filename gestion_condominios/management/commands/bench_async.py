@@ -0,0 +1,126 @@
+""" Benchmark of the async read views against the sync views on one ASGI worker. """
+
+# Python
+import asyncio
+import time
+
+# Django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+
+# Django REST Framework
+from rest_framework.authtoken.models import Token
+
+# Models
+from gestion_condominios.models import Condominium, PriorityOrUpgrade
+
+# Benchmarks
+from gestion_condominios.benchmarks import benchmark_database, summarize, write_results
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the throughput of the read endpoints served by one ASGI worker with the sync '
+        'views (one thread) and the async views (the database pool), on a test database with '
+        'a simulated database latency. Fails when the async views are not --min-speedup times '
+        'faster.'
+    )
+
+    endpoints = ('list-names', 'condominium', 'get-priority-or-update', 'financial-status-retrive')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument(
+            '--latency-ms', type=float, default=5,
+            help='Added to every query, like the round trip to a remote MySQL.',
+        )
+        parser.add_argument(
+            '--min-speedup', type=float, default=1.5,
+            help='Minimum ratio of the async to the sync throughput, 0 to only report it.',
+        )
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        self.latency = options['latency_ms'] / 1000
+        # Without the response cache every request reaches the database.
+        dummy_cache = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        with benchmark_database(), override_settings(CACHES=dummy_cache):
+            token = self.populate()
+            self.add_latency()
+            results = {'concurrency': options['concurrency'], 'latency_ms': options['latency_ms']}
+            for mode in ('sync', 'async'):
+                results[mode] = asyncio.run(
+                    self.run(self.urls(mode), token, options['requests'], options['concurrency'])
+                )
+            connection_created.disconnect(self.on_connection_created)
+
+        results['speedup'] = round(results['async']['requests_per_second'] / results['sync']['requests_per_second'], 2)
+        for mode in ('sync', 'async'):
+            result = results[mode]
+            self.stdout.write(
+                f"{mode:>5}: {result['requests_per_second']:.1f} requests/s, "
+                f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms"
+            )
+        self.stdout.write(f"speedup: x{results['speedup']}")
+        if options['output']:
+            write_results(options['output'], results)
+        # A sync-only middleware serves the async views on one thread too.
+        if results['speedup'] < options['min_speedup']:
+            raise CommandError(
+                f"The async views are only x{results['speedup']} as fast as the sync views "
+                f"(--min-speedup {options['min_speedup']})."
+            )
+
+    def populate(self):
+        condominium = Condominium.objects.create(name_condominium='benchmark')
+        self.item = PriorityOrUpgrade.objects.create(condominium_id=condominium, name='paint', detail='walls')
+        self.condominium = condominium
+        return Token.objects.create(user=User.objects.create_user('bench', password='password123')).key
+
+    def urls(self, mode):
+        prefix = 'async-' if mode == 'async' else ''
+        args = {
+            'list-names': [],
+            'condominium': [self.condominium.pk],
+            'get-priority-or-update': [self.item.pk],
+            'financial-status-retrive': [self.condominium.pk],
+        }
+        return [reverse(prefix + name, args=args[name]) for name in self.endpoints]
+
+    def delay(self, execute, sql, params, many, context):
+        time.sleep(self.latency)
+        return execute(sql, params, many, context)
+
+    def on_connection_created(self, sender, connection, **kwargs):
+        if self.delay not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self.delay)
+
+    def add_latency(self):
+        """ Delay the queries of every connection, including the ones of the pool threads. """
+        connection_created.connect(self.on_connection_created)
+        for connection in connections.all():
+            self.on_connection_created(None, connection)
+
+    async def run(self, urls, token, requests, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        client = AsyncClient()
+
+        async def get(url):
+            async with semaphore:
+                start = time.perf_counter()
+                # The AsyncClient of Django 3.2 takes the raw header names.
+                response = await client.get(url, authorization=f'Token {token}')
+                return time.perf_counter() - start, response.status_code
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(get(urls[index % len(urls)]) for index in range(requests)))
+        elapsed = time.perf_counter() - start
+        statuses = {code for _, code in results}
+        assert statuses == {200}, f'Failed requests: {statuses}'
+        latencies = [latency for latency, _ in results]
+        return dict(summarize(latencies), requests_per_second=len(latencies) / elapsed)
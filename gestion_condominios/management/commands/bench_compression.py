@@ -0,0 +1,86 @@
+""" Benchmark of the compression of the large responses. """
+
+# Python
+import statistics
+import time
+
+# Django
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+# Django REST Framework
+from rest_framework.authtoken.models import Token
+
+# Models
+from gestion_condominios.models import Condominium
+
+# Utils
+from gestion_condominios import compression, synthetic
+from gestion_condominios.benchmarks import benchmark_database, write_results
+
+
+class Command(BaseCommand):
+    help = (
+        'Request condominium-list/, financial-status/ and the cached condominium/<pk>/ on a test '
+        'database filled with synthetic data, without compression, with gzip and with brotli (when '
+        'installed), and report the bytes and the CPU milliseconds of every request.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--condominiums', type=int, default=10)
+        parser.add_argument('--departments', type=int, default=20)
+        parser.add_argument('--years', type=int, default=2)
+        parser.add_argument('--requests', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        encodings = ['identity', 'gzip'] + (['br'] if compression.brotli else [])
+        results = {'encodings': encodings, 'routes': {}}
+        with benchmark_database():
+            synthetic.generate(
+                condominiums=options['condominiums'], departments=options['departments'],
+                years=options['years'], seed=options['seed'],
+            )
+            admin = User.objects.create_user('bench-admin', password=synthetic.SYNTHETIC_PASSWORD, is_staff=True)
+            self.client = Client(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=admin).key}')
+            condominium = Condominium.objects.order_by('pk').first()
+            routes = {
+                'condominium-list': reverse('condominium-list'),
+                'financial-status': reverse('financial-status'),
+                'condominium': reverse('condominium', args=[condominium.pk]),
+            }
+            for label, url in routes.items():
+                results['routes'][label] = {
+                    encoding: self.measure(url, encoding, options['requests']) for encoding in encodings
+                }
+
+        for label, by_encoding in results['routes'].items():
+            for encoding, result in by_encoding.items():
+                cached = f"  first {result['first_cpu_ms']:>8} ms CPU" if label == 'condominium' else ''
+                self.stdout.write(
+                    f"{label:<18} {encoding:<9} {result['bytes']:>9} bytes  "
+                    f"x{result['ratio']:<6} {result['cpu_ms']:>8} ms CPU{cached}"
+                )
+        if options['output']:
+            write_results(options['output'], results)
+
+    def measure(self, url, encoding, requests):
+        """ Bytes and CPU of a request, apart from the first one that fills the cache of the compressed bytes. """
+        cache.clear()
+        identity = len(self.client.get(url).getvalue())
+        cpu_times, sizes = [], []
+        for _ in range(requests + 1):
+            start = time.process_time()
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+            sizes.append(len(response.getvalue()))
+            cpu_times.append(time.process_time() - start)
+        return {
+            'bytes': sizes[-1],
+            'ratio': round(identity / sizes[-1], 2),
+            'first_cpu_ms': round(cpu_times[0] * 1000, 3),
+            'cpu_ms': round(statistics.mean(cpu_times[1:]) * 1000, 3),
+        }
@@ -0,0 +1,95 @@
+""" Benchmark of the login throughput under concurrent load. """
+
+# Python
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+# Benchmarks
+from gestion_condominios.benchmarks import benchmark_database, summarize, write_results
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the login throughput of the sync view (a thread per worker) and the '
+        'async view (hashing in the bounded pool) on a test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hasher', default='django.contrib.auth.hashers.PBKDF2PasswordHasher',
+            help='Dotted path of the password hasher of the users.',
+        )
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--mode', choices=('sync', 'async', 'both'), default='both')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        with benchmark_database(), override_settings(PASSWORD_HASHERS=[options['hasher']]):
+            credentials = self.create_users(options['users'])
+            payloads = [credentials[index % len(credentials)] for index in range(options['requests'])]
+            results = {'hasher': options['hasher'], 'concurrency': options['concurrency']}
+            if options['mode'] in ('sync', 'both'):
+                results['sync'] = self.run_sync(payloads, options['concurrency'])
+            if options['mode'] in ('async', 'both'):
+                results['async'] = asyncio.run(self.run_async(payloads, options['concurrency']))
+
+        for mode in ('sync', 'async'):
+            if mode in results:
+                result = results[mode]
+                self.stdout.write(
+                    f"{mode:>5}: {result['requests_per_second']:.1f} logins/s, "
+                    f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms"
+                )
+        if options['output']:
+            write_results(options['output'], results)
+
+    def create_users(self, count):
+        credentials = []
+        for index in range(count):
+            username, password = f'bench{index}', f'password{index}'
+            User.objects.create_user(username, f'{username}@example.com', password)
+            credentials.append({'username': username, 'password': password})
+        return credentials
+
+    def report(self, latencies, statuses, elapsed):
+        assert set(statuses) == {200}, f'Failed logins: {statuses}'
+        return dict(summarize(latencies), requests_per_second=len(latencies) / elapsed)
+
+    def run_sync(self, payloads, concurrency):
+        url = reverse('login')
+
+        def login(payload):
+            start = time.perf_counter()
+            response = Client().post(url, payload, content_type='application/json')
+            return time.perf_counter() - start, response.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(login, payloads))
+        elapsed = time.perf_counter() - start
+        return self.report([latency for latency, _ in results], [code for _, code in results], elapsed)
+
+    async def run_async(self, payloads, concurrency):
+        url = reverse('async-login')
+        semaphore = asyncio.Semaphore(concurrency)
+        client = AsyncClient()
+
+        async def login(payload):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(url, payload, content_type='application/json')
+                return time.perf_counter() - start, response.status_code
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(login(payload) for payload in payloads))
+        elapsed = time.perf_counter() - start
+        return self.report([latency for latency, _ in results], [code for _, code in results], elapsed)
@@ -0,0 +1,124 @@
+""" Benchmark of the indexed lookups of the write paths. """
+
+# Python
+import random
+import time
+from datetime import timedelta
+
+# Django
+from django.core.management.base import BaseCommand
+from django.db import connection, models
+from django.utils import timezone
+
+# Models
+from gestion_condominios.models import Condominium, Department, FinancialStat
+
+# Benchmarks
+from gestion_condominios.benchmarks import benchmark_database, summarize, write_results
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the latency of the condominium, department and financial status lookups '
+        'with the indexes of the lookup_indexes migration and without them, on a test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Rows of every table.')
+        parser.add_argument('--lookups', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        rows, random_ = options['rows'], random.Random(options['seed'])
+        with benchmark_database():
+            self.populate(rows)
+            names = [f'condominium {random_.randrange(rows)}' for _ in range(options['lookups'])]
+            departments = [
+                (random_.randrange(1, rows // 100 + 1), random_.randrange(10), random_.randrange(10))
+                for _ in range(options['lookups'])
+            ]
+            results = {'rows': rows, 'with_indexes': self.measure(names, departments)}
+            self.drop_indexes()
+            results['without_indexes'] = self.measure(names, departments)
+
+        for lookup in results['with_indexes']:
+            before = results['without_indexes'][lookup]['p50_ms']
+            after = results['with_indexes'][lookup]['p50_ms']
+            self.stdout.write(f'{lookup}: p50 {before} ms without indexes, {after} ms with indexes')
+        if options['output']:
+            write_results(options['output'], results)
+
+    def populate(self, rows):
+        """ `rows` condominiums, and `rows` departments and financial rows over the first rows/100 condominiums. """
+        Condominium.objects.bulk_create(
+            (Condominium(name_condominium=f'condominium {number}') for number in range(rows)),
+            batch_size=5000,
+        )
+        condominium_ids = list(Condominium.objects.order_by('pk').values_list('pk', flat=True)[:rows // 100])
+        Department.objects.bulk_create(
+            (
+                Department(
+                    condominium_id_id=condominium_ids[number // 100],
+                    department_block=number % 100 // 10,
+                    department_number=number % 10,
+                )
+                for number in range(len(condominium_ids) * 100)
+            ),
+            batch_size=5000,
+        )
+        FinancialStat.objects.bulk_create(
+            (
+                FinancialStat(
+                    condominium_id_id=condominium_ids[number % len(condominium_ids)],
+                    type_detail='fee', income=100, expenses=0, details='fee',
+                )
+                for number in range(rows)
+            ),
+            batch_size=5000,
+        )
+        # Spread the rows over time, bulk_create gives them all about the same date.
+        now = timezone.now()
+        for step in range(10):
+            FinancialStat.objects.filter(pk__gt=rows * step // 10, pk__lte=rows * (step + 1) // 10) \
+                .update(created_at=now - timedelta(days=30 * step))
+
+    def drop_indexes(self):
+        with connection.schema_editor() as schema_editor:
+            old_field = Condominium._meta.get_field('name_condominium')
+            new_field = models.CharField(max_length=200)
+            new_field.set_attributes_from_name('name_condominium')
+            new_field.model = Condominium
+            schema_editor.alter_field(Condominium, old_field, new_field)
+            for constraint in Department._meta.constraints:
+                schema_editor.remove_constraint(Department, constraint)
+            for index in FinancialStat._meta.indexes:
+                schema_editor.remove_index(FinancialStat, index)
+
+    def time_lookups(self, lookup, arguments):
+        latencies = []
+        for argument in arguments:
+            start = time.perf_counter()
+            lookup(argument)
+            latencies.append(time.perf_counter() - start)
+        return summarize(latencies)
+
+    def measure(self, names, departments):
+        first_id = Condominium.objects.order_by('pk').values_list('pk', flat=True).first() - 1
+        return {
+            'condominium_by_name': self.time_lookups(
+                lambda name: Condominium.objects.get(name_condominium=name), names,
+            ),
+            'department_by_number': self.time_lookups(
+                lambda key: Department.objects.filter(
+                    condominium_id=first_id + key[0], department_block=key[1], department_number=key[2],
+                ).first(),
+                departments,
+            ),
+            'latest_financial_status': self.time_lookups(
+                lambda key: list(
+                    FinancialStat.objects.filter(condominium_id=first_id + key[0]).order_by('-created_at')[:20]
+                ),
+                departments,
+            ),
+        }
@@ -0,0 +1,209 @@
+""" Benchmark of every route of the API on synthetic data. """
+
+# Python
+import json
+import time
+
+# Django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+# Django REST Framework
+from rest_framework.authtoken.models import Token
+
+# Models
+from gestion_condominios.models import Condominium, PriorityOrUpgrade
+
+# Utils
+from gestion_condominios import synthetic, urls
+from gestion_condominios.benchmarks import QueryCounter, benchmark_database, summarize, write_results
+
+
+class Command(BaseCommand):
+    help = (
+        'Request every route of gestion_condominios/urls.py on a test database filled with '
+        'synthetic data, and report the p50/p95 latency, queries and bytes of every route. '
+        'With --compare, fail when a route got slower or runs more queries than in a previous run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--condominiums', type=int, default=5)
+        parser.add_argument('--departments', type=int, default=20)
+        parser.add_argument('--years', type=int, default=2)
+        parser.add_argument('--requests', type=int, default=20, help='Measured requests by route.')
+        parser.add_argument('--warmup', type=int, default=2, help='Requests by route before measuring.')
+        parser.add_argument('--routes', nargs='*', help='Only these labels (route names, and "<name> <METHOD>" for writes).')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+        parser.add_argument('--compare', help='Results of a previous run (a JSON file of --output).')
+        parser.add_argument(
+            '--max-regression', type=float, default=25,
+            help='Percent of p95 latency increase tolerated by --compare.',
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            synthetic.generate(
+                condominiums=options['condominiums'], departments=options['departments'],
+                years=options['years'], seed=options['seed'],
+            )
+            scenarios = self.scenarios()
+            self.check_coverage(scenarios)
+            if options['routes']:
+                scenarios = [scenario for scenario in scenarios if scenario[0] in options['routes']]
+
+            results = {
+                'parameters': {
+                    name: options[name]
+                    for name in ('condominiums', 'departments', 'years', 'requests', 'warmup', 'seed')
+                },
+                'routes': {},
+            }
+            with QueryCounter().installed() as self.queries:
+                for label, method, url, data in scenarios:
+                    results['routes'][label] = self.measure(method, url, data, options['warmup'], options['requests'])
+
+        for label, result in results['routes'].items():
+            self.stdout.write(
+                f"{label:<40} p50 {result['p50_ms']:>9} ms  p95 {result['p95_ms']:>9} ms  "
+                f"{result['queries']:>4} queries  {result['bytes']:>9} bytes"
+            )
+        if options['output']:
+            write_results(options['output'], results)
+        if options['compare']:
+            self.compare(results, options['compare'], options['max_regression'])
+
+    def scenarios(self):
+        """ (label, method, url, data) of every request, `data` is a function of the request number. """
+        admin = User.objects.create_user('bench-admin', password=synthetic.SYNTHETIC_PASSWORD, is_staff=True)
+        self.client = Client(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=admin).key}')
+        condominium = Condominium.objects.order_by('pk').first()
+        item = PriorityOrUpgrade.objects.filter(condominium_id=condominium).first()
+        login = {'username': 'synthetic-0-0', 'password': synthetic.SYNTHETIC_PASSWORD}
+        password = {'old_password': synthetic.SYNTHETIC_PASSWORD, 'new_password': synthetic.SYNTHETIC_PASSWORD}
+
+        def resident(number):
+            return {
+                'username': f'bench-resident-{number}',
+                'email': f'bench-resident-{number}@example.com',
+                'password': synthetic.SYNTHETIC_PASSWORD,
+                'name_owner': f'Residente {number}',
+                'number_department': number % 100,
+                'number_block': 1000 + number // 100,
+                'number_habitants': 2,
+                'p_number': '+56912345678',
+                'p_number_emergency': '+56987654321',
+            }
+
+        def nested(field, item):
+            return lambda number: {'name_condominium': condominium.name_condominium, field: [item] * 5}
+
+        def static(data=None):
+            return lambda number: data
+
+        reads = [
+            ('show-api', []), ('list-names', []), ('condominium-list', []),
+            ('condominium', [condominium.pk]),
+            ('condominium-financial-status', [condominium.pk]),
+            ('condominium-priority-or-upgrade', [condominium.pk]),
+            ('priority-or-upgrade-board', [condominium.pk]),
+            ('condominium-suggestions', [condominium.pk]), ('condominium-sync', [condominium.pk]),
+            ('priority-or-update', []), ('get-priority-or-update', [item.pk]),
+            ('suggestions', []), ('financial-status', []),
+            ('financial-status-retrive', [condominium.pk]),
+            ('financial-status-summary', [condominium.pk]),
+            ('financial-status-series', [condominium.pk]),
+            ('metrics', []), ('slow-queries', []),
+            ('async-list-names', []), ('async-condominium', [condominium.pk]),
+            ('async-get-priority-or-update', [item.pk]),
+            ('async-financial-status-retrive', [condominium.pk]),
+        ]
+        scenarios = [(name, 'GET', reverse(name, args=args), static()) for name, args in reads]
+        cursor = self.client.get(reverse('condominium-sync', args=[condominium.pk])).json()['cursor']
+        scenarios += [
+            ('condominium-sync delta', 'GET', reverse('condominium-sync', args=[condominium.pk]),
+             static({'since': cursor})),
+            ('financial-status-series day', 'GET', reverse('financial-status-series', args=[condominium.pk]),
+             static({'bucket': 'day'})),
+            ('financial-status-retrive filtered', 'GET', reverse('financial-status-retrive', args=[condominium.pk]),
+             static({'type_detail': 'gastos comunes'})),
+            ('search', 'GET', reverse('search'), static({'q': 'ascensor filtración'})),
+            ('batch', 'POST', reverse('batch'), static({'requests': [
+                {'path': reverse('list-names')},
+                {'path': reverse('condominium', args=[condominium.pk])},
+                {'path': reverse('priority-or-update')},
+                {'path': reverse('suggestions')},
+            ]})),
+            ('login', 'POST', reverse('login'), static(login)),
+            ('async-login', 'POST', reverse('async-login'), static(login)),
+            ('update_password', 'PUT', reverse('update_password', args=[admin.pk]), static(password)),
+            ('async-update-password', 'PUT', reverse('async-update-password', args=[admin.pk]), static(password)),
+            ('invite_user', 'POST', reverse('invite_user'),
+             lambda number: dict(resident(number), name_condominium=condominium.name_condominium)),
+            ('bulk_invite_users', 'POST', reverse('bulk_invite_users'), lambda number: {
+                'name_condominium': condominium.name_condominium,
+                'residents': [resident(10000 + number * 5 + index) for index in range(5)],
+            }),
+            ('priority-or-update POST', 'POST', reverse('priority-or-update'),
+             nested('condominium_data', {'name': 'pintar', 'detail': 'fachada norte', 'priority': True})),
+            ('suggestions POST', 'POST', reverse('suggestions'), nested('condominium_suggestions', {
+                'owner_department': 'Residente', 'comment_title': 'ruidos', 'comment': 'de noche',
+            })),
+            ('financial-status POST', 'POST', reverse('financial-status'), nested('financial_status', {
+                'type_detail': 'gastos comunes', 'income': 100000, 'expenses': 0, 'details': 'pago mensual',
+            })),
+        ]
+        return scenarios
+
+    def check_coverage(self, scenarios):
+        """ A new route must get a scenario, so it can't be forgotten by the benchmark. """
+        names = {pattern.name for pattern in urls.urlpatterns if pattern.name}
+        covered = {label.split(' ')[0] for label, *_ in scenarios}
+        missing = names - covered
+        if missing:
+            raise CommandError(f'Routes without a benchmark scenario: {", ".join(sorted(missing))}.')
+
+    def request(self, method, url, data):
+        if method == 'GET':
+            return self.client.get(url, data)
+        return self.client.generic(method, url, json.dumps(data), content_type='application/json')
+
+    def measure(self, method, url, data, warmup, requests):
+        for number in range(warmup):
+            self.request(method, url, data(number))
+
+        latencies, queries, sizes = [], [], []
+        for number in range(warmup, warmup + requests):
+            before = self.queries.count
+            start = time.perf_counter()
+            response = self.request(method, url, data(number))
+            body = response.getvalue()
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                raise CommandError(f'{method} {url} answered {response.status_code}: {body[:200]!r}')
+            queries.append(self.queries.count - before)
+            sizes.append(len(body))
+        return dict(summarize(latencies), queries=max(queries), bytes=max(sizes))
+
+    def compare(self, results, path, max_regression):
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)['routes']
+        regressions = []
+        for label, result in results['routes'].items():
+            before = baseline.get(label)
+            if before is None:
+                continue
+            # A floor of 1 ms keeps the noise of the fastest routes out.
+            slower = result['p95_ms'] - before['p95_ms'] > max(before['p95_ms'] * max_regression / 100, 1)
+            if slower or result['queries'] > before['queries']:
+                regressions.append(
+                    f"{label}: p95 {before['p95_ms']} -> {result['p95_ms']} ms, "
+                    f"queries {before['queries']} -> {result['queries']}"
+                )
+            if result['bytes'] != before['bytes']:
+                self.stdout.write(f"{label}: {before['bytes']} -> {result['bytes']} bytes")
+        if regressions:
+            raise CommandError('Regressions:\n' + '\n'.join(regressions))
+        self.stdout.write('No regressions.')
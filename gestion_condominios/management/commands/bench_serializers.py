@@ -0,0 +1,117 @@
+""" Benchmark of the `values()` fast path against the model serializers. """
+
+# Python
+import time
+
+# Django
+from django.core.management.base import BaseCommand, CommandError
+
+# Django REST Framework
+from rest_framework.renderers import JSONRenderer
+
+# Models
+from gestion_condominios.models import Condominium, Department, FinancialStat
+
+# Serializers
+from gestion_condominios.serializers import CondominiumModelSerializer, CondominiumStatusModelSerializer
+
+# Utils
+from gestion_condominios.benchmarks import benchmark_database, write_results
+from gestion_condominios.projections import ValuesProjection
+from gestion_condominios.sparse import optimize_queryset
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the rows per second of condominium-list/ and financial-status/ rendered by the '
+        'model serializers and by the values() projections, on a test database.'
+    )
+
+    endpoints = {
+        'condominium-list': CondominiumModelSerializer,
+        'financial-status': CondominiumStatusModelSerializer,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--condominiums', type=int, default=200)
+        parser.add_argument('--rows', type=int, default=50, help='Departments and financial rows of every condominium.')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        results = {'condominiums': options['condominiums'], 'rows': options['rows']}
+        with benchmark_database():
+            self.populate(options['condominiums'], options['rows'])
+            for endpoint, serializer_class in self.endpoints.items():
+                results[endpoint] = self.measure(serializer_class, options['repeat'])
+
+        for endpoint in self.endpoints:
+            result = results[endpoint]
+            self.stdout.write(
+                f'{endpoint}: {result["serializer_rows_per_second"]} rows/s with the serializer, '
+                f'{result["values_rows_per_second"]} rows/s with values() '
+                f'(x{result["speedup"]})'
+            )
+        if options['output']:
+            write_results(options['output'], results)
+
+    def populate(self, condominiums, rows):
+        Condominium.objects.bulk_create(
+            Condominium(name_condominium=f'condominium {number}') for number in range(condominiums)
+        )
+        condominium_ids = list(Condominium.objects.values_list('pk', flat=True))
+        Department.objects.bulk_create(
+            (
+                Department(
+                    condominium_id_id=condominium_id,
+                    department_block=number // 10,
+                    department_number=number % 10,
+                    department_owner=f'owner {number}',
+                )
+                for condominium_id in condominium_ids for number in range(rows)
+            ),
+            batch_size=5000,
+        )
+        FinancialStat.objects.bulk_create(
+            (
+                FinancialStat(
+                    condominium_id_id=condominium_id,
+                    type_detail='fee', income=100.5, expenses=20, details=f'fee {number}',
+                )
+                for condominium_id in condominium_ids for number in range(rows)
+            ),
+            batch_size=5000,
+        )
+
+    def measure(self, serializer_class, repeat):
+        renderer = JSONRenderer()
+        serializer = serializer_class()
+        queryset = optimize_queryset(Condominium.objects.all(), serializer)
+        projection = ValuesProjection.build(serializer, queryset)
+        if projection is None:
+            raise CommandError(f'{serializer_class.__name__} has no values() projection.')
+
+        def serializer_path():
+            return renderer.render(serializer_class(queryset.all(), many=True).data)
+
+        def values_path():
+            return renderer.render(projection.represent(projection.values()))
+
+        if serializer_path() != values_path():
+            raise CommandError(f'The values() projection of {serializer_class.__name__} renders other bytes.')
+
+        # Every condominium and its nested rows.
+        nested = {'departments': Department, 'financial_status': FinancialStat}
+        rows = Condominium.objects.count() + sum(
+            model.objects.count() for name, model in nested.items() if name in serializer.fields
+        )
+        result = {}
+        for name, path in (('serializer', serializer_path), ('values', values_path)):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                path()
+            elapsed = (time.perf_counter() - start) / repeat
+            result[f'{name}_seconds'] = round(elapsed, 4)
+            result[f'{name}_rows_per_second'] = round(rows / elapsed)
+        result['speedup'] = round(result['serializer_seconds'] / result['values_seconds'], 2)
+        return result
@@ -0,0 +1,35 @@
+""" Fill the database with synthetic condominiums. """
+
+# Django
+from django.core.management.base import BaseCommand
+
+# Synthetic data
+from gestion_condominios import synthetic
+
+
+class Command(BaseCommand):
+    help = (
+        'Create condominiums with departments, residents, years of financial status, comments and '
+        f'priorities. The residents log in with the password "{synthetic.SYNTHETIC_PASSWORD}".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--condominiums', type=int, default=10)
+        parser.add_argument('--departments', type=int, default=20, help='Departments (and residents) by condominium.')
+        parser.add_argument('--years', type=int, default=2, help='Years of financial status.')
+        parser.add_argument('--financial-per-month', type=int, default=8)
+        parser.add_argument('--comments', type=int, default=40, help='Comments by condominium.')
+        parser.add_argument('--priorities', type=int, default=25, help='Priorities and upgrades by condominium.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        created = synthetic.generate(
+            condominiums=options['condominiums'],
+            departments=options['departments'],
+            years=options['years'],
+            financial_per_month=options['financial_per_month'],
+            comments=options['comments'],
+            priorities=options['priorities'],
+            seed=options['seed'],
+        )
+        self.stdout.write(', '.join(f'{count} {name}' for name, count in created.items()) + ' created.')
@@ -0,0 +1,18 @@
+""" Purge the old tombstones of the delta sync. """
+
+# Django
+from django.core.management.base import BaseCommand
+
+# Sync
+from gestion_condominios import sync
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete the tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS. Schedule it daily; '
+        'the clients with an older cursor get every row again.'
+    )
+
+    def handle(self, *args, **options):
+        deleted = sync.purge_tombstones()
+        self.stdout.write(f'Deleted {deleted} tombstones.')
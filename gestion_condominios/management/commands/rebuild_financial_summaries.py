@@ -0,0 +1,18 @@
+""" Rebuild the monthly financial summaries. """
+
+# Django
+from django.core.management.base import BaseCommand
+
+# Rollups
+from gestion_condominios import rollups
+
+
+class Command(BaseCommand):
+    help = 'Compute the monthly financial summaries again from the financial status rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('condominium_ids', nargs='*', type=int, help='Only rebuild these condominiums.')
+
+    def handle(self, *args, **options):
+        summaries = rollups.rebuild(options['condominium_ids'] or None)
+        self.stdout.write(f'Rebuilt {len(summaries)} monthly summaries.')
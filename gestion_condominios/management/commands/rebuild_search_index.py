@@ -0,0 +1,18 @@
+""" Rebuild the search index. """
+
+# Django
+from django.core.management.base import BaseCommand
+
+# Search
+from gestion_condominios import search
+
+
+class Command(BaseCommand):
+    help = 'Index every suggestion and priority again. Run it once after the search index migration.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        documents = search.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(f'Indexed {documents} documents.')
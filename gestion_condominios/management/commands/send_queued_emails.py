@@ -0,0 +1,38 @@
+""" Worker that sends the emails of the outbox. """
+
+# Python
+import time
+
+# Django
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+# Emails
+from gestion_condominios.emails import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = 'Send the queued emails, retrying the failed ones with backoff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Send one batch and exit.')
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to wait when the outbox is empty.')
+
+    def handle(self, *args, **options):
+        while True:
+            # Like at the start of a request: a connection dropped by the
+            # server (wait_timeout, failover) is opened again.
+            close_old_connections()
+            try:
+                sent, failed = send_queued_emails(batch_size=options['batch_size'])
+            except Exception as error:
+                # The database is down, the emails stay pending.
+                self.stderr.write(f'Could not send the queued emails: {error!r}')
+                sent = failed = 0
+            if sent or failed:
+                self.stdout.write(f'Sent {sent} emails, {failed} failed.')
+            if options['once']:
+                return
+            if not sent and not failed:
+                time.sleep(options['interval'])
@@ -0,0 +1,237 @@
+"""
+Request metrics by route, aggregated across the worker processes.
+
+Every process counts its requests in memory and writes them every
+METRICS_FLUSH_INTERVAL seconds to its own JSON file of METRICS_DIR. The
+metrics endpoint adds up the files of every process and renders them in
+the Prometheus text format:
+
+- `condominios_requests_total`: requests by route, method and status.
+- `condominios_request_duration_seconds`: latency histogram by route.
+- `condominios_request_queries`: histogram of the queries of a request by route.
+- `condominios_requests_in_flight`: requests being served by route.
+
+The scrape moves the counters and histograms of the finished processes
+to `archive.json` and deletes their files, so the totals never go down
+(a drop would be a counter reset for Prometheus) and METRICS_DIR doesn't
+grow with every recycled worker; their requests in flight are dropped.
+A worker forked from a process with a store (`gunicorn --preload`)
+starts a file and metrics of its own.
+
+The endpoint is staff only, like the rest of the administration API:
+Prometheus scrapes it with the DRF token of a staff user, sent as
+`Authorization: Token <key>` (`authorization: {type: Token, credentials: <key>}`
+in the scrape config).
+"""
+
+# Python
+import atexit
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Django
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def empty_metrics():
+    return {'requests': {}, 'duration': {}, 'queries': {}, 'in_flight': {}}
+
+
+def observe(histograms, route, buckets, value):
+    """ Add the value to the histogram of the route, the buckets aren't cumulative in the store. """
+    histogram = histograms.setdefault(route, {'buckets': [0] * (len(buckets) + 1), 'sum': 0, 'count': 0})
+    index = next((index for index, bound in enumerate(buckets) if value <= bound), len(buckets))
+    histogram['buckets'][index] += 1
+    histogram['sum'] += value
+    histogram['count'] += 1
+
+
+def merge(total, metrics, gauges=True):
+    for key, count in metrics['requests'].items():
+        total['requests'][key] = total['requests'].get(key, 0) + count
+    for name in ('duration', 'queries'):
+        for route, histogram in metrics[name].items():
+            merged = total[name].setdefault(route, {'buckets': [0] * len(histogram['buckets']), 'sum': 0, 'count': 0})
+            merged['buckets'] = [a + b for a, b in zip(merged['buckets'], histogram['buckets'])]
+            merged['sum'] += histogram['sum']
+            merged['count'] += histogram['count']
+    if gauges:
+        for route, count in metrics['in_flight'].items():
+            total['in_flight'][route] = total['in_flight'].get(route, 0) + count
+
+
+def replace_file(directory, path, content):
+    """ Replace the file at once, readers never see a half written file. """
+    descriptor, temporary = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+    with os.fdopen(descriptor, 'w') as output:
+        output.write(content)
+    os.replace(temporary, path)
+
+
+def read_json(path):
+    with open(path) as metrics_file:
+        return json.load(metrics_file)
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsStore:
+    """ Metrics of this process, written to `<directory>/metrics-<pid>-<start>.json`. """
+
+    def __init__(self, directory, flush_interval):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.last_flush = 0
+        self.pid = None
+        self.archive_path = os.path.join(directory, 'archive.json')
+        os.makedirs(directory, exist_ok=True)
+        self.check_process()
+        atexit.register(self.flush, force=True)
+
+    def check_process(self):
+        """ Start the file and the metrics of this process, again in a forked child. """
+        pid = os.getpid()
+        if pid != self.pid:
+            self.pid = pid
+            # The start time tells apart the files of two processes with the same pid.
+            self.path = os.path.join(self.directory, f'metrics-{pid}-{int(time.time() * 1000)}.json')
+            self.metrics = empty_metrics()
+
+    def request_started(self, route):
+        with self.lock:
+            self.check_process()
+            in_flight = self.metrics['in_flight']
+            in_flight[route] = in_flight.get(route, 0) + 1
+
+    def request_finished(self, route, method, status_code, duration, queries, started=True):
+        with self.lock:
+            self.check_process()
+            key = f'{route}|{method}|{status_code}'
+            self.metrics['requests'][key] = self.metrics['requests'].get(key, 0) + 1
+            observe(self.metrics['duration'], route, LATENCY_BUCKETS, duration)
+            observe(self.metrics['queries'], route, QUERY_BUCKETS, queries)
+            # Not after a fork during the request.
+            if started and route in self.metrics['in_flight']:
+                self.metrics['in_flight'][route] -= 1
+        self.flush()
+
+    def flush(self, force=False):
+        """ Write the metrics of the process, at most every `flush_interval` seconds unless forced. """
+        now = time.monotonic()
+        if not force and now - self.last_flush < self.flush_interval:
+            return
+        with self.lock:
+            self.check_process()
+            self.last_flush = now
+            data = json.dumps(self.metrics)
+            path = self.path
+        # The metrics never fail a request.
+        try:
+            replace_file(self.directory, path, data)
+        except OSError:
+            pass
+
+    def collect(self):
+        """ Metrics of every process: the archive and the files of the processes alive. """
+        self.flush(force=True)
+        # One scrape at a time, or two of them would archive the same process.
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                return self.collect_locked()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def collect_locked(self):
+        try:
+            archive = read_json(self.archive_path)
+        except (OSError, ValueError):
+            archive = empty_metrics()
+        total = empty_metrics()
+        merge(total, archive)
+        for name in os.listdir(self.directory):
+            if not (name.startswith('metrics-') and name.endswith('.json')):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                metrics = read_json(path)
+            except (OSError, ValueError):
+                continue
+            alive = process_alive(int(name.split('-')[1]))
+            merge(total, metrics, gauges=alive)
+            if not alive:
+                # Archived before the file is deleted: a failure keeps the file, never the counts twice.
+                merge(archive, metrics, gauges=False)
+                replace_file(self.directory, self.archive_path, json.dumps(archive))
+                os.remove(path)
+        return total
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store():
+    """ Store of this process for METRICS_DIR. """
+    with _stores_lock:
+        store = _stores.get(settings.METRICS_DIR)
+        if store is None:
+            store = _stores[settings.METRICS_DIR] = MetricsStore(settings.METRICS_DIR, settings.METRICS_FLUSH_INTERVAL)
+        return store
+
+
+def labels(**values):
+    return '{' + ','.join(f'{name}="{value}"' for name, value in values.items()) + '}'
+
+
+def render_histogram(lines, name, help_text, histograms, buckets):
+    lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for route, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip((*buckets, '+Inf'), histogram['buckets']):
+            cumulative += count
+            lines.append(f'{name}_bucket{labels(route=route, le=bound)} {cumulative}')
+        lines.append(f'{name}_sum{labels(route=route)} {histogram["sum"]}')
+        lines.append(f'{name}_count{labels(route=route)} {histogram["count"]}')
+
+
+def render_prometheus(metrics):
+    """ The metrics in the Prometheus text exposition format. """
+    lines = [
+        '# HELP condominios_requests_total Requests by route, method and status.',
+        '# TYPE condominios_requests_total counter',
+    ]
+    for key, count in sorted(metrics['requests'].items()):
+        route, method, status_code = key.split('|')
+        lines.append(f'condominios_requests_total{labels(route=route, method=method, status=status_code)} {count}')
+    render_histogram(
+        lines, 'condominios_request_duration_seconds', 'Latency of the requests by route.',
+        metrics['duration'], LATENCY_BUCKETS,
+    )
+    render_histogram(
+        lines, 'condominios_request_queries', 'Database queries of the requests by route.',
+        metrics['queries'], QUERY_BUCKETS,
+    )
+    lines += [
+        '# HELP condominios_requests_in_flight Requests being served by route.',
+        '# TYPE condominios_requests_in_flight gauge',
+    ]
+    for route, count in sorted(metrics['in_flight'].items()):
+        lines.append(f'condominios_requests_in_flight{labels(route=route)} {count}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,244 @@
+""" Middleware. """
+
+# Python
+import asyncio
+import json
+import logging
+import random
+
+# Django
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+# Asgiref
+from asgiref.sync import markcoroutinefunction
+
+# Routers
+from .routers import end_request, start_request
+
+# Instrumentation
+from .instrumentation import RequestMetrics, current_metrics, install, timing
+from .metrics import get_store
+from . import slow_queries
+
+# Compression
+from .compression import COMPRESSIBLE_TYPES, accepted_encoding, compress_stream, compressed_content, weaken_etag
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+performance_logger = logging.getLogger('gestion_condominios.performance')
+
+
+class AsyncCapableMiddleware:
+    """
+    Middleware running in the mode of the rest of the chain.
+
+    Django adapts a sync-only middleware of an ASGI chain with
+    sync_to_async(thread_sensitive=True): every request would run on the
+    one thread of the worker. Subclasses implement `call` and `acall`.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.acall(request)
+        return self.call(request)
+
+    def call(self, request):
+        raise NotImplementedError('`call()` must be implemented.')
+
+    async def acall(self, request):
+        raise NotImplementedError('`acall()` must be implemented.')
+
+
+class ReplicaRoutingMiddleware(AsyncCapableMiddleware):
+    """ Read-only requests read from a replica until they write, see `routers`. """
+
+    def call(self, request):
+        token = start_request(read_only=request.method in SAFE_METHODS)
+        try:
+            return self.get_response(request)
+        finally:
+            end_request(token)
+
+    async def acall(self, request):
+        # The views run on threads with a copy of the context, the state is shared.
+        token = start_request(read_only=request.method in SAFE_METHODS)
+        try:
+            return await self.get_response(request)
+        finally:
+            end_request(token)
+
+
+def milliseconds(seconds):
+    return round(seconds * 1000, 3)
+
+
+class PerformanceMiddleware(AsyncCapableMiddleware):
+    """
+    Queries, database time, serializing and rendering time, and size of every response.
+
+    They are sent in the `Server-Timing` header and logged as a JSON line
+    to `gestion_condominios.performance`: the other requests at INFO level,
+    those slower than PERFORMANCE_SLOW_REQUEST_MS as warnings, with their
+    queries for a PERFORMANCE_SLOW_SAMPLE_RATE fraction of them. It must be the
+    first middleware to see the whole request.
+
+    The requests are also counted by route (URL name) in the `metrics`
+    store of the process.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.store = get_store()
+        install()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_route = request.resolver_match.url_name or 'unnamed'
+        self.store.request_started(request.metrics_route)
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.start_view()
+
+    def process_template_response(self, request, response):
+        """ End of the view; the DRF response is rendered here to time it, Django won't render it again. """
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.finish_view()
+            with timing('render_time'):
+                response.render()
+        return response
+
+    def call(self, request):
+        metrics = RequestMetrics(max_queries=settings.PERFORMANCE_MAX_LOGGED_QUERIES)
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def acall(self, request):
+        # The threads of the views and of the database pools add to the same metrics.
+        metrics = RequestMetrics(max_queries=settings.PERFORMANCE_MAX_LOGGED_QUERIES)
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        """ Server-Timing header, log and metrics of the finished request. """
+        total_time = metrics.total_time
+
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={milliseconds(metrics.db_time)};desc="{metrics.queries} queries"',
+            f'serialize;dur={milliseconds(metrics.serialize_time)}',
+            f'render;dur={milliseconds(metrics.render_time)}',
+            f'total;dur={milliseconds(total_time)}',
+        ))
+        self.log(request, response, metrics, total_time)
+        # The requests answered before resolving their view (404, redirects) weren't started.
+        started = hasattr(request, 'metrics_route')
+        self.store.request_finished(
+            getattr(request, 'metrics_route', 'unmatched'), request.method, response.status_code,
+            total_time, metrics.queries, started=started,
+        )
+        return response
+
+    def log(self, request, response, metrics, total_time):
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': milliseconds(total_time),
+            'db_queries': metrics.queries,
+            'db_ms': milliseconds(metrics.db_time),
+            'serialize_ms': milliseconds(metrics.serialize_time),
+            'render_ms': milliseconds(metrics.render_time),
+            # The size of a streamed response isn't known yet.
+            'response_bytes': None if response.streaming else len(response.content),
+        }
+        if total_time * 1000 < settings.PERFORMANCE_SLOW_REQUEST_MS:
+            performance_logger.info(json.dumps(record))
+            return
+        if random.random() < settings.PERFORMANCE_SLOW_SAMPLE_RATE:
+            record['queries'] = [{'sql': sql, 'ms': milliseconds(duration)} for sql, duration in metrics.query_log]
+        performance_logger.warning(json.dumps(record))
+
+
+class SlowQueryMiddleware(AsyncCapableMiddleware):
+    """
+    Capture of the queries slower than SLOW_QUERY_THRESHOLD_MS with their view, see `slow_queries`.
+
+    The connections are per thread: the capture is added to every
+    connection when it opens, in the thread running the queries (the
+    view threads and the database pools of the async chain), not around
+    the awaited response.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERY_THRESHOLD_MS:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        slow_queries.install()
+
+    def call(self, request):
+        token = slow_queries.current_view.set(None)
+        try:
+            return self.get_response(request)
+        finally:
+            slow_queries.current_view.reset(token)
+
+    async def acall(self, request):
+        token = slow_queries.current_view.set(None)
+        try:
+            return await self.get_response(request)
+        finally:
+            slow_queries.current_view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'view_class', view_func)
+        slow_queries.current_view.set(f'{request.resolver_match.view_name} ({view.__name__})')
+
+
+class CompressionMiddleware(AsyncCapableMiddleware):
+    """ Compress the JSON and text responses with gzip or brotli, see `compression`. """
+
+    def call(self, request):
+        return self.compress(request, self.get_response(request))
+
+    async def acall(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if response.status_code != 200 or response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_BYTES:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = accepted_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            response.content = compressed_content(response, encoding)
+            response['Content-Length'] = str(len(response.content))
+        response['Content-Encoding'] = encoding
+        weaken_etag(response)
+        return response
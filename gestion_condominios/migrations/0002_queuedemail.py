@@ -0,0 +1,34 @@
+# Generated by Django 3.2.4 on 2026-10-18 05:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_condominios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Date time when the object was created.', verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Date time when the object was last modified.', verbose_name='modified at')),
+                ('to_email', models.EmailField(max_length=254)),
+                ('subject', models.CharField(max_length=200)),
+                ('html_body', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='queuedemail',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='gestion_con_status_06f9be_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.4 on 2026-10-18 05:02
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+import django.db.models.deletion
+
+
+def build_summaries(apps, schema_editor):
+    FinancialStat = apps.get_model('gestion_condominios', 'FinancialStat')
+    FinancialSummary = apps.get_model('gestion_condominios', 'FinancialSummary')
+    rows = (
+        FinancialStat.objects
+        .annotate(month=TruncMonth('created_at', output_field=models.DateField()))
+        .order_by()
+        .values('condominium_id', 'month')
+        .annotate(total_income=Sum('income'), total_expenses=Sum('expenses'), row_count=Count('id'))
+    )
+    FinancialSummary.objects.bulk_create(
+        FinancialSummary(
+            condominium_id_id=row['condominium_id'],
+            month=row['month'],
+            total_income=row['total_income'],
+            total_expenses=row['total_expenses'],
+            balance=row['total_income'] - row['total_expenses'],
+            row_count=row['row_count'],
+        )
+        for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_condominios', '0002_queuedemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FinancialSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Date time when the object was created.', verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Date time when the object was last modified.', verbose_name='modified at')),
+                ('month', models.DateField(help_text='First day of the month.')),
+                ('total_income', models.FloatField(default=0)),
+                ('total_expenses', models.FloatField(default=0)),
+                ('balance', models.FloatField(default=0)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('condominium_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='financial_summaries', to='gestion_condominios.condominium')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='financialsummary',
+            constraint=models.UniqueConstraint(fields=('condominium_id', 'month'), name='unique_financial_summary_month'),
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
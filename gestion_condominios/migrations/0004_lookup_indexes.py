@@ -0,0 +1,58 @@
+# Generated by Django 3.2.4 on 2026-10-18 05:06
+
+from django.db import IntegrityError, migrations, models
+from django.db.models import Count
+
+
+def check_duplicates(apps, schema_editor):
+    """ Fail with the duplicated rows, the constraints can't be added over them. """
+    Condominium = apps.get_model('gestion_condominios', 'Condominium')
+    Department = apps.get_model('gestion_condominios', 'Department')
+    names = list(
+        Condominium.objects.values_list('name_condominium', flat=True)
+        .annotate(count=Count('id')).filter(count__gt=1).order_by()
+    )
+    departments = list(
+        Department.objects.values('condominium_id', 'department_block', 'department_number')
+        .annotate(count=Count('id')).filter(count__gt=1).order_by()
+    )
+    errors = [f'condominium name {name!r}' for name in names] + [
+        'department {department_block}-{department_number} of condominium {condominium_id}'.format(**department)
+        for department in departments
+    ]
+    if errors:
+        raise IntegrityError(
+            'Duplicated rows, merge or rename them before migrating: ' + ', '.join(errors) + '.'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_condominios', '0003_financialsummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='condominium',
+            name='name_condominium',
+            field=models.CharField(max_length=200, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['condominium_id', 'created_at'], name='comment_condominium_created'),
+        ),
+        migrations.AddIndex(
+            model_name='financialstat',
+            index=models.Index(fields=['condominium_id', 'created_at'], name='financial_condominium_created'),
+        ),
+        migrations.AddIndex(
+            model_name='priorityorupgrade',
+            index=models.Index(fields=['condominium_id', 'created_at'], name='priority_condominium_created'),
+        ),
+        migrations.AddConstraint(
+            model_name='department',
+            constraint=models.UniqueConstraint(fields=('condominium_id', 'department_block', 'department_number'), name='unique_department_number'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.4 on 2026-10-18 05:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_condominios', '0004_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('kind', models.CharField(choices=[('comment', 'Comment'), ('priority', 'Priority or upgrade')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('weight', models.PositiveIntegerField(help_text='Occurrences of the term, weighted by field.')),
+                ('condominium_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='gestion_condominios.condominium')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='searchposting',
+            index=models.Index(fields=['term', 'kind'], name='posting_term_kind'),
+        ),
+        migrations.AddIndex(
+            model_name='searchposting',
+            index=models.Index(fields=['kind', 'object_id'], name='posting_object'),
+        ),
+    ]
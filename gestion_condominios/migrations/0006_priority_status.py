@@ -0,0 +1,67 @@
+# Generated by Django 3.2.4 on 2026-10-18 05:08
+
+from django.db import migrations, models
+
+
+def flags_to_columns(apps, schema_editor):
+    PriorityOrUpgrade = apps.get_model('gestion_condominios', 'PriorityOrUpgrade')
+    # An item with several flags set keeps the most advanced status.
+    PriorityOrUpgrade.objects.filter(doing=True).update(status='doing')
+    PriorityOrUpgrade.objects.filter(done=True).update(status='done')
+    PriorityOrUpgrade.objects.filter(priority=True, upgrade=False).update(kind='priority')
+    PriorityOrUpgrade.objects.filter(priority=False, upgrade=True).update(kind='upgrade')
+    PriorityOrUpgrade.objects.filter(priority=True, upgrade=True).update(kind='both')
+
+
+def columns_to_flags(apps, schema_editor):
+    PriorityOrUpgrade = apps.get_model('gestion_condominios', 'PriorityOrUpgrade')
+    PriorityOrUpgrade.objects.exclude(status='to_do').update(to_do=False)
+    PriorityOrUpgrade.objects.filter(status='doing').update(doing=True)
+    PriorityOrUpgrade.objects.filter(status='done').update(done=True)
+    PriorityOrUpgrade.objects.filter(kind__in=('priority', 'both')).update(priority=True)
+    PriorityOrUpgrade.objects.filter(kind__in=('upgrade', 'both')).update(upgrade=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_condominios', '0005_searchposting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='priorityorupgrade',
+            name='kind',
+            field=models.CharField(choices=[('none', 'None'), ('priority', 'Priority'), ('upgrade', 'Upgrade'), ('both', 'Priority and upgrade')], default='none', max_length=8),
+        ),
+        migrations.AddField(
+            model_name='priorityorupgrade',
+            name='status',
+            field=models.CharField(choices=[('to_do', 'To do'), ('doing', 'Doing'), ('done', 'Done')], default='to_do', max_length=5),
+        ),
+        migrations.RunPython(flags_to_columns, columns_to_flags),
+        migrations.RemoveField(
+            model_name='priorityorupgrade',
+            name='doing',
+        ),
+        migrations.RemoveField(
+            model_name='priorityorupgrade',
+            name='done',
+        ),
+        migrations.RemoveField(
+            model_name='priorityorupgrade',
+            name='priority',
+        ),
+        migrations.RemoveField(
+            model_name='priorityorupgrade',
+            name='to_do',
+        ),
+        migrations.RemoveField(
+            model_name='priorityorupgrade',
+            name='upgrade',
+        ),
+        migrations.AddIndex(
+            model_name='priorityorupgrade',
+            index=models.Index(fields=['condominium_id', 'status', 'created_at'], name='priority_condominium_status'),
+        ),
+    ]
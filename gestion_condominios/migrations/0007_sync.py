@@ -0,0 +1,44 @@
+# Generated by Django 3.2.4 on 2026-10-18 05:26
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_condominios', '0006_priority_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('financial_status', 'Financial status'), ('suggestions', 'Suggestion'), ('priorities', 'Priority or upgrade')], max_length=16)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('condominium_id', models.PositiveBigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['condominium_id', 'updated_at'], name='comment_condominium_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='financialstat',
+            index=models.Index(fields=['condominium_id', 'updated_at'], name='financial_condominium_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='priorityorupgrade',
+            index=models.Index(fields=['condominium_id', 'updated_at'], name='priority_condominium_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['condominium_id', 'deleted_at'], name='tombstone_condominium_deleted'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at'], name='tombstone_deleted'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.4 on 2026-10-18 05:31
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_condominios', '0007_sync'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='financialstat',
+            name='expenses',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=14, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AlterField(
+            model_name='financialstat',
+            name='income',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=14, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AlterField(
+            model_name='financialsummary',
+            name='balance',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='financialsummary',
+            name='total_expenses',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='financialsummary',
+            name='total_income',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16),
+        ),
+    ]
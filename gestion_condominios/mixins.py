@@ -0,0 +1,87 @@
+""" Mixins for the REST API views. """
+
+# Django
+from django.http import StreamingHttpResponse
+
+# Django REST Framework
+from rest_framework import mixins
+from rest_framework.response import Response
+
+# Renderers
+from .renderers import StreamingJSONRenderer
+
+# Projections
+from .projections import ValuesProjection
+
+
+def iter_queryset_chunks(queryset, chunk_size):
+    """
+    Yield the rows of the queryset in lists of `chunk_size` ordered by pk.
+
+    Every chunk is a keyset query (`pk > last`) that runs its own
+    prefetch_related lookups, so only one chunk lives in memory at a time.
+    The rows may be instances or `values()` dicts.
+    """
+    queryset = queryset.order_by('pk')
+    pk_name = queryset.model._meta.pk.name
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1][pk_name] if isinstance(chunk[-1], dict) else chunk[-1].pk
+
+
+class ValuesListModelMixin(mixins.ListModelMixin):
+    """
+    List a queryset from `values()` rows when the serializer allows it.
+
+    The response is the same as the one of ListModelMixin, see
+    `projections.ValuesProjection`; otherwise the instances are serialized.
+    """
+
+    def get_values_projection(self, queryset):
+        return ValuesProjection.build(self.get_serializer(), queryset)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        projection = self.get_values_projection(queryset)
+        if projection is None:
+            return super().list(request, *args, **kwargs)
+
+        rows = projection.values()
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(projection.represent(page))
+        return Response(projection.represent(rows))
+
+
+class StreamingListModelMixin(ValuesListModelMixin):
+    """
+    List a queryset, streaming the JSON array when the client sends `?stream=true`.
+
+    The streamed body is byte-identical to the regular JSON response.
+    """
+    stream_query_param = 'stream'
+    stream_chunk_size = 200
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get(self.stream_query_param, '').lower() not in ('1', 'true'):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        projection = self.get_values_projection(queryset)
+        if projection is None:
+            chunks = (
+                self.get_serializer(chunk, many=True).data
+                for chunk in iter_queryset_chunks(queryset, self.stream_chunk_size)
+            )
+        else:
+            chunks = (
+                projection.represent(chunk)
+                for chunk in iter_queryset_chunks(projection.values(), self.stream_chunk_size)
+            )
+        renderer = StreamingJSONRenderer()
+        return StreamingHttpResponse(renderer.render_stream(chunks), content_type=renderer.media_type)
@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MaxValueValidator, MinValueValidator, RegexValidator
 from django.db.models.fields.related import OneToOneField
+from django.utils import timezone
 
 class BaseModelCustom(models.Model):
     created_at = models.DateTimeField(
@@ -22,7 +23,7 @@ class BaseModelCustom(models.Model):
 
 
 class Condominium(BaseModelCustom):
-    name_condominium = models.CharField(max_length=200)
+    name_condominium = models.CharField(max_length=200, unique=True)
 
     def __str__(self):
         return self.name_condominium
@@ -35,6 +36,14 @@ class Department(BaseModelCustom):
     number_habitants  = models.IntegerField(validators=[MinValueValidator(0), MaxValueValidator(4)], blank=False, default=0)
     department_owner  = models.CharField(max_length=200, blank=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['condominium_id', 'department_block', 'department_number'],
+                name='unique_department_number',
+            ),
+        ]
+
     def __str__(self):
         return f'owner: {self.department_owner}, number: {self.department_number}, block: {self.department_block}'
     
@@ -59,6 +68,12 @@ class Comment(BaseModelCustom):
     flaw_title       = models.CharField(max_length=100, blank=True)
     flaw             = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['condominium_id', 'created_at'], name='comment_condominium_created'),
+            models.Index(fields=['condominium_id', 'updated_at'], name='comment_condominium_updated'),
+        ]
+
     def __str__(self):
         if self.comment_title == "" and self.flaw_title == "":
             return self.owner_department
@@ -73,22 +88,208 @@ class Comment(BaseModelCustom):
 class FinancialStat(BaseModelCustom):
     condominium_id  = models.ForeignKey(Condominium, related_name='financial_status' , on_delete=models.CASCADE)
     type_detail     = models.CharField(max_length=100, blank=False)
-    income          = models.FloatField(validators=[MinValueValidator(0)], blank=True)
-    expenses        = models.FloatField(validators=[MinValueValidator(0)], blank=True)
+    income          = models.DecimalField(max_digits=14, decimal_places=2, validators=[MinValueValidator(0)], blank=True)
+    expenses        = models.DecimalField(max_digits=14, decimal_places=2, validators=[MinValueValidator(0)], blank=True)
     details         = models.TextField(blank=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['condominium_id', 'created_at'], name='financial_condominium_created'),
+            models.Index(fields=['condominium_id', 'updated_at'], name='financial_condominium_updated'),
+        ]
+
     def __str__(self):
         return f'{self.condominium_id.name_condominium}, detail: {self.type_detail}'
 
 class PriorityOrUpgrade(BaseModelCustom):
+    """
+    Priority or upgrade of a condominium, in a column of the kanban board.
+
+    The `priority`, `upgrade`, `to_do`, `doing` and `done` flags of the API
+    are properties over the `kind` and `status` columns. Setting a flag to
+    False is a no-op, setting it to True moves the item.
+    """
+    TO_DO = 'to_do'
+    DOING = 'doing'
+    DONE  = 'done'
+    STATUS_CHOICES = (
+        (TO_DO, 'To do'),
+        (DOING, 'Doing'),
+        (DONE, 'Done'),
+    )
+
+    NONE     = 'none'
+    PRIORITY = 'priority'
+    UPGRADE  = 'upgrade'
+    BOTH     = 'both'
+    KIND_CHOICES = (
+        (NONE, 'None'),
+        (PRIORITY, 'Priority'),
+        (UPGRADE, 'Upgrade'),
+        (BOTH, 'Priority and upgrade'),
+    )
+
     condominium_id = models.ForeignKey(Condominium, related_name="condominium_data", on_delete=models.CASCADE)
     name           = models.CharField(max_length=200, blank=False)
     detail         = models.TextField(blank=False)
-    priority       = models.BooleanField(default=False)
-    upgrade        = models.BooleanField(default=False)
-    to_do          = models.BooleanField(default=True)
-    doing          = models.BooleanField(default=False)
-    done           = models.BooleanField(default=False)
+    status         = models.CharField(max_length=5, choices=STATUS_CHOICES, default=TO_DO)
+    kind           = models.CharField(max_length=8, choices=KIND_CHOICES, default=NONE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['condominium_id', 'created_at'], name='priority_condominium_created'),
+            models.Index(fields=['condominium_id', 'status', 'created_at'], name='priority_condominium_status'),
+            models.Index(fields=['condominium_id', 'updated_at'], name='priority_condominium_updated'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def _set_kind(self, priority, upgrade):
+        self.kind = {
+            (False, False): self.NONE,
+            (True, False): self.PRIORITY,
+            (False, True): self.UPGRADE,
+            (True, True): self.BOTH,
+        }[bool(priority), bool(upgrade)]
+
+    @property
+    def priority(self):
+        return self.kind in (self.PRIORITY, self.BOTH)
+
+    @priority.setter
+    def priority(self, value):
+        self._set_kind(value, self.upgrade)
+
+    @property
+    def upgrade(self):
+        return self.kind in (self.UPGRADE, self.BOTH)
+
+    @upgrade.setter
+    def upgrade(self, value):
+        self._set_kind(self.priority, value)
+
+    @property
+    def to_do(self):
+        return self.status == self.TO_DO
+
+    @to_do.setter
+    def to_do(self, value):
+        if value:
+            self.status = self.TO_DO
+
+    @property
+    def doing(self):
+        return self.status == self.DOING
+
+    @doing.setter
+    def doing(self, value):
+        if value:
+            self.status = self.DOING
+
+    @property
+    def done(self):
+        return self.status == self.DONE
+
+    @done.setter
+    def done(self, value):
+        if value:
+            self.status = self.DONE
+
+class QueuedEmail(BaseModelCustom):
+    """ Email waiting in the outbox to be sent by the `send_queued_emails` command. """
+    PENDING = 'pending'
+    SENT    = 'sent'
+    FAILED  = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+
+    to_email        = models.EmailField(max_length=254)
+    subject         = models.CharField(max_length=200)
+    html_body       = models.TextField(blank=True)
+    status          = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts        = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at         = models.DateTimeField(null=True, blank=True)
+    last_error      = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.to_email}, subject: {self.subject}, status: {self.status}'
+
+
+class FinancialSummary(BaseModelCustom):
+    """ Totals of the FinancialStat rows of a condominium in a month, kept up to date by signals. """
+    condominium_id = models.ForeignKey(Condominium, related_name='financial_summaries', on_delete=models.CASCADE)
+    month          = models.DateField(help_text='First day of the month.')
+    total_income   = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    total_expenses = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    balance        = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    row_count      = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['condominium_id', 'month'], name='unique_financial_summary_month'),
+        ]
+
+    def __str__(self):
+        return f'{self.condominium_id_id}, month: {self.month:%Y-%m}, balance: {self.balance}'
+
+
+class SearchPosting(models.Model):
+    """ Entry of the inverted index of the search: a term found in a comment or a priority. """
+    COMMENT  = 'comment'
+    PRIORITY = 'priority'
+    KIND_CHOICES = (
+        (COMMENT, 'Comment'),
+        (PRIORITY, 'Priority or upgrade'),
+    )
+
+    term           = models.CharField(max_length=64)
+    kind           = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id      = models.PositiveBigIntegerField()
+    condominium_id = models.ForeignKey(Condominium, related_name='search_postings', on_delete=models.CASCADE)
+    weight         = models.PositiveIntegerField(help_text='Occurrences of the term, weighted by field.')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'kind'], name='posting_term_kind'),
+            models.Index(fields=['kind', 'object_id'], name='posting_object'),
+        ]
+
+    def __str__(self):
+        return f'{self.term}, {self.kind}: {self.object_id}'
+
+
+class Tombstone(models.Model):
+    """ Deleted row of a condominium, for the delta sync. Purged after SYNC_TOMBSTONE_RETENTION_DAYS. """
+    FINANCIAL_STATUS = 'financial_status'
+    SUGGESTIONS      = 'suggestions'
+    PRIORITIES       = 'priorities'
+    KIND_CHOICES = (
+        (FINANCIAL_STATUS, 'Financial status'),
+        (SUGGESTIONS, 'Suggestion'),
+        (PRIORITIES, 'Priority or upgrade'),
+    )
+
+    kind           = models.CharField(max_length=16, choices=KIND_CHOICES)
+    object_id      = models.PositiveBigIntegerField()
+    # Not a foreign key: the tombstones of a deleted condominium are written while it is deleted.
+    condominium_id = models.PositiveBigIntegerField()
+    deleted_at     = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['condominium_id', 'deleted_at'], name='tombstone_condominium_deleted'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted'),
+        ]
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f'{self.kind}: {self.object_id}, deleted at: {self.deleted_at}'
@@ -0,0 +1,30 @@
+""" Pagination classes. """
+
+# Django REST Framework
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Keyset pagination ordered by creation date.
+
+    The cursor stores the last `created_at` seen, so every page is a
+    `WHERE created_at > ... LIMIT n` query no matter how deep it is.
+    """
+    ordering = ('created_at', 'id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class OptionalCreatedAtCursorPagination(CreatedAtCursorPagination):
+    """
+    Cursor pagination only used when the client sends `cursor` or `page_size`,
+    so the lists keep returning a plain array to the existing clients.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params \
+                and self.page_size_query_param not in request.query_params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
@@ -0,0 +1,26 @@
+""" Parsers. """
+
+# Python
+import codecs
+import csv
+
+# Django
+from django.conf import settings
+
+# Django REST Framework
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class CSVParser(BaseParser):
+    """ Parse a CSV with a header row into a list of dicts. """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            rows = csv.DictReader(codecs.iterdecode(stream, encoding))
+            return [row for row in rows if any(row.values())]
+        except (csv.Error, UnicodeDecodeError) as error:
+            raise ParseError(f'CSV parse error - {error}')
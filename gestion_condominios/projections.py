@@ -0,0 +1,151 @@
+"""
+Read-only fast path of the model serializers over `values()` rows.
+
+A `ValuesProjection` is compiled once per request from a (pruned) model
+serializer and the queryset of the view: every field becomes a converter
+from a column of the row, every nested collection a second `values()`
+query grouped by foreign key. No model instance is built, and the output
+is the same as `serializer.data`, because the converters are the
+`to_representation` of the serializer fields.
+
+Serializers with fields that don't map to a column (properties, method
+fields, related fields) are not supported; `build` returns None and the
+view serializes the instances as usual.
+"""
+
+# Python
+from collections import defaultdict
+
+# Django
+from django.db.models import Prefetch
+
+# Django REST Framework
+from rest_framework import serializers
+
+
+class UnsupportedField(Exception):
+    """ A field of the serializer can't be read from a `values()` row. """
+
+
+def identity(value):
+    return value
+
+
+def compile_converter(field):
+    """ Row value -> representation, None stays None like in `Serializer.to_representation`. """
+    # The database already returns strings, CharField.to_representation is str().
+    to_representation = identity if isinstance(field, serializers.CharField) else field.to_representation
+
+    def convert(value):
+        return None if value is None else to_representation(value)
+    return convert
+
+
+def loaded_columns(queryset):
+    """ Names of the columns the queryset loads for its instances (honouring only() and defer()). """
+    opts = queryset.model._meta
+    names, defer = queryset.query.deferred_loading
+    if defer:
+        columns = [field.name for field in opts.concrete_fields if field.name not in names]
+    else:
+        columns = [name for name in names if name != 'pk']
+    if opts.pk.name not in columns:
+        columns.append(opts.pk.name)
+    return columns
+
+
+def prefetch_querysets(queryset):
+    """ Queryset of every prefetch_related lookup of the queryset, by lookup. """
+    querysets = {}
+    for lookup in queryset._prefetch_related_lookups:
+        if isinstance(lookup, Prefetch):
+            querysets[lookup.prefetch_to] = lookup.queryset
+        else:
+            querysets[lookup] = None
+    return querysets
+
+
+class ValuesProjection:
+    """ Compiled `values()` projection of a model serializer. """
+
+    def __init__(self, serializer, queryset):
+        model = queryset.model
+        concrete = {field.name: field for field in model._meta.concrete_fields}
+        prefetches = prefetch_querysets(queryset)
+
+        self.queryset = queryset.prefetch_related(None)
+        self.columns = loaded_columns(queryset)
+        self.pk_name = model._meta.pk.name
+        # (name, column, converter) in the order of the serializer, the
+        # column is None for the nested collections.
+        self.converters = []
+        self.nested = []
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ListSerializer):
+                self.nested.append((name, *self.compile_nested(model, field, prefetches)))
+                self.converters.append((name, None, None))
+            elif field.source in concrete and not concrete[field.source].is_relation:
+                if field.source not in self.columns:
+                    raise UnsupportedField(name)
+                self.converters.append((name, field.source, compile_converter(field)))
+            else:
+                raise UnsupportedField(name)
+
+    @staticmethod
+    def compile_nested(model, field, prefetches):
+        if not isinstance(field.child, serializers.ModelSerializer):
+            raise UnsupportedField(field.field_name)
+        relation = model._meta.get_field(field.source)
+        if not relation.one_to_many:
+            raise UnsupportedField(field.field_name)
+        # The same queryset as the prefetch, so the rows come in the same order.
+        child_queryset = prefetches.get(field.source)
+        if child_queryset is None:
+            child_queryset = relation.related_model._default_manager.all()
+        foreign_key = relation.field.name
+        return foreign_key, ValuesProjection(field.child, child_queryset)
+
+    @classmethod
+    def build(cls, serializer, queryset):
+        """ Projection of the serializer, None when a field isn't supported. """
+        try:
+            return cls(serializer, queryset)
+        except UnsupportedField:
+            return None
+
+    def values(self, queryset=None, extra_columns=()):
+        """ The rows of the queryset (the one of the view by default) as dicts. """
+        queryset = self.queryset if queryset is None else queryset.prefetch_related(None)
+        return queryset.values(*self.columns, *(set(extra_columns) - set(self.columns)))
+
+    def represent(self, rows):
+        """ Representation of the `values()` rows, the same as `serializer.data`. """
+        rows = list(rows)
+        children = {}
+        if rows and self.nested:
+            pks = [row[self.pk_name] for row in rows]
+            for name, foreign_key, projection in self.nested:
+                child_rows = list(projection.values(
+                    projection.queryset.filter(**{f'{foreign_key}__in': pks}),
+                    extra_columns=(foreign_key,),
+                ))
+                groups = defaultdict(list)
+                for child_row, data in zip(child_rows, projection.represent(child_rows)):
+                    groups[child_row[foreign_key]].append(data)
+                children[name] = groups
+
+        if not children:
+            converters = self.converters
+            return [{name: convert(row[column]) for name, column, convert in converters} for row in rows]
+
+        data = []
+        for row in rows:
+            pk = row[self.pk_name]
+            data.append({
+                name: children[name].get(pk, []) if column is None else convert(row[column])
+                for name, column, convert in self.converters
+            })
+        return data
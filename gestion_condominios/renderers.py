@@ -0,0 +1,25 @@
+""" Renderers. """
+
+# Django REST Framework
+from rest_framework.renderers import JSONRenderer
+
+
+class StreamingJSONRenderer(JSONRenderer):
+    """
+    JSON renderer that writes a list one element at a time.
+
+    Every element goes through `JSONRenderer.render`, so joining the pieces
+    gives the same bytes as rendering the whole list at once.
+    """
+
+    def render_stream(self, chunks):
+        """ Yield the JSON array of the elements of every chunk (a list of serialized rows). """
+        yield b'['
+        first = True
+        for chunk in chunks:
+            for element in chunk:
+                if not first:
+                    yield b','
+                first = False
+                yield self.render(element)
+        yield b']'
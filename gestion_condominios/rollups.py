@@ -0,0 +1,102 @@
+""" Monthly financial rollups, see FinancialSummary. """
+
+# Python
+from collections import defaultdict
+from decimal import Decimal
+
+# Django
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+# Models
+from .models import FinancialStat, FinancialSummary
+
+
+CENTS = Decimal('0.01')
+
+
+def amount(value):
+    """ Amount as stored, the instances keep the float or int they were created with. """
+    return Decimal(str(value)).quantize(CENTS)
+
+
+def month_of(created_at):
+    """ First day of the month of a datetime, in the current time zone like TruncMonth. """
+    return timezone.localtime(created_at).date().replace(day=1)
+
+
+def apply_delta(condominium_id, month, income, expenses, rows):
+    """ Add the amounts to the summary of the month, creating it for new months. """
+    summaries = FinancialSummary.objects.filter(condominium_id=condominium_id, month=month)
+    changes = {
+        'total_income': F('total_income') + income,
+        'total_expenses': F('total_expenses') + expenses,
+        'balance': F('balance') + (income - expenses),
+        'row_count': F('row_count') + rows,
+        'updated_at': timezone.now(),
+    }
+    if summaries.update(**changes) or rows <= 0:
+        # A removal never creates a summary: the condominium may be being deleted.
+        return
+    try:
+        with transaction.atomic():
+            FinancialSummary.objects.create(
+                condominium_id_id=condominium_id,
+                month=month,
+                total_income=income,
+                total_expenses=expenses,
+                balance=income - expenses,
+                row_count=rows,
+            )
+    except IntegrityError:
+        # Another request created the month first.
+        summaries.update(**changes)
+
+
+def update_summaries(added=(), removed=()):
+    """ Add the `added` FinancialStat rows to their summaries and take out the `removed` ones. """
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for sign, financial_stats in ((1, added), (-1, removed)):
+        for financial_stat in financial_stats:
+            delta = deltas[financial_stat.condominium_id_id, month_of(financial_stat.created_at)]
+            delta[0] += sign * amount(financial_stat.income)
+            delta[1] += sign * amount(financial_stat.expenses)
+            delta[2] += sign
+    for (condominium_id, month), (income, expenses, rows) in deltas.items():
+        apply_delta(condominium_id, month, income, expenses, rows)
+
+    emptied = {condominium_id for (condominium_id, month), delta in deltas.items() if delta[2] < 0}
+    if emptied:
+        FinancialSummary.objects.filter(condominium_id__in=emptied, row_count=0).delete()
+
+
+def rebuild(condominium_ids=None):
+    """ Compute the summaries again from the FinancialStat rows. """
+    financial_stats = FinancialStat.objects.all()
+    summaries = FinancialSummary.objects.all()
+    if condominium_ids is not None:
+        financial_stats = financial_stats.filter(condominium_id__in=condominium_ids)
+        summaries = summaries.filter(condominium_id__in=condominium_ids)
+
+    rows = (
+        financial_stats
+        .annotate(month=TruncMonth('created_at', output_field=DateField()))
+        .order_by()
+        .values('condominium_id', 'month')
+        .annotate(total_income=Sum('income'), total_expenses=Sum('expenses'), row_count=Count('id'))
+    )
+    with transaction.atomic():
+        summaries.delete()
+        return FinancialSummary.objects.bulk_create(
+            FinancialSummary(
+                condominium_id_id=row['condominium_id'],
+                month=row['month'],
+                total_income=row['total_income'],
+                total_expenses=row['total_expenses'],
+                balance=row['total_income'] - row['total_expenses'],
+                row_count=row['row_count'],
+            )
+            for row in rows
+        )
@@ -0,0 +1,84 @@
+"""
+Database routing to the read replicas.
+
+`ReplicaRoutingMiddleware` picks a replica (DATABASE_REPLICAS) for every
+GET, HEAD and OPTIONS request; the reads of the request go to it and the
+writes to the primary. The first write pins the rest of the request to
+the primary, so a request reads what it has written. Outside a request
+(commands, the email worker) everything goes to the primary.
+"""
+
+# Python
+import contextvars
+import random
+
+# Django
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class RoutingState:
+    """ Replica of the current request, None once it must use the primary. """
+
+    def __init__(self, replica):
+        self.replica = replica
+
+
+# The state is mutable so a write in a thread of the async pools (which
+# runs a copy of the context) pins the request too.
+routing_state = contextvars.ContextVar('routing_state', default=None)
+
+
+def start_request(read_only):
+    """ Route the reads of the request to a replica when it is read-only, returns the token of `end_request`. """
+    replicas = settings.DATABASE_REPLICAS
+    replica = random.choice(replicas) if read_only and replicas else None
+    return routing_state.set(RoutingState(replica))
+
+
+def end_request(token):
+    routing_state.reset(token)
+
+
+def use_primary():
+    """ Send the next reads of the current request to the primary. """
+    state = routing_state.get()
+    if state is not None:
+        state.replica = None
+
+
+class ReplicaRouter:
+    """ Reads of read-only requests to their replica, everything else to the primary. """
+
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        if state is None or state.replica is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        use_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas have the same rows as the primary.
+        return True
+
+
+def close_unusable_connections(**kwargs):
+    """
+    Health check of the persistent connections at the start of a request.
+
+    Django 3.2 only closes the connections past CONN_MAX_AGE or with
+    errors; a connection dropped by the server (failover, wait_timeout)
+    would fail the first query of the request. Enabled by
+    `CONN_HEALTH_CHECKS` in the settings of the database.
+    """
+    for connection in connections.all():
+        if (
+            connection.connection is not None
+            and connection.settings_dict.get('CONN_HEALTH_CHECKS')
+            and not connection.in_atomic_block
+            and not connection.is_usable()
+        ):
+            connection.close()
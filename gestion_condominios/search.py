@@ -0,0 +1,176 @@
+"""
+Full-text search over the suggestions and the priorities.
+
+The inverted index lives in SearchPosting: one row per (term, object) with
+the occurrences of the term weighted by field. Text is lowercased,
+accent-folded and split into words; Spanish stop words are dropped and
+plurals reduced, the same way for documents and queries. Ranking is TF-IDF
+computed by the database in one grouped query, so it works on MySQL and
+SQLite.
+"""
+
+# Python
+import math
+import re
+import unicodedata
+from collections import Counter
+
+# Django
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, Sum, Value, When
+
+# Models
+from .models import Comment, PriorityOrUpgrade, SearchPosting
+
+STOP_WORDS = frozenset('''
+    a al algo ante con contra de del desde donde durante e el ella ellas ellos en entre era es esa
+    ese eso esta este esto estos estas fue ha hay la las le les lo los mas me mi muy nada ni no nos
+    o os otra otro para pero poco por que quien se sea ser si sin sobre su sus tambien te tiene
+    todo tu un una uno unos unas y ya yo
+'''.split())
+
+WORD = re.compile(r'\w+')
+
+# Field weights of every kind of document.
+FIELDS = {
+    SearchPosting.COMMENT: (Comment, {'comment_title': 3, 'comment': 1, 'flaw_title': 3, 'flaw': 1}),
+    SearchPosting.PRIORITY: (PriorityOrUpgrade, {'name': 3, 'detail': 1}),
+}
+KINDS = {model: kind for kind, (model, fields) in FIELDS.items()}
+
+DOCUMENT_COUNT_CACHE_KEY = 'search-document-count'
+
+
+def fold(text):
+    """ Lowercase without accents: 'Ascensor Dañado' -> 'ascensor danado'. """
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def stem(word):
+    """ Light Spanish plural reduction: 'paredes' -> 'pared', 'ventanas' -> 'ventana'. """
+    if len(word) > 5 and word.endswith('es'):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    return [
+        stem(word)[:64]
+        for word in WORD.findall(fold(text or ''))
+        if len(word) > 1 and word not in STOP_WORDS and not word.isdigit()
+    ]
+
+
+def build_postings(kind, instance):
+    model, fields = FIELDS[kind]
+    weights = Counter()
+    for field, weight in fields.items():
+        for term in tokenize(getattr(instance, field)):
+            weights[term] += weight
+    return [
+        SearchPosting(
+            term=term,
+            kind=kind,
+            object_id=instance.pk,
+            condominium_id_id=instance.condominium_id_id,
+            weight=weight,
+        )
+        for term, weight in weights.items()
+    ]
+
+
+def with_primary_keys(model, instances):
+    """ Bulk created instances have no pk on MySQL: read them back by condominium and created_at. """
+    if all(instance.pk is not None for instance in instances):
+        return instances
+    return list(model.objects.filter(
+        condominium_id__in={instance.condominium_id_id for instance in instances},
+        created_at__in=[instance.created_at for instance in instances],
+    ))
+
+
+@transaction.atomic
+def index_objects(instances):
+    """ Replace the postings of saved comments or priorities. """
+    if not instances:
+        return
+    kind = KINDS[type(instances[0])]
+    instances = with_primary_keys(type(instances[0]), instances)
+    SearchPosting.objects.filter(kind=kind, object_id__in=[instance.pk for instance in instances]).delete()
+    SearchPosting.objects.bulk_create(
+        (posting for instance in instances for posting in build_postings(kind, instance)),
+        batch_size=1000,
+    )
+
+
+def remove_objects(model, object_ids):
+    SearchPosting.objects.filter(kind=KINDS[model], object_id__in=object_ids).delete()
+
+
+def rebuild(chunk_size=1000):
+    """ Index every comment and priority again. Returns the number of documents. """
+    SearchPosting.objects.all().delete()
+    documents = 0
+    for model, kind in KINDS.items():
+        last_pk = 0
+        while True:
+            chunk = list(model.objects.filter(pk__gt=last_pk).order_by('pk')[:chunk_size])
+            if not chunk:
+                break
+            index_objects(chunk)
+            documents += len(chunk)
+            last_pk = chunk[-1].pk
+    cache.delete(DOCUMENT_COUNT_CACHE_KEY)
+    return documents
+
+
+def document_count():
+    """ Number of indexed documents for the IDF, cached because COUNT(*) is slow on big tables. """
+    count = cache.get(DOCUMENT_COUNT_CACHE_KEY)
+    if count is None:
+        count = Comment.objects.count() + PriorityOrUpgrade.objects.count()
+        cache.set(DOCUMENT_COUNT_CACHE_KEY, count, 3600)
+    return count
+
+
+def search(query, kind=None, condominium_id=None, limit=20):
+    """
+    Rank the documents that contain the terms of the query.
+
+    Returns (kind, object_id, score) tuples, best first.
+    """
+    terms = set(tokenize(query))
+    if not terms:
+        return []
+    postings = SearchPosting.objects.filter(term__in=terms)
+    if kind:
+        postings = postings.filter(kind=kind)
+    if condominium_id:
+        postings = postings.filter(condominium_id=condominium_id)
+
+    frequencies = dict(
+        postings.order_by().values_list('term').annotate(Count('id'))
+    )
+    if not frequencies:
+        return []
+    documents = max(document_count(), max(frequencies.values()))
+    score = Sum(Case(
+        *[
+            When(term=term, then=ExpressionWrapper(
+                F('weight') * Value(math.log(1 + documents / frequency)), output_field=FloatField(),
+            ))
+            for term, frequency in frequencies.items()
+        ],
+        output_field=FloatField(),
+    ))
+    ranked = (
+        postings.order_by()
+        .values('kind', 'object_id')
+        .annotate(score=score)
+        .order_by('-score', 'kind', 'object_id')[:limit]
+    )
+    return [(row['kind'], row['object_id'], row['score']) for row in ranked]
@@ -1,17 +1,28 @@
 """ Serializers. """
 
+# Python
+from collections import Counter
+
 # Django
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, transaction
 
 # Django REST Framework
 from rest_framework import serializers
 from rest_framework.authtoken.models import Token
 
 # Models
-from .models import Condominium, Department, FinancialStat, PriorityOrUpgrade, Comment, ProfileHabitant
+from .models import Condominium, Department, FinancialStat, FinancialSummary, PriorityOrUpgrade, Comment, ProfileHabitant
+
+# Utils
+from .emails import queue_emails
+from .hashing import hash_passwords
+from .signals import post_bulk_create
+from .sparse import SparseFieldsMixin
 
 
 class UserLoginSerializer(serializers.Serializer):
@@ -63,7 +74,7 @@ class DepartmentModelSerializer(serializers.ModelSerializer):
         )
 
 
-class CondominiumModelSerializer(serializers.ModelSerializer):
+class CondominiumModelSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Condominium model serializer. """
 
     departments = DepartmentModelSerializer(many=True)
@@ -77,7 +88,7 @@ class CondominiumModelSerializer(serializers.ModelSerializer):
             'departments',
         )
 
-class FinancialStatusModelSerializer(serializers.ModelSerializer):
+class FinancialStatusModelSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Financial status model serializer. """
 
     class Meta:
@@ -90,9 +101,14 @@ class FinancialStatusModelSerializer(serializers.ModelSerializer):
             'expenses',
             'details',
         )
+        # The amounts are exact decimals, still sent as JSON numbers.
+        extra_kwargs = {
+            'income': {'coerce_to_string': False},
+            'expenses': {'coerce_to_string': False},
+        }
 
 
-class CondominiumStatusModelSerializer(serializers.ModelSerializer):
+class CondominiumStatusModelSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Condominium status model serializer. """
 
     financial_status = FinancialStatusModelSerializer(many=True)
@@ -105,19 +121,24 @@ class CondominiumStatusModelSerializer(serializers.ModelSerializer):
             'name_condominium',
             'financial_status',
         )
+        # The condominium already exists, it is looked up by name in create().
+        extra_kwargs = {'name_condominium': {'validators': []}}
     
+    @transaction.atomic
     def create(self, validated_data):
         financial_data = validated_data.pop('financial_status')
         try: 
             financial = Condominium.objects.get(name_condominium=validated_data['name_condominium'])
-            for f_data in financial_data:
-                FinancialStat.objects.create(condominium_id=financial, **f_data)
-                return financial
         except ObjectDoesNotExist:
             raise serializers.ValidationError("The name of the condominium doesn't match with any of them.")
+        financial_stats = FinancialStat.objects.bulk_create(
+            FinancialStat(condominium_id=financial, **f_data) for f_data in financial_data
+        )
+        post_bulk_create.send(sender=FinancialStat, instances=financial_stats)
+        return financial
             
 
-class NamesCondominiumsModelSerializer(serializers.ModelSerializer):
+class NamesCondominiumsModelSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Names list of condominiums model serializer. """
     class Meta:
         """ Meta class. """
@@ -127,7 +148,17 @@ class NamesCondominiumsModelSerializer(serializers.ModelSerializer):
             'name_condominium',
         )
 
-class GetPriorityOrUpgradeByPKModelSerializer(serializers.ModelSerializer):
+class WorkflowFlagsMixin(serializers.Serializer):
+    """ Flags of the API over the `kind` and `status` columns of PriorityOrUpgrade. """
+
+    priority = serializers.BooleanField(required=False)
+    upgrade  = serializers.BooleanField(required=False)
+    to_do    = serializers.BooleanField(required=False)
+    doing    = serializers.BooleanField(required=False)
+    done     = serializers.BooleanField(required=False)
+
+
+class GetPriorityOrUpgradeByPKModelSerializer(SparseFieldsMixin, WorkflowFlagsMixin, serializers.ModelSerializer):
     """ Get the priority or upgrade by a pk model serializer. """
 
     condominium_data = serializers.SerializerMethodField('get_data_from_condominium')
@@ -144,18 +175,23 @@ class GetPriorityOrUpgradeByPKModelSerializer(serializers.ModelSerializer):
             'to_do',
             'doing',
             'done',
+            'status',
+            'kind',
             'condominium_data'
         )
+        # Relations of `?expand=`, with the path to select_related.
+        expandable_fields = {'condominium_data': 'condominium_id'}
 
-    def get_data_from_condominium(self, request):
+    def get_data_from_condominium(self, obj):
+        """ Condominium of the item, the view must select_related('condominium_id'). """
         condominium_data = {
-            'id': request.condominium_id.id,
-            'name_condominium': request.condominium_id.name_condominium
+            'id': obj.condominium_id_id,
+            'name_condominium': obj.condominium_id.name_condominium
         }
         return condominium_data
 
 
-class PriorityOrUpgradeModelSerializer(serializers.ModelSerializer):
+class PriorityOrUpgradeModelSerializer(SparseFieldsMixin, WorkflowFlagsMixin, serializers.ModelSerializer):
     """ Priority or upgrade model serializer. """
     class Meta:
         """ Meta class. """
@@ -169,10 +205,12 @@ class PriorityOrUpgradeModelSerializer(serializers.ModelSerializer):
             'to_do',
             'doing',
             'done',
+            'status',
+            'kind',
         )
 
 
-class CondominiumPriorityOrUpgradeModelSerializer(serializers.ModelSerializer):
+class CondominiumPriorityOrUpgradeModelSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Condominium priority or upgrade model serializer. """
 
     condominium_data = PriorityOrUpgradeModelSerializer(many=True)
@@ -185,19 +223,24 @@ class CondominiumPriorityOrUpgradeModelSerializer(serializers.ModelSerializer):
             'name_condominium',
             'condominium_data',
         )
+        # The condominium already exists, it is looked up by name in create().
+        extra_kwargs = {'name_condominium': {'validators': []}}
     
+    @transaction.atomic
     def create(self, validated_data):
         detail_data = validated_data.pop('condominium_data')
         try: 
             detail = Condominium.objects.get(name_condominium=validated_data['name_condominium'])
-            for d_data in detail_data:
-                PriorityOrUpgrade.objects.create(condominium_id=detail, **d_data)
-                return detail
         except ObjectDoesNotExist:
             raise serializers.ValidationError("The name of the condominium doesn't match with any of them.")
+        items = PriorityOrUpgrade.objects.bulk_create(
+            PriorityOrUpgrade(condominium_id=detail, **d_data) for d_data in detail_data
+        )
+        post_bulk_create.send(sender=PriorityOrUpgrade, instances=items)
+        return detail
 
 
-class SuggestionsModelSerializer(serializers.ModelSerializer):
+class SuggestionsModelSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Suggestions model serializer. """
     
     class Meta:
@@ -212,7 +255,7 @@ class SuggestionsModelSerializer(serializers.ModelSerializer):
         )
 
     
-class CondominiumSuggestionModelSerializer(serializers.ModelSerializer):
+class CondominiumSuggestionModelSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Condominium suggestion model serializer. """
     condominium_suggestions = SuggestionsModelSerializer(many=True)
 
@@ -224,16 +267,21 @@ class CondominiumSuggestionModelSerializer(serializers.ModelSerializer):
             'name_condominium',
             'condominium_suggestions',
         )
+        # The condominium already exists, it is looked up by name in create().
+        extra_kwargs = {'name_condominium': {'validators': []}}
 
+    @transaction.atomic
     def create(self, validated_data):
         suggestions_data = validated_data.pop('condominium_suggestions')
         try: 
             detail = Condominium.objects.get(name_condominium=validated_data['name_condominium'])
-            for s_data in suggestions_data:
-                Comment.objects.create(condominium_id=detail, **s_data)
-                return detail
         except ObjectDoesNotExist:
             raise serializers.ValidationError("The name of the Condominium doesn't match with any of them.")
+        comments = Comment.objects.bulk_create(
+            Comment(condominium_id=detail, **s_data) for s_data in suggestions_data
+        )
+        post_bulk_create.send(sender=Comment, instances=comments)
+        return detail
 
 
 class ProfileUserModelSerializer(serializers.ModelSerializer):
@@ -256,4 +304,218 @@ class ChangePasswordSerializer(serializers.Serializer):
     """ Serializer to change the password when update it. """
 
     old_password = serializers.CharField(required=True, min_length=8)
-    new_password = serializers.CharField(required=True, min_length=8)
\ No newline at end of file
+    new_password = serializers.CharField(required=True, min_length=8)
+
+class ResidentInvitationSerializer(serializers.Serializer):
+    """ A resident of a bulk invitation, same data as `register-and-invite/`. """
+
+    username           = serializers.CharField(max_length=150)
+    email              = serializers.EmailField()
+    password           = serializers.CharField(min_length=8)
+    name_owner         = serializers.CharField(max_length=150)
+    number_department  = serializers.IntegerField(min_value=0, max_value=9999)
+    number_block       = serializers.IntegerField(min_value=0, max_value=9999)
+    number_habitants   = serializers.IntegerField(min_value=0, max_value=4, default=0)
+    p_number           = serializers.CharField(max_length=16, validators=[ProfileHabitant.phone_regex])
+    p_number_emergency = serializers.CharField(max_length=16, validators=[ProfileHabitant.phone_regex])
+
+
+class BulkInvitationSerializer(serializers.Serializer):
+    """
+    Create the users, departments and profiles of many residents of a condominium.
+
+    Everything is validated before writing, then every table gets one
+    bulk_create inside a single transaction. A username or department
+    created by a concurrent request after the validation is a 400 too.
+    """
+
+    name_condominium = serializers.CharField(max_length=200)
+    residents        = ResidentInvitationSerializer(many=True, allow_empty=False)
+
+    def validate_name_condominium(self, value):
+        try:
+            self.context['condominium'] = Condominium.objects.get(name_condominium=value)
+        except ObjectDoesNotExist:
+            raise serializers.ValidationError("The name of the condominium doesn't match with any of them.")
+        return value
+
+    def validate_residents(self, residents):
+        usernames = [resident['username'] for resident in residents]
+        repeated = {username for username, count in Counter(usernames).items() if count > 1}
+        if repeated:
+            raise serializers.ValidationError(f'Repeated usernames: {", ".join(sorted(repeated))}.')
+        existing = User.objects.filter(username__in=usernames).values_list('username', flat=True)
+        if existing:
+            raise serializers.ValidationError(f'The usernames already exist: {", ".join(sorted(existing))}.')
+
+        departments = [(resident['number_block'], resident['number_department']) for resident in residents]
+        if len(set(departments)) != len(departments):
+            raise serializers.ValidationError('A department is repeated.')
+        return residents
+
+    def validate(self, data):
+        condominium = self.context['condominium']
+        departments = {(resident['number_block'], resident['number_department']) for resident in data['residents']}
+        existing = Department.objects.filter(condominium_id=condominium).values_list('department_block', 'department_number')
+        taken = departments.intersection(existing)
+        if taken:
+            raise serializers.ValidationError({'residents': [
+                'The departments already exist (block, number): '
+                + ', '.join(f'({block}, {number})' for block, number in sorted(taken)) + '.'
+            ]})
+        return data
+
+    @transaction.atomic
+    def create(self, validated_data):
+        condominium = self.context['condominium']
+        residents = validated_data['residents']
+
+        passwords = hash_passwords(resident['password'] for resident in residents)
+        try:
+            User.objects.bulk_create(
+                User(
+                    username=resident['username'],
+                    email=resident['email'],
+                    first_name=resident['name_owner'],
+                    password=password,
+                )
+                for resident, password in zip(residents, passwords)
+            )
+        except IntegrityError:
+            raise serializers.ValidationError({'residents': ['One of the usernames was just created, try again.']})
+        try:
+            created_departments = Department.objects.bulk_create(
+                Department(
+                    condominium_id=condominium,
+                    department_number=resident['number_department'],
+                    department_block=resident['number_block'],
+                    number_habitants=resident['number_habitants'],
+                    department_owner=resident['name_owner'],
+                )
+                for resident in residents
+            )
+        except IntegrityError:
+            raise serializers.ValidationError({'residents': ['One of the departments was just created, try again.']})
+        post_bulk_create.send(sender=Department, instances=created_departments)
+
+        # MySQL doesn't return the primary keys of a bulk insert, read them back.
+        users = User.objects.in_bulk([resident['username'] for resident in residents], field_name='username')
+        departments = {
+            (department.department_block, department.department_number): department
+            for department in Department.objects.filter(condominium_id=condominium)
+        }
+        ProfileHabitant.objects.bulk_create(
+            ProfileHabitant(
+                user=users[resident['username']],
+                p_number=resident['p_number'],
+                p_number_emergency=resident['p_number_emergency'],
+                department_id=departments[resident['number_block'], resident['number_department']],
+            )
+            for resident in residents
+        )
+        queue_emails(
+            (
+                resident['email'],
+                'Invitación para unirse al condominio',
+                'verify_account.html',
+                {'username': resident['username'], 'password': resident['password']},
+            )
+            for resident in residents
+        )
+        return [users[resident['username']] for resident in residents]
+
+
+class FinancialSummaryModelSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """ Monthly financial summary model serializer. """
+    class Meta:
+        """ Meta class. """
+        model = FinancialSummary
+        fields = (
+            'month',
+            'total_income',
+            'total_expenses',
+            'balance',
+            'row_count',
+        )
+        extra_kwargs = {
+            'total_income': {'coerce_to_string': False},
+            'total_expenses': {'coerce_to_string': False},
+            'balance': {'coerce_to_string': False},
+        }
+
+
+class SyncFinancialStatusModelSerializer(FinancialStatusModelSerializer):
+    """ Financial status of the delta sync, with their id. """
+
+    class Meta(FinancialStatusModelSerializer.Meta):
+        """ Meta class. """
+        fields = ('id', 'updated_at') + FinancialStatusModelSerializer.Meta.fields
+
+
+class SyncSuggestionsModelSerializer(SuggestionsModelSerializer):
+    """ Suggestions of the delta sync, with their id. """
+
+    class Meta(SuggestionsModelSerializer.Meta):
+        """ Meta class. """
+        fields = ('id', 'created_at', 'updated_at') + SuggestionsModelSerializer.Meta.fields
+
+
+class SyncPriorityOrUpgradeModelSerializer(PriorityOrUpgradeModelSerializer):
+    """ Priorities and upgrades of the delta sync. """
+
+    class Meta(PriorityOrUpgradeModelSerializer.Meta):
+        """ Meta class. """
+        fields = PriorityOrUpgradeModelSerializer.Meta.fields + ('created_at', 'updated_at')
+
+
+class SubRequestSerializer(serializers.Serializer):
+    """ Request of a batch. """
+    method = serializers.ChoiceField(choices=('GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE'), default='GET')
+    path = serializers.CharField(max_length=2000)
+    body = serializers.JSONField(required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    """ Requests of a batch, at most BATCH_MAX_REQUESTS. """
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, requests):
+        if len(requests) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(f'A batch has at most {settings.BATCH_MAX_REQUESTS} requests.')
+        return requests
+
+
+class FinancialFilterSerializer(serializers.Serializer):
+    """ Query parameters filtering the financial status: `from` and `to` dates (included) and `type_detail`. """
+    type_detail = serializers.CharField(required=False, max_length=100)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # `from` is a keyword, it can't be declared.
+        fields['from'] = serializers.DateField(required=False)
+        fields['to'] = serializers.DateField(required=False)
+        return fields
+
+    def validate(self, data):
+        if data.get('from') and data.get('to') and data['from'] > data['to']:
+            raise serializers.ValidationError({'to': '`to` must not be before `from`.'})
+        return {'start': data.get('from'), 'end': data.get('to'), 'type_detail': data.get('type_detail')}
+
+
+class FinancialSeriesQuerySerializer(FinancialFilterSerializer):
+    """ Query parameters of the financial time series. """
+    bucket = serializers.ChoiceField(choices=('day', 'week', 'month', 'year'), default='month')
+
+    def validate(self, data):
+        return dict(super().validate(data), bucket=data['bucket'])
+
+
+class FinancialSeriesSerializer(serializers.Serializer):
+    """ Totals of a period of the financial time series. """
+    period = serializers.DateField()
+    total_income = serializers.DecimalField(max_digits=16, decimal_places=2, coerce_to_string=False)
+    total_expenses = serializers.DecimalField(max_digits=16, decimal_places=2, coerce_to_string=False)
+    balance = serializers.DecimalField(max_digits=16, decimal_places=2, coerce_to_string=False)
+    average_income = serializers.DecimalField(max_digits=16, decimal_places=2, coerce_to_string=False)
+    average_expenses = serializers.DecimalField(max_digits=16, decimal_places=2, coerce_to_string=False)
+    row_count = serializers.IntegerField()
@@ -0,0 +1,63 @@
+"""
+Filters and time series of the financial status of a condominium.
+
+The series groups the rows by day, week (starting on Monday), month or
+year of `created_at` in the current time zone, with the sums and the
+averages of `income` and `expenses`, in one GROUP BY query that uses the
+(condominium_id, created_at) index.
+"""
+
+# Python
+from datetime import datetime, time, timedelta
+
+# Django
+from django.db.models import Avg, Count, DateField, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek, TruncYear
+from django.utils import timezone
+
+# Models
+from .models import FinancialStat
+
+BUCKETS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'year': TruncYear,
+}
+
+
+def start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_financial_status(queryset, start=None, end=None, type_detail=None):
+    """ Rows created from the `start` date to the `end` date (both included) with the `type_detail`. """
+    if start is not None:
+        queryset = queryset.filter(created_at__gte=start_of(start))
+    if end is not None:
+        queryset = queryset.filter(created_at__lt=start_of(end + timedelta(days=1)))
+    if type_detail:
+        queryset = queryset.filter(type_detail=type_detail)
+    return queryset
+
+
+def series(condominium_id, bucket='month', start=None, end=None, type_detail=None):
+    """ Totals, averages and rows of every period with rows, in order. """
+    queryset = filter_financial_status(
+        FinancialStat.objects.filter(condominium_id=condominium_id), start, end, type_detail,
+    )
+    return (
+        queryset
+        .annotate(period=BUCKETS[bucket]('created_at', output_field=DateField()))
+        .order_by()
+        .values('period')
+        .annotate(
+            total_income=Sum('income'),
+            total_expenses=Sum('expenses'),
+            balance=Sum('income') - Sum('expenses'),
+            average_income=Avg('income'),
+            average_expenses=Avg('expenses'),
+            row_count=Count('id'),
+        )
+        .order_by('period')
+    )
@@ -0,0 +1,150 @@
+""" Signals. """
+
+# Django
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+# Django REST Framework
+from rest_framework.authtoken.models import Token
+
+# Models
+from .models import Comment, Condominium, Department, FinancialStat, PriorityOrUpgrade, Tombstone
+
+# Authentication
+from .authentication import token_cache_key
+
+# Rollups, response cache and search index
+from . import caching, rollups, search
+
+# Database connections
+from .routers import close_unusable_connections
+
+# Sent after a bulk_create of the nested items of a condominium, because
+# bulk_create doesn't send post_save. `instances` are the created objects,
+# on MySQL they don't have a primary key.
+post_bulk_create = Signal()
+
+
+@receiver(pre_save, sender=FinancialStat)
+def remember_previous_financial_stat(sender, instance, **kwargs):
+    """ Keep the stored values of an updated row to take them out of its summary. """
+    instance._previous = None
+    if instance.pk is not None:
+        instance._previous = (
+            sender.objects.only('condominium_id', 'created_at', 'income', 'expenses')
+            .filter(pk=instance.pk).first()
+        )
+
+
+@receiver(post_save, sender=FinancialStat)
+def update_financial_summary(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    rollups.update_summaries(added=[instance], removed=[previous] if previous else [])
+
+
+@receiver(post_delete, sender=FinancialStat)
+def remove_from_financial_summary(sender, instance, **kwargs):
+    rollups.update_summaries(removed=[instance])
+
+
+@receiver(post_bulk_create, sender=FinancialStat)
+def add_to_financial_summary(sender, instances, **kwargs):
+    rollups.update_summaries(added=instances)
+
+
+
+# The cached tokens are forgotten after the commit too, or a request could
+# cache them again before it. The key is the pk, cleared by the delete.
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    key = token_cache_key(instance.key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, created, **kwargs):
+    """ The cached user may be deactivated or have a new password. """
+    if not created:
+        keys = [token_cache_key(key) for key in Token.objects.filter(user=instance).values_list('key', flat=True)]
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+
+# The responses are invalidated after the commit: a request reading the
+# rows before it would cache them under the new generation.
+
+@receiver([post_save, post_delete], sender=Condominium)
+def invalidate_condominium_responses(sender, instance, **kwargs):
+    # The priorities show the name of their condominium. The ids are read
+    # now: a deleted instance has no pk after the commit.
+    condominium_id = instance.pk
+    priorities = list(instance.condominium_data.values_list('pk', flat=True))
+
+    def invalidate():
+        caching.invalidate('names')
+        caching.invalidate('condominium', condominium_id)
+        caching.invalidate('priority', *priorities)
+    transaction.on_commit(invalidate)
+
+
+def invalidate_nested_responses(sender, instance, **kwargs):
+    condominium_id, object_id = instance.condominium_id_id, instance.pk
+    transaction.on_commit(lambda: caching.invalidate('condominium', condominium_id))
+    if sender is PriorityOrUpgrade:
+        transaction.on_commit(lambda: caching.invalidate('priority', object_id))
+
+
+def invalidate_bulk_created_responses(sender, instances, **kwargs):
+    condominium_ids = {instance.condominium_id_id for instance in instances}
+    transaction.on_commit(lambda: caching.invalidate('condominium', *condominium_ids))
+
+
+for model in (Department, FinancialStat, Comment, PriorityOrUpgrade):
+    post_save.connect(invalidate_nested_responses, sender=model)
+    post_delete.connect(invalidate_nested_responses, sender=model)
+    post_bulk_create.connect(invalidate_bulk_created_responses, sender=model)
+
+
+
+def index_for_search(sender, instance, **kwargs):
+    search.index_objects([instance])
+
+
+def remove_from_search(sender, instance, **kwargs):
+    search.remove_objects(sender, [instance.pk])
+
+
+def index_bulk_created_for_search(sender, instances, **kwargs):
+    search.index_objects(instances)
+
+
+for model in (Comment, PriorityOrUpgrade):
+    post_save.connect(index_for_search, sender=model)
+    post_delete.connect(remove_from_search, sender=model)
+    post_bulk_create.connect(index_bulk_created_for_search, sender=model)
+
+
+request_started.connect(close_unusable_connections)
+
+
+TOMBSTONE_KINDS = {
+    FinancialStat: Tombstone.FINANCIAL_STATUS,
+    Comment: Tombstone.SUGGESTIONS,
+    PriorityOrUpgrade: Tombstone.PRIORITIES,
+}
+
+
+def write_tombstone(sender, instance, **kwargs):
+    """ The delta sync tells the clients about the deleted rows. """
+    Tombstone.objects.create(
+        kind=TOMBSTONE_KINDS[sender], object_id=instance.pk, condominium_id=instance.condominium_id_id,
+    )
+
+
+for model in TOMBSTONE_KINDS:
+    post_delete.connect(write_tombstone, sender=model)
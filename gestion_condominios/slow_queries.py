@@ -0,0 +1,166 @@
+"""
+Capture of the slow queries, enabled by SLOW_QUERY_THRESHOLD_MS.
+
+Every query slower than the threshold is logged to
+`gestion_condominios.slow_queries` with the view and the serializer that
+ran it, and added to the statistics of its fingerprint (the SQL without
+its parameters and with the `IN` lists collapsed). The first time a
+fingerprint is seen its plan is saved, from EXPLAIN.
+
+The log is kept in the memory of each process: the last
+SLOW_QUERY_LOG_SIZE slow queries and SLOW_QUERY_MAX_FINGERPRINTS
+fingerprints, dropping the one with the least total time.
+"""
+
+# Python
+import collections
+import contextvars
+import hashlib
+import json
+import logging
+import re
+import sys
+import threading
+import time
+
+# Django
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+# Django REST Framework
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger('gestion_condominios.slow_queries')
+
+IN_LIST = re.compile(r'\bIN\s*\((?:\s*%s\s*,?)+\)', re.IGNORECASE)
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+SPACES = re.compile(r'\s+')
+
+# View of the current request, set by SlowQueryMiddleware.
+current_view = contextvars.ContextVar('current_view', default=None)
+explaining = contextvars.ContextVar('explaining', default=False)
+
+
+def normalize(sql):
+    """ SQL of the fingerprint: without literals, with a single placeholder in the `IN` lists. """
+    sql = LITERAL.sub('%s', sql)
+    sql = IN_LIST.sub('IN (...)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.md5(normalize(sql).encode()).hexdigest()[:16]
+
+
+def current_serializer():
+    """ Name of the innermost serializer running the query, looking up the stack (only for slow queries). """
+    frame = sys._getframe(2)
+    while frame is not None:
+        instance = frame.f_locals.get('self')
+        if isinstance(instance, BaseSerializer):
+            return type(instance).__name__
+        frame = frame.f_back
+    return None
+
+
+class SlowQueryLog:
+    """ The last slow queries and the statistics by fingerprint. """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.recent = collections.deque(maxlen=settings.SLOW_QUERY_LOG_SIZE)
+            self.fingerprints = {}
+
+    def add(self, sql, duration, origin):
+        """ Add a slow query, returns whether its fingerprint is new. """
+        key = fingerprint(sql)
+        milliseconds = round(duration * 1000, 3)
+        with self.lock:
+            self.recent.append(dict(origin, fingerprint=key, sql=sql, ms=milliseconds, at=timezone.now().isoformat()))
+            stats = self.fingerprints.get(key)
+            new = stats is None
+            if new:
+                if len(self.fingerprints) >= settings.SLOW_QUERY_MAX_FINGERPRINTS:
+                    del self.fingerprints[min(self.fingerprints, key=lambda name: self.fingerprints[name]['total_ms'])]
+                stats = self.fingerprints[key] = {
+                    'fingerprint': key, 'sql': normalize(sql), 'count': 0, 'total_ms': 0, 'max_ms': 0,
+                    'origins': [], 'explain': None,
+                }
+            stats['count'] += 1
+            stats['total_ms'] = round(stats['total_ms'] + milliseconds, 3)
+            stats['max_ms'] = max(stats['max_ms'], milliseconds)
+            if origin not in stats['origins'] and len(stats['origins']) < 5:
+                stats['origins'].append(origin)
+        return new
+
+    def set_explain(self, key, plan):
+        with self.lock:
+            if key in self.fingerprints:
+                self.fingerprints[key]['explain'] = plan
+
+    def top(self, limit):
+        """ The fingerprints with the most total time. """
+        with self.lock:
+            ranked = sorted(self.fingerprints.values(), key=lambda stats: stats['total_ms'], reverse=True)[:limit]
+            return [
+                dict(stats, mean_ms=round(stats['total_ms'] / stats['count'], 3), origins=list(stats['origins']))
+                for stats in ranked
+            ]
+
+
+slow_query_log = SlowQueryLog()
+
+
+def explain(connection, sql, params):
+    """ Plan of the query, in a savepoint so a failure doesn't break the transaction of the request. """
+    token = explaining.set(True)
+    try:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+    except DatabaseError as error:
+        return f'EXPLAIN failed: {error}'
+    finally:
+        explaining.reset(token)
+
+
+def capture_slow_query(execute, sql, params, many, context):
+    """ Execute wrapper of every connection, captures the queries slower than SLOW_QUERY_THRESHOLD_MS. """
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if not threshold or explaining.get():
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        if duration * 1000 >= threshold:
+            record_slow_query(context['connection'], sql, params, many, duration)
+
+
+def record_slow_query(connection, sql, params, many, duration):
+    origin = {'view': current_view.get(), 'serializer': current_serializer()}
+    logger.warning(json.dumps(dict(origin, sql=sql, ms=round(duration * 1000, 3), database=connection.alias)))
+    new = slow_query_log.add(sql, duration, origin)
+    # EXPLAIN of writes could run them on some databases.
+    if new and not many and connection.features.supports_explaining_query_execution \
+            and sql.lstrip().upper().startswith('SELECT'):
+        slow_query_log.set_explain(fingerprint(sql), explain(connection, sql, params))
+
+
+def add_slow_query_capture(sender=None, connection=None, **kwargs):
+    if capture_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(capture_slow_query)
+
+
+def install():
+    """ Hook the capture into every database connection, once. """
+    connection_created.connect(add_slow_query_capture)
+    for connection in connections.all():
+        add_slow_query_capture(connection=connection)
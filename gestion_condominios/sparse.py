@@ -0,0 +1,141 @@
+"""
+Sparse fieldsets and nested expansion for the read endpoints.
+
+`?fields=id,name_condominium,financial_status.income` keeps only the listed
+fields; a `relation.field` entry keeps the relation with those fields.
+`?expand=departments` lists the relations (nested collections) to include,
+the others are dropped; without it every relation named by `fields` (or
+every relation, without `fields`) is included.
+
+The same pruned serializer decides the queryset: unrequested relations are
+not prefetched and unrequested columns are deferred.
+"""
+
+# Django
+from django.db.models import Prefetch
+
+# Django REST Framework
+from rest_framework import serializers
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def parse_field_tree(value):
+    """ 'id,departments.department_number' -> {'id': {}, 'departments': {'department_number': {}}} """
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in filter(None, (part.strip() for part in path.split('.'))):
+            node = node.setdefault(name, {})
+    return tree or None
+
+
+def get_sparse_options(request):
+    """ Field tree and expanded relations of the request, None when they aren't given. """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, None
+    fields = request.query_params.get('fields')
+    expand = request.query_params.get('expand')
+    tree = parse_field_tree(fields) if fields else None
+    relations = None if expand is None else {name.strip() for name in expand.split(',') if name.strip()}
+    return tree, relations
+
+
+def nested_model_serializer(field):
+    child = field.child if isinstance(field, serializers.ListSerializer) else field
+    return child if isinstance(child, serializers.ModelSerializer) else None
+
+
+def relation_names(serializer):
+    expandable = getattr(getattr(serializer, 'Meta', None), 'expandable_fields', {})
+    return {
+        name for name, field in serializer.fields.items()
+        if nested_model_serializer(field) is not None or name in expandable
+    }
+
+
+def prune(serializer, tree, relations=None):
+    """ Drop the fields of the serializer (and its nested serializers) not in the tree or the relations. """
+    nested_relations = relation_names(serializer)
+    for name in list(serializer.fields):
+        if name in nested_relations and relations is not None:
+            keep = name in relations
+        else:
+            keep = tree is None or name in tree
+        if not keep:
+            serializer.fields.pop(name)
+            continue
+        nested = nested_model_serializer(serializer.fields[name])
+        if nested is not None and tree and tree.get(name):
+            prune(nested, tree[name])
+
+
+class SparseFieldsMixin:
+    """ Serializer mixin applying `?fields=` and `?expand=` of the request in the context. """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        tree, relations = get_sparse_options(self.context.get('request'))
+        if tree is not None or relations is not None:
+            prune(self, tree, relations)
+
+
+def optimize_queryset(queryset, serializer, extra_columns=(), nested_filters=None):
+    """
+    Prefetch the nested collections and select the columns used by the serializer.
+
+    Columns are only deferred when every field maps to a column; fields
+    backed by a property load the whole row. `nested_filters` maps the
+    source of a nested collection to a function filtering its queryset.
+    """
+    model = queryset.model
+    concrete = {field.name for field in model._meta.concrete_fields}
+    expandable = getattr(getattr(serializer, 'Meta', None), 'expandable_fields', {})
+    columns, prefetches, related, can_defer = set(extra_columns), [], [], True
+
+    for name, field in serializer.fields.items():
+        nested = nested_model_serializer(field)
+        if isinstance(field, serializers.ListSerializer) and nested is not None:
+            foreign_key = model._meta.get_field(field.source).field.name
+            nested_queryset = optimize_queryset(nested.Meta.model.objects.all(), nested, (foreign_key,))
+            if nested_filters and field.source in nested_filters:
+                nested_queryset = nested_filters[field.source](nested_queryset)
+            prefetches.append(Prefetch(field.source, queryset=nested_queryset))
+        elif name in expandable:
+            related.append(expandable[name])
+            columns.add(expandable[name])
+        elif field.source in concrete:
+            columns.add(field.source)
+        else:
+            can_defer = False
+
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    if related:
+        queryset = queryset.select_related(*related)
+    if can_defer:
+        queryset = queryset.only(*columns)
+    return queryset
+
+
+class SparseQuerysetMixin:
+    """ View mixin fetching only what the (pruned) serializer of a GET request renders. """
+
+    def get_nested_filters(self):
+        """ Filters of the nested collections, see `optimize_queryset`. """
+        return None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        # The cursor pagination reads its ordering columns from the rows.
+        ordering = getattr(self.pagination_class, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        return optimize_queryset(
+            queryset,
+            self.get_serializer(),
+            extra_columns=[column.lstrip('-') for column in ordering],
+            nested_filters=self.get_nested_filters(),
+        )
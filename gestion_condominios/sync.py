@@ -0,0 +1,105 @@
+"""
+Delta sync of a condominium for the mobile clients.
+
+The sync answers the rows of every synced model created or updated since
+a cursor (by `updated_at`) and the ids of the rows deleted since then
+(the tombstones written by the post_delete signals), with the cursor of
+the next sync. Without a cursor, or with one older than the retention of
+the tombstones, it answers every row and `reset`: the client must
+replace its data.
+
+`updated_at` is set by the application when the row is saved, before the
+transaction commits, and the reads may go to a replica behind the
+primary. The rows are compared with the cursor minus SYNC_SAFETY_MARGIN
+so those late rows aren't missed; a row can be sent again by the next
+sync, the clients upsert them by id. Updates with `queryset.update()`
+must set `updated_at` themselves.
+"""
+
+# Python
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+# Django
+from django.conf import settings
+from django.utils import timezone
+
+# Models
+from .models import Comment, FinancialStat, PriorityOrUpgrade, Tombstone
+
+# Serializers
+from .serializers import (
+    SyncFinancialStatusModelSerializer, SyncPriorityOrUpgradeModelSerializer, SyncSuggestionsModelSerializer,
+)
+
+SYNCED = (
+    (Tombstone.FINANCIAL_STATUS, FinancialStat, SyncFinancialStatusModelSerializer),
+    (Tombstone.SUGGESTIONS, Comment, SyncSuggestionsModelSerializer),
+    (Tombstone.PRIORITIES, PriorityOrUpgrade, SyncPriorityOrUpgradeModelSerializer),
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(moment):
+    data = json.dumps({'t': moment.timestamp()}).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Moment of a cursor of `encode_cursor`, at most now.
+
+    The clocks of the web processes may differ: a cursor up to
+    SYNC_SAFETY_MARGIN seconds in the future is read as now.
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        moment = datetime.fromtimestamp(float(data['t']), dt_timezone.utc)
+    except (binascii.Error, ValueError, TypeError, KeyError, OverflowError, OSError):
+        raise InvalidCursor('Invalid cursor.')
+    now = timezone.now()
+    if moment > now + timedelta(seconds=settings.SYNC_SAFETY_MARGIN):
+        raise InvalidCursor('Invalid cursor.')
+    return min(moment, now)
+
+
+def retention():
+    return timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+
+
+def changes(condominium, since=None, context=None):
+    """ Rows of the condominium changed since the moment (every row without it) and the deleted ids. """
+    now = timezone.now()
+    margin = timedelta(seconds=settings.SYNC_SAFETY_MARGIN)
+    # The tombstones since an older cursor may have been purged.
+    reset = since is None or since - margin < now - retention()
+    threshold = None if reset else since - margin
+    after = {} if reset else {'updated_at__gte': threshold}
+    data = {'cursor': encode_cursor(now), 'reset': reset, 'condominium': None}
+
+    if reset or condominium.updated_at >= threshold:
+        data['condominium'] = {'id': condominium.pk, 'name_condominium': condominium.name_condominium}
+    for kind, model, serializer in SYNCED:
+        rows = model.objects.filter(condominium_id=condominium, **after).order_by('updated_at', 'pk')
+        data[kind] = serializer(rows, many=True, context=context or {}).data
+
+    data['deleted'] = {kind: [] for kind, model, serializer in SYNCED}
+    if not reset:
+        tombstones = (
+            Tombstone.objects.filter(condominium_id=condominium.pk, deleted_at__gte=threshold)
+            .order_by('deleted_at').values_list('kind', 'object_id')
+        )
+        for kind, object_id in tombstones:
+            data['deleted'][kind].append(object_id)
+    return data
+
+
+def purge_tombstones():
+    """ Delete the tombstones past the retention, returns how many. """
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=timezone.now() - retention()).delete()
+    return deleted
@@ -0,0 +1,196 @@
+"""
+Synthetic data for local development and the benchmarks.
+
+Every condominium gets its departments with their residents (users and
+profiles), years of monthly financial status, comments and priorities,
+spread over time. The data depends only on the arguments and the seed.
+"""
+
+# Python
+import calendar
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+# Django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+# Models
+from .models import Comment, Condominium, Department, FinancialStat, PriorityOrUpgrade, ProfileHabitant
+
+# Signals
+from .signals import post_bulk_create
+
+SYNTHETIC_PASSWORD = 'password123'
+CONDOMINIUM_PREFIX = 'Condominio sintético '
+USERNAME_PREFIX = 'synthetic-'
+
+INCOME_DETAILS = ('gastos comunes', 'arriendo de quincho', 'multas', 'estacionamiento de visitas')
+EXPENSE_DETAILS = ('mantención ascensores', 'agua caliente', 'electricidad', 'sueldos conserjería', 'jardinería')
+COMMENT_TITLES = ('ruidos molestos', 'mascotas en áreas comunes', 'basura en pasillos', 'estacionamientos', 'piscina')
+FLAW_TITLES = ('filtración de agua', 'ascensor detenido', 'luminaria quemada', 'portón eléctrico', '')
+PRIORITY_NAMES = ('pintar fachada', 'cambiar citófonos', 'cámaras de seguridad', 'reparar techumbre', 'paneles solares')
+WORDS = (
+    'vecinos', 'departamento', 'conserje', 'noche', 'semana', 'urgente', 'reparación', 'presupuesto',
+    'administración', 'torre', 'piso', 'acceso', 'pagos', 'reclamo', 'junta', 'directiva',
+)
+
+
+@contextmanager
+def explicit_created_at(*models):
+    """ Keep the `created_at` and `updated_at` given to the objects instead of the time of the insert. """
+    created = [model._meta.get_field('created_at') for model in models]
+    updated = [model._meta.get_field('updated_at') for model in models]
+    for field in created:
+        field.auto_now_add = False
+    for field in updated:
+        field.auto_now = False
+    try:
+        yield
+    finally:
+        for field in created:
+            field.auto_now_add = True
+        for field in updated:
+            field.auto_now = True
+
+
+def timestamps(moment):
+    """ Rows created at the moment and never updated. """
+    return {'created_at': moment, 'updated_at': moment}
+
+
+def sentence(random_, words=12):
+    return ' '.join(random_.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def phone(random_):
+    return '+569' + ''.join(random_.choice('0123456789') for _ in range(8))
+
+
+def past_months(now, count):
+    """ (start, days) of the `count` calendar months before the one of `now`. """
+    year, month = now.year, now.month
+    for _ in range(count):
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+        start = now.replace(year=year, month=month, day=1, hour=0, minute=0, second=0, microsecond=0)
+        yield start, calendar.monthrange(year, month)[1]
+
+
+def moment(random_, now, days):
+    """ Random date time in the last `days` days. """
+    return now - timedelta(days=random_.uniform(0, days))
+
+
+def next_number():
+    """ Number after the highest of the synthetic condominiums and users, the users outlive a deleted condominium. """
+    names = Condominium.objects.filter(name_condominium__startswith=CONDOMINIUM_PREFIX).values_list('name_condominium', flat=True)
+    usernames = User.objects.filter(username__startswith=USERNAME_PREFIX).values_list('username', flat=True)
+    numbers = [name[len(CONDOMINIUM_PREFIX):] for name in names]
+    numbers += [username[len(USERNAME_PREFIX):].split('-')[0] for username in usernames]
+    return max((int(number) for number in numbers if number.isdigit()), default=-1) + 1
+
+
+def generate(condominiums=10, departments=20, years=2, financial_per_month=8, comments=40, priorities=25, seed=0):
+    """
+    Create `condominiums` new condominiums with their data, returns the number of rows created by model.
+
+    The users are named `synthetic-<condominium>-<department>` and all
+    have the password SYNTHETIC_PASSWORD.
+    """
+    random_ = random.Random(seed)
+    # Calendar months of the current time zone, like the monthly summaries.
+    now = timezone.localtime()
+    password = make_password(SYNTHETIC_PASSWORD)
+    first = next_number()
+    created = dict.fromkeys(
+        ('condominiums', 'departments', 'users', 'profiles', 'financial_status', 'comments', 'priorities'), 0,
+    )
+
+    for number in range(first, first + condominiums):
+        with transaction.atomic(), explicit_created_at(FinancialStat, Comment, PriorityOrUpgrade):
+            condominium = Condominium.objects.create(name_condominium=f'{CONDOMINIUM_PREFIX}{number}')
+
+            owners = [f'Residente {number}-{index}' for index in range(departments)]
+            created_departments = Department.objects.bulk_create(
+                Department(
+                    condominium_id=condominium,
+                    department_number=index % 100,
+                    department_block=index // 100 + 1,
+                    number_habitants=random_.randint(0, 4),
+                    department_owner=owner,
+                )
+                for index, owner in enumerate(owners)
+            )
+            post_bulk_create.send(sender=Department, instances=created_departments)
+
+            usernames = [f'{USERNAME_PREFIX}{number}-{index}' for index in range(departments)]
+            User.objects.bulk_create(
+                User(username=username, email=f'{username}@example.com', first_name=owner, password=password)
+                for username, owner in zip(usernames, owners)
+            )
+            # MySQL doesn't return the primary keys of a bulk insert, read them back.
+            users = User.objects.in_bulk(usernames, field_name='username')
+            department_rows = Department.objects.filter(condominium_id=condominium).order_by('department_block', 'department_number')
+            ProfileHabitant.objects.bulk_create(
+                ProfileHabitant(
+                    user=users[username], department_id=department,
+                    p_number=phone(random_), p_number_emergency=phone(random_),
+                )
+                for username, department in zip(usernames, department_rows)
+            )
+
+            financial_status = []
+            for month_start, month_days in past_months(now, years * 12):
+                for _ in range(financial_per_month):
+                    income = random_.random() < 0.5
+                    amount = Decimal(f'{random_.uniform(10000, 2000000):.2f}')
+                    financial_status.append(FinancialStat(
+                        condominium_id=condominium,
+                        **timestamps(month_start + timedelta(days=random_.uniform(0, month_days))),
+                        type_detail=random_.choice(INCOME_DETAILS if income else EXPENSE_DETAILS),
+                        income=amount if income else 0,
+                        expenses=0 if income else amount,
+                        details=sentence(random_),
+                    ))
+            financial_status = FinancialStat.objects.bulk_create(financial_status, batch_size=1000)
+            post_bulk_create.send(sender=FinancialStat, instances=financial_status)
+
+            created_comments = Comment.objects.bulk_create(
+                Comment(
+                    condominium_id=condominium,
+                    **timestamps(moment(random_, now, years * 365)),
+                    owner_department=random_.choice(owners),
+                    comment_title=random_.choice(COMMENT_TITLES),
+                    comment=sentence(random_, 30),
+                    flaw_title=random_.choice(FLAW_TITLES),
+                    flaw=sentence(random_, 20),
+                )
+                for _ in range(comments)
+            )
+            post_bulk_create.send(sender=Comment, instances=created_comments)
+
+            created_priorities = PriorityOrUpgrade.objects.bulk_create(
+                PriorityOrUpgrade(
+                    condominium_id=condominium,
+                    **timestamps(moment(random_, now, years * 365)),
+                    name=random_.choice(PRIORITY_NAMES),
+                    detail=sentence(random_, 25),
+                    status=random_.choice(PriorityOrUpgrade.STATUS_CHOICES)[0],
+                    kind=random_.choice(PriorityOrUpgrade.KIND_CHOICES)[0],
+                )
+                for _ in range(priorities)
+            )
+            post_bulk_create.send(sender=PriorityOrUpgrade, instances=created_priorities)
+
+        created['condominiums'] += 1
+        created['departments'] += departments
+        created['users'] += departments
+        created['profiles'] += departments
+        created['financial_status'] += len(financial_status)
+        created['comments'] += comments
+        created['priorities'] += priorities
+    return created
@@ -1,3 +1,1465 @@
-from django.test import TestCase
+""" Tests for the REST API. """
 
-# Create your tests here.
+# Python
+import asyncio
+import gzip
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+
+# Django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.mail.backends import locmem
+from django.http import HttpResponse
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import (
+    AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+# Django REST Framework
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+# Asgiref
+from asgiref.sync import async_to_sync, sync_to_async
+
+# Models
+from .models import (
+    Condominium, Department, FinancialStat, FinancialSummary, PriorityOrUpgrade, Comment, ProfileHabitant, QueuedEmail,
+    Tombstone,
+)
+
+# Mixins
+from .mixins import StreamingListModelMixin
+
+# Emails
+from .emails import claim_queued_emails, send_queued_emails
+
+# Rollups, search and synthetic data
+from . import caching, compression, metrics, rollups, search, slow_queries, sync, synthetic
+
+# Authentication
+from .authentication import token_cache_key
+
+# Database routing
+from .middleware import PerformanceMiddleware, ReplicaRoutingMiddleware, SlowQueryMiddleware
+from .routers import ReplicaRouter
+
+
+def create_condominium(name, size=3):
+    """ Create a condominium with `size` rows of every nested collection. """
+    condominium = Condominium.objects.create(name_condominium=name)
+    for number in range(size):
+        Department.objects.create(
+            condominium_id=condominium,
+            department_number=number,
+            department_block=1,
+            department_owner=f'{name} owner {number}',
+        )
+        FinancialStat.objects.create(
+            condominium_id=condominium,
+            type_detail='maintenance',
+            income=100,
+            expenses=50,
+            details='monthly fee',
+        )
+        Comment.objects.create(
+            condominium_id=condominium,
+            owner_department=f'{name} owner {number}',
+            comment_title='noise',
+            comment='too much noise',
+        )
+        PriorityOrUpgrade.objects.create(
+            condominium_id=condominium,
+            name='paint',
+            detail='paint the walls',
+        )
+    return condominium
+
+
+class APITestCase(TestCase):
+    """ Test case with a client authenticated as an administrator. """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('admin', 'admin@example.com', 'password123', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class QueryCountTests(APITestCase):
+    """ The number of queries of the read endpoints must not grow with the data. """
+
+    list_urls = (
+        'list-names',
+        'condominium-list',
+        'financial-status',
+        'priority-or-update',
+        'suggestions',
+    )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_list_endpoints_run_a_fixed_number_of_queries(self):
+        create_condominium('small')
+        baseline = {name: self.count_queries(reverse(name)) for name in self.list_urls}
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(5):
+                create_condominium(f'big {index}', size=5)
+        for name in self.list_urls:
+            with self.subTest(url=name):
+                self.assertEqual(self.count_queries(reverse(name)), baseline[name])
+
+    def test_detail_endpoints_run_a_fixed_number_of_queries(self):
+        small = create_condominium('small', size=1)
+        big = create_condominium('big', size=10)
+        for name in ('condominium', 'financial-status-retrive'):
+            with self.subTest(url=name):
+                self.assertEqual(
+                    self.count_queries(reverse(name, args=[small.pk])),
+                    self.count_queries(reverse(name, args=[big.pk])),
+                )
+        item = PriorityOrUpgrade.objects.filter(condominium_id=big).first()
+        # The ETag of the response cache and the item with its condominium.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('get-priority-or-update', args=[item.pk]))
+        self.assertEqual(response.data['condominium_data'], {'id': big.pk, 'name_condominium': 'big'})
+
+
+class CursorPaginationTests(APITestCase):
+    """ Keyset pagination of the lists and the nested collections. """
+
+    def test_lists_are_not_paginated_unless_asked(self):
+        create_condominium('first', size=1)
+        response = self.client.get(reverse('condominium-list'))
+        self.assertIsInstance(response.data, list)
+
+    def test_walk_every_page_of_a_list(self):
+        for index in range(5):
+            create_condominium(f'condominium {index}', size=1)
+        url, names = reverse('list-names') + '?page_size=2', []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            names += [row['name_condominium'] for row in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(names, [f'condominium {index}' for index in range(5)])
+
+    def test_nested_collections_are_paginated(self):
+        condominium = create_condominium('big', size=4)
+        for name in ('condominium-financial-status', 'condominium-priority-or-upgrade', 'condominium-suggestions'):
+            with self.subTest(url=name):
+                response = self.client.get(reverse(name, args=[condominium.pk]), {'page_size': 3})
+                self.assertEqual(len(response.data['results']), 3)
+                self.assertEqual(len(self.client.get(response.data['next']).data['results']), 1)
+
+
+class StreamingListTests(APITestCase):
+    """ Streamed lists must match the regular JSON responses. """
+
+    def test_streamed_list_is_byte_identical(self):
+        for index in range(5):
+            create_condominium(f'condominium {index}', size=2)
+        for name in ('condominium-list', 'financial-status'):
+            with self.subTest(url=name), mock.patch.object(StreamingListModelMixin, 'stream_chunk_size', 2):
+                response = self.client.get(reverse(name), {'stream': 'true'})
+                self.assertTrue(response.streaming)
+                self.assertEqual(b''.join(response.streaming_content), self.client.get(reverse(name)).content)
+
+    def test_empty_streamed_list(self):
+        response = self.client.get(reverse('condominium-list'), {'stream': 'true'})
+        self.assertEqual(b''.join(response.streaming_content), b'[]')
+
+
+class EmailOutboxTests(APITestCase):
+    """ Invitations are queued in the outbox and sent by the worker. """
+
+    def setUp(self):
+        super().setUp()
+        Condominium.objects.create(name_condominium='Los Olivos')
+
+    def invite(self):
+        return self.client.post(reverse('invite_user'), {
+            'username': 'resident',
+            'email': 'resident@example.com',
+            'password': 'password123',
+            'name_owner': 'Resident',
+            'name_condominium': 'Los Olivos',
+            'number_department': 101,
+            'number_block': 1,
+            'number_habitants': 2,
+            'p_number': '999999999',
+            'p_number_emergency': '988888888',
+        }, format='json')
+
+    def test_invite_to_an_existing_department(self):
+        self.assertEqual(self.invite().status_code, 201)
+        User.objects.filter(username='resident').update(username='other')
+        response = self.invite()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('number_department', response.data)
+        self.assertFalse(User.objects.filter(username='resident').exists())
+        self.assertEqual(QueuedEmail.objects.count(), 1)
+
+    def test_invite_queues_the_email_without_sending_it(self):
+        response = self.invite()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(QueuedEmail.objects.get().status, QueuedEmail.PENDING)
+
+        call_command('send_queued_emails', '--once', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['resident@example.com'])
+        queued_email = QueuedEmail.objects.get()
+        self.assertEqual(queued_email.status, QueuedEmail.SENT)
+        self.assertEqual(queued_email.html_body, '')
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failed_emails_are_retried_with_backoff(self):
+        self.invite()
+        with mock.patch.object(locmem.EmailBackend, 'send_messages', side_effect=OSError('down')):
+            self.assertEqual(send_queued_emails(), (0, 1))
+            queued_email = QueuedEmail.objects.get()
+            self.assertEqual(queued_email.status, QueuedEmail.PENDING)
+            self.assertGreater(queued_email.next_attempt_at, timezone.now())
+            # Not due yet.
+            self.assertEqual(send_queued_emails(), (0, 0))
+
+            QueuedEmail.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(send_queued_emails(), (0, 1))
+            self.assertEqual(QueuedEmail.objects.get().status, QueuedEmail.FAILED)
+
+    def test_claimed_emails_are_skipped_by_the_other_workers(self):
+        self.invite()
+        results = []
+
+        def send_messages(backend, messages):
+            # Another worker runs while this one waits on the mail server.
+            results.append(send_queued_emails())
+            return len(messages)
+
+        with mock.patch.object(locmem.EmailBackend, 'send_messages', send_messages):
+            self.assertEqual(send_queued_emails(), (1, 0))
+        self.assertEqual(results, [(0, 0)])
+        self.assertEqual(QueuedEmail.objects.get().status, QueuedEmail.SENT)
+
+    def test_emails_of_a_dead_worker_are_sent_after_the_lease(self):
+        self.invite()
+        claim_queued_emails(batch_size=50)
+        self.assertEqual(send_queued_emails(), (0, 0))
+        QueuedEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_queued_emails(), (1, 0))
+
+    @override_settings(EMAIL_OUTBOX_RETRY_DELAY=60, EMAIL_OUTBOX_LEASE=300)
+    def test_mail_server_down(self):
+        self.invite()
+        with mock.patch.object(locmem.EmailBackend, 'open', side_effect=OSError('down')):
+            self.assertEqual(send_queued_emails(), (0, 1))
+        queued_email = QueuedEmail.objects.get()
+        self.assertEqual((queued_email.status, queued_email.attempts), (QueuedEmail.PENDING, 1))
+        self.assertIn('down', queued_email.last_error)
+        # The backoff replaces the lease.
+        self.assertLess(queued_email.next_attempt_at, timezone.now() + timedelta(seconds=120))
+
+    def test_worker_reopens_dropped_connections(self):
+        with mock.patch(
+            'gestion_condominios.management.commands.send_queued_emails.close_old_connections',
+        ) as close_old_connections:
+            call_command('send_queued_emails', '--once', stdout=StringIO())
+        close_old_connections.assert_called_once_with()
+
+
+class BulkInviteTests(APITestCase):
+    """ Bulk onboarding of the residents of a condominium. """
+
+    def setUp(self):
+        super().setUp()
+        self.condominium = Condominium.objects.create(name_condominium='Los Olivos')
+
+    def residents(self, size, start=0):
+        return [{
+            'username': f'resident{number}',
+            'email': f'resident{number}@example.com',
+            'password': 'password123',
+            'name_owner': f'Resident {number}',
+            'number_department': number,
+            'number_block': 1,
+            'number_habitants': 2,
+            'p_number': '999999999',
+            'p_number_emergency': '988888888',
+        } for number in range(start, start + size)]
+
+    def bulk_invite(self, residents):
+        return self.client.post(reverse('bulk_invite_users'), {
+            'name_condominium': 'Los Olivos',
+            'residents': residents,
+        }, format='json')
+
+    def test_bulk_invite_creates_everything(self):
+        response = self.bulk_invite(self.residents(3))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['users']), 3)
+        self.assertEqual(Department.objects.filter(condominium_id=self.condominium).count(), 3)
+        self.assertEqual(QueuedEmail.objects.count(), 3)
+        profile = User.objects.get(username='resident2').profilehabitant
+        self.assertEqual(profile.department_id.department_number, 2)
+        self.assertTrue(profile.user.check_password('password123'))
+
+    def test_bulk_invite_runs_a_fixed_number_of_queries(self):
+        with CaptureQueriesContext(connection) as small:
+            self.bulk_invite(self.residents(2))
+        with CaptureQueriesContext(connection) as big:
+            self.bulk_invite(self.residents(20, start=2))
+        self.assertEqual(len(small), len(big))
+
+    def test_csv_upload(self):
+        residents = self.residents(2)
+        lines = [','.join(residents[0])] + [','.join(str(value) for value in resident.values()) for resident in residents]
+        response = self.client.post(
+            reverse('bulk_invite_users') + '?name_condominium=Los%20Olivos',
+            '\n'.join(lines),
+            content_type='text/csv',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(ProfileHabitant.objects.count(), 2)
+
+    def test_nothing_is_created_when_a_resident_is_invalid(self):
+        residents = self.residents(3)
+        residents[2]['number_department'] = residents[0]['number_department']
+        response = self.bulk_invite(residents)
+        self.assertEqual(response.status_code, 400)
+        self.bulk_invite(self.residents(1))
+        response = self.bulk_invite(self.residents(1))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(User.objects.filter(username__startswith='resident').count(), 1)
+
+    def test_username_created_after_the_validation(self):
+        def hash_passwords(passwords):
+            # A concurrent request creates the user between the validation and the insert.
+            User.objects.create_user('resident1')
+            return list(passwords)
+
+        with mock.patch('gestion_condominios.serializers.hash_passwords', hash_passwords):
+            response = self.bulk_invite(self.residents(2))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('residents', response.data)
+        self.assertFalse(User.objects.filter(username='resident0').exists())
+        self.assertEqual(QueuedEmail.objects.count(), 0)
+
+
+class NestedCreateTests(APITestCase):
+    """ The nested items of a POST are stored with one INSERT. """
+
+    def setUp(self):
+        super().setUp()
+        self.condominium = Condominium.objects.create(name_condominium='Los Olivos')
+
+    payloads = {
+        'financial-status': ('financial_status', FinancialStat, {
+            'type_detail': 'maintenance', 'income': 100, 'expenses': 20, 'details': 'monthly fee',
+        }),
+        'priority-or-update': ('condominium_data', PriorityOrUpgrade, {
+            'name': 'paint', 'detail': 'paint the walls', 'priority': True,
+        }),
+        'suggestions': ('condominium_suggestions', Comment, {
+            'owner_department': 'owner', 'comment_title': 'noise', 'comment': 'too much noise',
+        }),
+    }
+
+    def post(self, name, size):
+        field, model, item = self.payloads[name]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse(name), {
+                'name_condominium': 'Los Olivos',
+                field: [item] * size,
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        insert = f'INSERT INTO {connection.ops.quote_name(model._meta.db_table)}'
+        return [query['sql'] for query in context if query['sql'].startswith(insert)]
+
+    def test_every_item_is_stored_with_one_insert(self):
+        for name, (field, model, item) in self.payloads.items():
+            with self.subTest(url=name):
+                self.assertEqual(len(self.post(name, 1)), 1)
+                self.assertEqual(len(self.post(name, 30)), 1)
+                self.assertEqual(model.objects.filter(condominium_id=self.condominium).count(), 31)
+
+    def test_unknown_condominium(self):
+        response = self.client.post(reverse('financial-status'), {
+            'name_condominium': 'Unknown',
+            'financial_status': [self.payloads['financial-status'][2]],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(FinancialStat.objects.exists())
+
+
+class FinancialSummaryTests(APITestCase):
+    """ The monthly summaries follow every change of the financial status. """
+
+    def setUp(self):
+        super().setUp()
+        self.condominium = Condominium.objects.create(name_condominium='Los Olivos')
+
+    def summaries(self):
+        return list(FinancialSummary.objects.order_by('condominium_id', 'month').values(
+            'condominium_id', 'month', 'total_income', 'total_expenses', 'balance', 'row_count',
+        ))
+
+    def assertMatchesRebuild(self):
+        incremental = self.summaries()
+        rollups.rebuild()
+        self.assertEqual(incremental, self.summaries())
+
+    def test_summaries_follow_saves_and_deletes(self):
+        fee = FinancialStat.objects.create(
+            condominium_id=self.condominium, type_detail='fee', income=100, expenses=0, details='fee',
+        )
+        repair = FinancialStat.objects.create(
+            condominium_id=self.condominium, type_detail='repair', income=0, expenses=30, details='pump',
+        )
+        self.assertMatchesRebuild()
+        summary = FinancialSummary.objects.get()
+        self.assertEqual((summary.balance, summary.row_count), (70, 2))
+
+        repair.expenses = 50
+        repair.save()
+        self.assertMatchesRebuild()
+        self.assertEqual(FinancialSummary.objects.get().balance, 50)
+
+        # Move the fee to an older month.
+        FinancialStat.objects.filter(pk=fee.pk).update(created_at=fee.created_at - timedelta(days=62))
+        fee.refresh_from_db()
+        rollups.rebuild()
+        fee.delete()
+        repair.delete()
+        self.assertEqual(self.summaries(), [])
+
+    def test_bulk_created_rows_and_summary_endpoint(self):
+        response = self.client.post(reverse('financial-status'), {
+            'name_condominium': 'Los Olivos',
+            'financial_status': [
+                {'type_detail': 'fee', 'income': 100, 'expenses': 0, 'details': 'fee'},
+                {'type_detail': 'fee', 'income': 80, 'expenses': 10, 'details': 'fee'},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertMatchesRebuild()
+
+        response = self.client.get(reverse('financial-status-summary', args=[self.condominium.pk]))
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['total_income'], 180)
+        self.assertEqual(response.data[0]['balance'], 170)
+        self.assertEqual(response.data[0]['row_count'], 2)
+
+    def test_deleting_the_condominium(self):
+        create_condominium('other')
+        self.condominium.delete()
+        Condominium.objects.all().delete()
+        self.assertEqual(self.summaries(), [])
+
+
+@override_settings(SHARED_CACHE=True)
+class CachedTokenAuthenticationTests(TestCase):
+    """ Tokens are authenticated from the cache until the user or the token change. """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('resident', 'resident@example.com', 'password123')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.url = reverse('condominium-list')
+
+    def test_cache_hit_skips_the_auth_query(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        # Only the list of condominiums.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_deactivated_user(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_deleted_token(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_password_change(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(reverse('update_password', args=[self.user.pk]), {
+                'old_password': 'password123',
+                'new_password': 'password456',
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(cache.get(token_cache_key(self.token.key)))
+
+    def test_reads_before_the_commit_are_not_kept(self):
+        self.client.get(self.url)
+        credentials = cache.get(token_cache_key(self.token.key))
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.user.is_active = False
+                self.user.save()
+                # Another request authenticated before the commit caches the active user again.
+                cache.set(token_cache_key(self.token.key), credentials)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    @override_settings(SHARED_CACHE=False)
+    def test_no_cache_of_a_single_process(self):
+        self.client.get(self.url)
+        self.assertIsNone(cache.get(token_cache_key(self.token.key)))
+        # The token and its user, then the list of condominiums.
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+
+class AsyncPasswordViewsTests(TransactionTestCase):
+    """ The async login and password change answer like the sync views. """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('resident', 'resident@example.com', 'password123')
+
+    def test_login(self):
+        response = self.client.post(reverse('async-login'), {
+            'username': 'resident', 'password': 'password123',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['token'], Token.objects.get(user=self.user).key)
+        self.assertEqual(response.json()['user']['username'], 'resident')
+
+        response = self.client.post(reverse('async-login'), {
+            'username': 'resident', 'password': 'wrong-password',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'non_field_errors': ['Invalid credentials']})
+
+    def test_update_password(self):
+        token = Token.objects.create(user=self.user)
+        url = reverse('async-update-password', args=[self.user.pk])
+        payload = {'old_password': 'password123', 'new_password': 'password456'}
+        self.assertEqual(self.client.put(url, payload, content_type='application/json').status_code, 401)
+
+        response = self.client.put(
+            url, payload, content_type='application/json', HTTP_AUTHORIZATION=f'Token {token.key}',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('password456'))
+
+        response = self.client.put(
+            url, payload, content_type='application/json', HTTP_AUTHORIZATION=f'Token {token.key}',
+        )
+        self.assertEqual(response.json(), {'old_password': ['Wrong password.']})
+
+
+class AsyncReadViewsTests(TransactionTestCase):
+    """ The async read views answer like the sync views. """
+
+    # The read replicas, when they are configured.
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.token = Token.objects.create(user=User.objects.create_user('resident', password='password123'))
+        self.condominium = create_condominium('Los Olivos')
+
+    def test_same_responses_as_the_sync_views(self):
+        item = PriorityOrUpgrade.objects.filter(condominium_id=self.condominium).first()
+        urls = (
+            ('list-names', []),
+            ('condominium', [self.condominium.pk]),
+            ('get-priority-or-update', [item.pk]),
+            ('financial-status-retrive', [self.condominium.pk]),
+        )
+        for name, args in urls:
+            with self.subTest(url=name):
+                async_url = reverse(f'async-{name}', args=args)
+                self.assertEqual(self.client.get(async_url).status_code, 401)
+                response = self.client.get(async_url, {'fields': 'id'}, HTTP_AUTHORIZATION=f'Token {self.token.key}')
+                expected = self.client.get(reverse(name, args=args), {'fields': 'id'}, HTTP_AUTHORIZATION=f'Token {self.token.key}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, expected.content)
+                # The queries of the pool thread are in the metrics of the request.
+                self.assertNotIn('desc="0 queries"', response['Server-Timing'])
+
+        response = self.client.post(reverse('async-list-names'), HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 405)
+
+    @override_settings(DEBUG=True, SLOW_QUERY_THRESHOLD_MS=1000)
+    def test_asgi_middleware_chain_is_not_adapted(self):
+        # Django logs every sync-only middleware it wraps with sync_to_async().
+        with self.assertLogs('django.request', 'DEBUG') as logs:
+            ASGIHandler()
+            logging.getLogger('django.request').debug('Loaded.')
+        self.assertEqual([line for line in logs.output if 'adapted' in line], [])
+
+    @override_settings(COMPRESSION_MIN_BYTES=0)
+    async def test_asgi_request(self):
+        url = reverse('async-condominium', args=[self.condominium.pk])
+        # The AsyncClient of Django 3.2 takes the raw header names.
+        response = await AsyncClient().get(url, authorization=f'Token {self.token.key}', accept_encoding='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content))['name_condominium'], 'Los Olivos')
+        self.assertNotIn('desc="0 queries"', response['Server-Timing'])
+
+
+@override_settings(SHARED_CACHE=True)
+class ResponseCacheTests(TestCase):
+    """ ETags and cached responses of the read endpoints. """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('resident', 'resident@example.com', 'password123')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        self.condominium = create_condominium('Los Olivos', size=2)
+
+    def test_matching_etag_gets_a_304_without_queries(self):
+        for url in (
+            reverse('list-names'),
+            reverse('condominium', args=[self.condominium.pk]),
+            reverse('get-priority-or-update', args=[self.condominium.condominium_data.first().pk]),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                with self.assertNumQueries(0):
+                    cached = self.client.get(url)
+                    not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(cached.content, response.content)
+                self.assertEqual(not_modified.status_code, 304)
+
+    def test_writes_invalidate_the_responses(self):
+        url = reverse('condominium', args=[self.condominium.pk])
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('financial-status'), {
+                'name_condominium': 'Los Olivos',
+                'financial_status': [{'type_detail': 'fee', 'income': 10, 'expenses': 0, 'details': 'fee'}],
+            }, format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['financial_status']), 3)
+
+        item = self.condominium.condominium_data.first()
+        url = reverse('get-priority-or-update', args=[item.pk])
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.condominium.name_condominium = 'Las Acacias'
+            self.condominium.save()
+        self.assertEqual(self.client.get(url).data['condominium_data']['name_condominium'], 'Las Acacias')
+        self.assertEqual(self.client.get(reverse('list-names')).data[0]['name_condominium'], 'Las Acacias')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item.delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_reads_before_the_commit_are_not_kept(self):
+        url = reverse('condominium', args=[self.condominium.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                FinancialStat.objects.create(
+                    condominium_id=self.condominium, type_detail='fee', income=10, expenses=0, details='fee',
+                )
+                # A concurrent read before the commit caches under the current generation...
+                generation = caching.get_generation('condominium', self.condominium.pk)
+                self.client.get(url)
+        # ...which the commit drops.
+        self.assertNotEqual(caching.get_generation('condominium', self.condominium.pk), generation)
+        self.assertEqual(len(self.client.get(url).data['financial_status']), 3)
+
+    @override_settings(SHARED_CACHE=False)
+    def test_no_cache_of_a_single_process(self):
+        url = reverse('condominium', args=[self.condominium.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # A write of another worker, its signals invalidate the cache of that worker only.
+        with mock.patch.object(caching, 'invalidate'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.condominium.name_condominium = 'Las Acacias'
+                self.condominium.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name_condominium'], 'Las Acacias')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_query_parameters_are_cached_apart(self):
+        create_condominium('Las Acacias', size=1)
+        url = reverse('list-names')
+        self.assertEqual(len(self.client.get(url).data), 2)
+        self.assertEqual(len(self.client.get(url, {'page_size': 1}).data['results']), 1)
+
+
+class SearchTests(APITestCase):
+    """ Full-text search of the suggestions and priorities. """
+
+    def setUp(self):
+        super().setUp()
+        self.condominium = Condominium.objects.create(name_condominium='Los Olivos')
+
+    def search(self, query, **params):
+        response = self.client.get(reverse('search'), dict(params, q=query))
+        self.assertEqual(response.status_code, 200)
+        return [(result['kind'], result['id']) for result in response.data]
+
+    def test_accent_folded_ranked_search(self):
+        elevator = Comment.objects.create(
+            condominium_id=self.condominium, owner_department='101',
+            flaw_title='Ascensor dañado', flaw='El ascensor hace ruido.',
+        )
+        noise = Comment.objects.create(
+            condominium_id=self.condominium, owner_department='102',
+            comment_title='Ruido', comment='Música fuerte en el ascensor',
+        )
+        paint = PriorityOrUpgrade.objects.create(
+            condominium_id=self.condominium, name='Pintar paredes', detail='Pared del ascensor',
+        )
+        self.assertEqual(self.search('ASCENSOR danado')[0], ('comment', elevator.pk))
+        self.assertEqual(self.search('musica'), [('comment', noise.pk)])
+        self.assertEqual(self.search('pared', kind='priority'), [('priority', paint.pk)])
+        self.assertEqual(self.search('de el la'), [])
+
+    def test_index_follows_saves_deletes_and_bulk_creates(self):
+        comment = Comment.objects.create(condominium_id=self.condominium, owner_department='101', comment='goteras')
+        comment.comment = 'humedad'
+        comment.save()
+        self.assertEqual(self.search('goteras'), [])
+        self.assertEqual(self.search('humedad'), [('comment', comment.pk)])
+        comment.delete()
+        self.assertEqual(self.search('humedad'), [])
+
+        self.client.post(reverse('suggestions'), {
+            'name_condominium': 'Los Olivos',
+            'condominium_suggestions': [{'owner_department': '101', 'comment': 'jardín seco'}],
+        }, format='json')
+        self.assertEqual(len(self.search('jardin')), 1)
+        self.assertEqual(search.rebuild(), 1)
+        self.assertEqual(len(self.search('jardin')), 1)
+
+    def test_limit_is_clamped(self):
+        for number in range(3):
+            Comment.objects.create(condominium_id=self.condominium, owner_department=str(number), comment='goteras')
+        self.assertEqual(len(self.search('goteras', limit=-5)), 1)
+        self.assertEqual(len(self.search('goteras', limit=1000)), 3)
+        response = self.client.get(reverse('search'), {'q': 'goteras', 'limit': 'all'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PriorityOrUpgradeStatusTests(APITestCase):
+    """ Workflow flags over the status and kind columns, and the kanban board. """
+
+    def setUp(self):
+        super().setUp()
+        self.condominium = Condominium.objects.create(name_condominium='Los Olivos')
+
+    def test_flags_are_backward_compatible(self):
+        response = self.client.post(reverse('priority-or-update'), {
+            'name_condominium': 'Los Olivos',
+            'condominium_data': [
+                {'name': 'paint', 'detail': 'walls', 'priority': True, 'doing': True, 'to_do': False},
+                {'name': 'pool', 'detail': 'clean', 'upgrade': True},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        paint, pool = response.data['condominium_data']
+        self.assertEqual(
+            {flag: paint[flag] for flag in ('priority', 'upgrade', 'to_do', 'doing', 'done', 'status', 'kind')},
+            {'priority': True, 'upgrade': False, 'to_do': False, 'doing': True, 'done': False,
+             'status': 'doing', 'kind': 'priority'},
+        )
+        self.assertEqual((pool['to_do'], pool['status'], pool['kind']), (True, 'to_do', 'upgrade'))
+
+    def test_board(self):
+        for index in range(7):
+            PriorityOrUpgrade.objects.create(
+                condominium_id=self.condominium, name=f'item {index}', detail='detail',
+                done=index < 5, priority=index % 2 == 0,
+            )
+        url = reverse('priority-or-upgrade-board', args=[self.condominium.pk])
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'limit': 3})
+        columns = {column['status']: column for column in response.data['columns']}
+        self.assertEqual({status: column['count'] for status, column in columns.items()},
+                         {'to_do': 2, 'doing': 0, 'done': 5})
+        self.assertEqual([item['name'] for item in columns['done']['items']], ['item 4', 'item 3', 'item 2'])
+
+        response = self.client.get(url, {'kind': 'priority'})
+        self.assertEqual(sum(column['count'] for column in response.data['columns']), 4)
+
+
+class SparseFieldsTests(APITestCase):
+    """ `?fields=` and `?expand=` shrink the response and the queries. """
+
+    def setUp(self):
+        super().setUp()
+        self.condominium = create_condominium('Los Olivos')
+
+    def test_fields_and_nested_fields(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('financial-status'), {'fields': 'name_condominium,financial_status.income'})
+        self.assertEqual(response.data, [{'name_condominium': 'Los Olivos', 'financial_status': [{'income': 100}] * 3}])
+        condominiums, financial_status = (query['sql'] for query in context.captured_queries)
+        self.assertNotIn('updated_at', condominiums)
+        self.assertIn('income', financial_status)
+        self.assertNotIn('details', financial_status)
+
+    def test_expand_drops_the_unlisted_relations(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('condominium-list'), {'expand': ''})
+        self.assertEqual(response.data, [{'id': self.condominium.pk, 'name_condominium': 'Los Olivos'}])
+
+        item = PriorityOrUpgrade.objects.filter(condominium_id=self.condominium).first()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('get-priority-or-update', args=[item.pk]), {'fields': 'id,name', 'expand': ''})
+        self.assertEqual(response.data, {'id': item.pk, 'name': 'paint'})
+        self.assertNotIn('JOIN', context.captured_queries[-1]['sql'])
+
+    def test_paginated_sparse_list(self):
+        url = reverse('condominium-suggestions', args=[self.condominium.pk])
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'fields': 'comment_title', 'page_size': 2})
+        self.assertEqual(response.data['results'], [{'comment_title': 'noise'}] * 2)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_writes_ignore_the_fields(self):
+        response = self.client.post(reverse('suggestions') + '?fields=id', {
+            'name_condominium': 'Los Olivos',
+            'condominium_suggestions': [{'owner_department': 'A', 'comment_title': 't', 'comment': 'c'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('condominium_suggestions', response.data)
+
+
+class ValuesProjectionTests(APITestCase):
+    """ The `values()` fast path renders the same bytes as the serializers. """
+
+    def setUp(self):
+        super().setUp()
+        for index in range(3):
+            create_condominium(f'condominium {index}', size=index)
+        Department.objects.update(department_owner='')
+
+    def assertSameResponse(self, url, params=None):
+        with CaptureQueriesContext(connection) as fast:
+            fast_response = self.client.get(url, params)
+            fast_content = fast_response.getvalue()
+        cache.clear()
+        with mock.patch('gestion_condominios.mixins.ValuesProjection.build', return_value=None):
+            response = self.client.get(url, params)
+            content = response.getvalue()
+        self.assertEqual(fast_response.status_code, 200)
+        self.assertEqual(fast_content, content)
+        return fast
+
+    def test_lists_are_identical(self):
+        for name in ('condominium-list', 'financial-status', 'list-names', 'suggestions'):
+            with self.subTest(url=name):
+                queries = self.assertSameResponse(reverse(name))
+                self.assertLessEqual(len(queries), 2)
+        self.assertSameResponse(reverse('financial-status'), {'page_size': 2})
+        self.assertSameResponse(reverse('financial-status'), {'fields': 'financial_status.created_at'})
+        self.assertSameResponse(reverse('condominium-list'), {'stream': 'true'})
+
+    def test_paginated_nested_lists_are_identical(self):
+        condominium = Condominium.objects.get(name_condominium='condominium 2')
+        url = reverse('condominium-financial-status', args=[condominium.pk])
+        self.assertSameResponse(url)
+        cursor = self.client.get(url, {'page_size': 1}).data['next']
+        self.assertSameResponse(cursor)
+        # Properties of PriorityOrUpgrade use the serializer.
+        self.assertSameResponse(reverse('condominium-priority-or-upgrade', args=[condominium.pk]))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTests(SimpleTestCase):
+    """ Reads of read-only requests go to a replica until the request writes. """
+
+    def route(self, method, view):
+        request = getattr(RequestFactory(), method.lower())('/')
+        return ReplicaRoutingMiddleware(view)(request)
+
+    def test_reads_of_safe_requests_use_one_replica(self):
+        router = ReplicaRouter()
+
+        def view(request):
+            return [router.db_for_read(Condominium) for _ in range(5)]
+
+        for method in ('GET', 'HEAD', 'OPTIONS'):
+            with self.subTest(method=method):
+                aliases = self.route(method, view)
+                self.assertEqual(len(set(aliases)), 1)
+                self.assertIn(aliases[0], ['replica1', 'replica2'])
+        self.assertEqual(self.route('POST', view), ['default'] * 5)
+        # Outside a request.
+        self.assertEqual(router.db_for_read(Condominium), 'default')
+
+    def test_reads_after_a_write_use_the_primary(self):
+        router = ReplicaRouter()
+
+        def view(request):
+            before = router.db_for_read(Condominium)
+            self.assertEqual(router.db_for_write(FinancialStat), 'default')
+            return before, router.db_for_read(Condominium)
+
+        before, after = self.route('GET', view)
+        self.assertNotEqual(before, 'default')
+        self.assertEqual(after, 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        self.assertEqual(self.route('GET', lambda request: ReplicaRouter().db_for_read(Condominium)), 'default')
+
+    def test_async_chain_is_not_adapted(self):
+        router = ReplicaRouter()
+
+        async def view(request):
+            before = router.db_for_read(Condominium)
+            # A write on the thread of a sync view pins the request too.
+            await sync_to_async(router.db_for_write)(FinancialStat)
+            return before, router.db_for_read(Condominium)
+
+        middleware = ReplicaRoutingMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        before, after = async_to_sync(middleware)(RequestFactory().get('/'))
+        self.assertIn(before, ['replica1', 'replica2'])
+        self.assertEqual(after, 'default')
+        self.assertEqual(router.db_for_read(Condominium), 'default')
+
+
+@skipUnless('replica1' in settings.DATABASES, 'No read replica configured.')
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaResponseCacheTests(TransactionTestCase):
+    """ The cached responses are filled from the primary, never from a replica behind it. """
+
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.token = Token.objects.create(user=User.objects.create_user('resident', password='password123'))
+        self.condominium = create_condominium('Los Olivos', size=2)
+
+    def test_cache_miss_reads_from_the_primary(self):
+        client = APIClient(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        # Caches the token, so the only reads are those of the view.
+        client.get(reverse('condominium-list'))
+        for url in (
+            reverse('list-names'),
+            reverse('condominium', args=[self.condominium.pk]),
+            reverse('get-priority-or-update', args=[self.condominium.condominium_data.first().pk]),
+        ):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connections['replica1']) as replica, \
+                        CaptureQueriesContext(connections['default']) as primary:
+                    self.assertEqual(client.get(url).status_code, 200)
+                self.assertEqual(len(replica), 0)
+                self.assertGreater(len(primary), 0)
+        # The views without the response cache still read from the replica.
+        with CaptureQueriesContext(connections['replica1']) as replica:
+            client.get(reverse('condominium-list'))
+        self.assertGreater(len(replica), 0)
+
+
+class SyntheticDataTests(TestCase):
+    """ The synthetic data generator of the benchmarks. """
+
+    def test_generate(self):
+        created = synthetic.generate(condominiums=2, departments=3, years=1, financial_per_month=2, comments=4, priorities=5)
+        self.assertEqual(created, {
+            'condominiums': 2, 'departments': 6, 'users': 6, 'profiles': 6,
+            'financial_status': 48, 'comments': 8, 'priorities': 10,
+        })
+        self.assertEqual(ProfileHabitant.objects.count(), 6)
+        self.assertTrue(self.client.login(username='synthetic-1-2', password=synthetic.SYNTHETIC_PASSWORD))
+        # A year of financial status, with its monthly summaries.
+        condominium = Condominium.objects.first()
+        self.assertEqual(FinancialSummary.objects.filter(condominium_id=condominium).count(), 12)
+        self.assertEqual(
+            sum(FinancialSummary.objects.filter(condominium_id=condominium).values_list('row_count', flat=True)), 24,
+        )
+        self.assertTrue(search.search('ascensor') or search.search('filtración'))
+
+        synthetic.generate(condominiums=1, departments=1, years=1, financial_per_month=1, comments=1, priorities=1)
+        self.assertEqual(Condominium.objects.count(), 3)
+
+    def test_generate_after_a_deletion(self):
+        synthetic.generate(condominiums=2, departments=1, years=1, financial_per_month=1, comments=1, priorities=1)
+        # Its user is kept and the count of condominiums is back to 1.
+        Condominium.objects.get(name_condominium='Condominio sintético 0').delete()
+        synthetic.generate(condominiums=1, departments=1, years=1, financial_per_month=1, comments=1, priorities=1)
+        self.assertEqual(
+            list(Condominium.objects.order_by('name_condominium').values_list('name_condominium', flat=True)),
+            ['Condominio sintético 1', 'Condominio sintético 2'],
+        )
+        self.assertTrue(User.objects.filter(username='synthetic-2-0').exists())
+
+
+class PerformanceMiddlewareTests(APITestCase):
+    """ Server-Timing header and performance logs. """
+
+    def setUp(self):
+        super().setUp()
+        create_condominium('Los Olivos')
+
+    def test_server_timing_and_log(self):
+        with self.assertLogs('gestion_condominios.performance', 'INFO') as logs, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('financial-status'))
+        timings = dict(metric.split(';', 1) for metric in response['Server-Timing'].split(', '))
+        self.assertEqual(set(timings), {'db', 'serialize', 'render', 'total'})
+        self.assertIn(f'desc="{len(queries)} queries"', timings['db'])
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(logs.records[-1].levelname, 'INFO')
+        self.assertEqual((record['path'], record['status']), (reverse('financial-status'), 200))
+        self.assertEqual(record['db_queries'], len(queries))
+        self.assertEqual(record['response_bytes'], len(response.content))
+        self.assertGreater(record['serialize_ms'], 0)
+        self.assertGreater(record['render_ms'], 0)
+        self.assertNotIn('queries', record)
+
+    @override_settings(PERFORMANCE_SLOW_REQUEST_MS=0, PERFORMANCE_SLOW_SAMPLE_RATE=1)
+    def test_slow_requests_log_their_queries(self):
+        with self.assertLogs('gestion_condominios.performance', 'WARNING') as logs:
+            self.client.get(reverse('condominium-list'))
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(len(record['queries']), record['db_queries'])
+        self.assertIn('gestion_condominios_department', record['queries'][-1]['sql'])
+
+    def test_async_chain(self):
+        async def get_response(request):
+            # The query runs on another thread, with a copy of the context.
+            names = await sync_to_async(list)(Condominium.objects.values_list('name_condominium', flat=True))
+            return HttpResponse(json.dumps(names), content_type='application/json')
+
+        middleware = PerformanceMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        with self.assertLogs('gestion_condominios.performance', 'INFO') as logs:
+            response = async_to_sync(middleware)(RequestFactory().get('/names/'))
+        self.assertEqual(json.loads(response.content), ['Los Olivos'])
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+        self.assertEqual(json.loads(logs.records[-1].getMessage())['db_queries'], 1)
+
+
+class MetricsTests(APITestCase):
+    """ Metrics by route of every worker process. """
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(METRICS_DIR=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.directory = directory
+        create_condominium('Los Olivos')
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return dict(line.rsplit(' ', 1) for line in response.content.decode().splitlines() if not line.startswith('#'))
+
+    def test_requests_by_route(self):
+        self.client.get(reverse('financial-status'))
+        self.client.get(reverse('financial-status'))
+        self.client.get('/v1/missing/')
+        samples = self.scrape()
+
+        self.assertEqual(samples['condominios_requests_total{route="financial-status",method="GET",status="200"}'], '2')
+        self.assertEqual(samples['condominios_requests_total{route="unmatched",method="GET",status="404"}'], '1')
+        self.assertEqual(samples['condominios_request_duration_seconds_count{route="financial-status"}'], '2')
+        self.assertEqual(samples['condominios_request_duration_seconds_bucket{route="financial-status",le="+Inf"}'], '2')
+        self.assertEqual(samples['condominios_request_queries_bucket{route="financial-status",le="0"}'], '0')
+        self.assertEqual(samples['condominios_requests_in_flight{route="financial-status"}'], '0')
+        # The scrape itself.
+        self.assertEqual(samples['condominios_requests_in_flight{route="metrics"}'], '1')
+
+    def test_processes_are_added_up(self):
+        finished = subprocess.Popen([sys.executable, '-c', 'pass'])
+        finished.wait()
+        other = metrics.empty_metrics()
+        other['requests']['financial-status|GET|200'] = 3
+        metrics.observe(other['duration'], 'financial-status', metrics.LATENCY_BUCKETS, 0.2)
+        other['in_flight']['financial-status'] = 2
+        for pid in (os.getppid(), finished.pid):
+            with open(os.path.join(self.directory, f'metrics-{pid}-0.json'), 'w') as metrics_file:
+                json.dump(other, metrics_file)
+
+        self.client.get(reverse('financial-status'))
+        for scrape in range(2):
+            with self.subTest(scrape=scrape):
+                samples = self.scrape()
+                self.assertEqual(
+                    samples['condominios_requests_total{route="financial-status",method="GET",status="200"}'], '7',
+                )
+                self.assertEqual(
+                    samples['condominios_request_duration_seconds_bucket{route="financial-status",le="0.25"}'], '3',
+                )
+                # Only the processes still running have requests in flight.
+                self.assertEqual(samples['condominios_requests_in_flight{route="financial-status"}'], '2')
+        # The counters of the finished process are archived, its file deleted.
+        self.assertFalse(os.path.exists(os.path.join(self.directory, f'metrics-{finished.pid}-0.json')))
+        self.assertTrue(os.path.exists(os.path.join(self.directory, f'metrics-{os.getppid()}-0.json')))
+        archive = metrics.read_json(os.path.join(self.directory, 'archive.json'))
+        self.assertEqual(archive['requests'], {'financial-status|GET|200': 3})
+        self.assertEqual(archive['in_flight'], {})
+
+    def test_forked_worker_has_a_file_of_its_own(self):
+        store = metrics.MetricsStore(self.directory, flush_interval=0)
+        store.request_finished('names', 'GET', 200, 0.01, 1, started=False)
+        parent = store.path
+        with mock.patch.object(os, 'getpid', return_value=os.getpid() + 100000):
+            store.request_finished('names', 'GET', 200, 0.01, 1, started=False)
+            self.assertNotEqual(store.path, parent)
+            self.assertEqual(store.metrics['requests'], {'names|GET|200': 1})
+        self.assertEqual(metrics.read_json(parent)['requests'], {'names|GET|200': 1})
+
+    def test_staff_only(self):
+        self.client.force_authenticate(User.objects.create_user('resident', password='password123'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0.0001)
+class SlowQueryTests(APITestCase):
+    """ Slow query capture with its EXPLAIN. """
+
+    @classmethod
+    def setUpClass(cls):
+        # Every query is slow, the savepoints of the test case too: the log
+        # would flood the output of the tests. assertLogs() still captures it.
+        silenced = mock.patch.multiple(
+            logging.getLogger('gestion_condominios.slow_queries'), handlers=[logging.NullHandler()], propagate=False,
+        )
+        silenced.start()
+        cls.addClassCleanup(silenced.stop)
+        super().setUpClass()
+
+    def setUp(self):
+        super().setUp()
+        slow_queries.slow_query_log.clear()
+        create_condominium('Los Olivos')
+
+    def test_fingerprint_ignores_parameters(self):
+        self.assertEqual(
+            slow_queries.fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s) LIMIT 21'),
+            slow_queries.fingerprint('SELECT * FROM t WHERE id IN (%s) LIMIT 5'),
+        )
+        self.assertNotEqual(
+            slow_queries.fingerprint('SELECT * FROM t WHERE id = %s'),
+            slow_queries.fingerprint('SELECT * FROM u WHERE id = %s'),
+        )
+
+    def test_slow_queries_are_ranked_with_their_plan(self):
+        with self.assertLogs('gestion_condominios.slow_queries', 'WARNING') as logs:
+            self.client.get(reverse('condominium-list'))
+            self.client.get(reverse('condominium-list'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'condominium-list (CondominiumListAPIView)')
+
+        data = self.client.get(reverse('slow-queries')).json()
+        self.assertTrue(data['enabled'])
+        totals = [stats['total_ms'] for stats in data['fingerprints']]
+        self.assertEqual(totals, sorted(totals, reverse=True))
+        condominiums = next(
+            stats for stats in data['fingerprints']
+            if stats['sql'].startswith('SELECT') and 'FROM "gestion_condominios_condominium"' in stats['sql']
+        )
+        self.assertEqual(condominiums['count'], 2)
+        # EXPLAIN ran once, on the SQLite test database.
+        self.assertTrue(condominiums['explain'])
+        self.assertEqual(len([query for query in data['recent'] if query['fingerprint'] == condominiums['fingerprint']]), 2)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_disabled(self):
+        self.client.get(reverse('condominium-list'))
+        data = self.client.get(reverse('slow-queries')).json()
+        self.assertEqual((data['enabled'], data['fingerprints'], data['recent']), (False, [], []))
+
+    def test_queries_of_other_threads_in_the_async_chain(self):
+        def count():
+            # A thread of its own, with a new connection (outside the transaction of the test).
+            try:
+                return Tombstone.objects.count()
+            finally:
+                connection.close()
+
+        async def get_response(request):
+            slow_queries.current_view.set('names (async)')
+            return HttpResponse(json.dumps(await sync_to_async(count, thread_sensitive=False)()))
+
+        middleware = SlowQueryMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        async_to_sync(middleware)(RequestFactory().get('/'))
+        views = [query['view'] for query in slow_queries.slow_query_log.recent]
+        self.assertEqual(views[-1], 'names (async)')
+        self.assertIsNone(slow_queries.current_view.get())
+
+    def test_limit_is_clamped(self):
+        self.client.get(reverse('condominium-list'))
+        response = self.client.get(reverse('slow-queries'), {'limit': -5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['fingerprints']), 1)
+
+
+@override_settings(SYNC_SAFETY_MARGIN=0)
+class SyncTests(APITestCase):
+    """ Delta sync of a condominium. """
+
+    def setUp(self):
+        super().setUp()
+        self.condominium = create_condominium('Los Olivos', size=2)
+        self.url = reverse('condominium-sync', args=[self.condominium.pk])
+
+    def test_full_sync(self):
+        data = self.client.get(self.url).json()
+        self.assertTrue(data['reset'])
+        self.assertEqual(data['condominium']['name_condominium'], 'Los Olivos')
+        self.assertEqual(
+            [len(data[kind]) for kind in ('financial_status', 'suggestions', 'priorities')], [2, 2, 2],
+        )
+        self.assertIn('id', data['financial_status'][0])
+
+    def test_delta_sync(self):
+        cursor = self.client.get(self.url).json()['cursor']
+        stat = FinancialStat.objects.filter(condominium_id=self.condominium).first()
+        stat.details = 'corrected'
+        stat.save()
+        comment = Comment.objects.filter(condominium_id=self.condominium).first()
+        comment_id = comment.pk
+        comment.delete()
+        priority = PriorityOrUpgrade.objects.create(condominium_id=self.condominium, name='roof', detail='leaks')
+
+        data = self.client.get(self.url, {'since': cursor}).json()
+        self.assertFalse(data['reset'])
+        self.assertIsNone(data['condominium'])
+        self.assertEqual([row['details'] for row in data['financial_status']], ['corrected'])
+        self.assertEqual(data['suggestions'], [])
+        self.assertEqual([row['id'] for row in data['priorities']], [priority.pk])
+        self.assertEqual(data['deleted'], {'financial_status': [], 'suggestions': [comment_id], 'priorities': []})
+
+        data = self.client.get(self.url, {'since': data['cursor']}).json()
+        self.assertEqual((data['financial_status'], data['deleted']['suggestions']), ([], []))
+
+    @override_settings(SYNC_SAFETY_MARGIN=60)
+    def test_safety_margin_sends_recent_rows_again(self):
+        cursor = self.client.get(self.url).json()['cursor']
+        data = self.client.get(self.url, {'since': cursor}).json()
+        self.assertFalse(data['reset'])
+        self.assertEqual(len(data['financial_status']), 2)
+
+    def test_old_and_invalid_cursors(self):
+        old = sync.encode_cursor(timezone.now() - timedelta(days=31))
+        self.assertTrue(self.client.get(self.url, {'since': old}).json()['reset'])
+        future = sync.encode_cursor(timezone.now() + timedelta(days=1))
+        for cursor in ('not-a-cursor', future):
+            self.assertEqual(self.client.get(self.url, {'since': cursor}).status_code, 400)
+
+    @override_settings(SYNC_SAFETY_MARGIN=30)
+    def test_clock_skew_within_the_margin(self):
+        ahead = timezone.now() + timedelta(seconds=10)
+        self.assertLessEqual(sync.decode_cursor(sync.encode_cursor(ahead)), timezone.now())
+        response = self.client.get(self.url, {'since': sync.encode_cursor(ahead)})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['reset'])
+        too_far = sync.encode_cursor(timezone.now() + timedelta(seconds=60))
+        self.assertEqual(self.client.get(self.url, {'since': too_far}).status_code, 400)
+
+    def test_purge_tombstones(self):
+        Comment.objects.filter(condominium_id=self.condominium).delete()
+        self.assertEqual(Tombstone.objects.count(), 2)
+        Tombstone.objects.filter(pk=Tombstone.objects.first().pk).update(deleted_at=timezone.now() - timedelta(days=31))
+        call_command('purge_tombstones', stdout=StringIO())
+        self.assertEqual(Tombstone.objects.count(), 1)
+
+
+class BatchTests(APITestCase):
+    """ Several requests in one round trip. """
+
+    def setUp(self):
+        super().setUp()
+        self.condominium = create_condominium('Los Olivos')
+
+    def batch(self, *requests):
+        return self.client.post(reverse('batch'), {'requests': list(requests)}, format='json')
+
+    def test_home_screen(self):
+        paths = [
+            reverse('list-names'), reverse('condominium', args=[self.condominium.pk]),
+            reverse('priority-or-update'), reverse('suggestions'),
+        ]
+        response = self.batch(*({'path': path} for path in paths))
+        self.assertEqual(response.status_code, 200)
+        responses = response.json()['responses']
+        self.assertEqual([entry['status'] for entry in responses], [200] * 4)
+        for path, entry in zip(paths, responses):
+            self.assertEqual(entry['body'], self.client.get(path).json())
+
+    def test_errors_are_per_request(self):
+        responses = self.batch(
+            {'path': 'missing/'},
+            {'method': 'POST', 'path': reverse('batch'), 'body': {'requests': []}},
+            {'path': f'condominium/{self.condominium.pk}/'},
+        ).json()['responses']
+        self.assertEqual([entry['status'] for entry in responses], [404, 400, 200])
+
+    def test_writes_are_read_by_the_next_requests(self):
+        responses = self.batch(
+            {'method': 'POST', 'path': reverse('suggestions'), 'body': {
+                'name_condominium': 'Los Olivos',
+                'condominium_suggestions': [{'owner_department': '101', 'comment_title': 'lights', 'comment': 'broken'}],
+            }},
+            {'path': reverse('condominium-suggestions', args=[self.condominium.pk]) + '?fields=comment_title'},
+        ).json()['responses']
+        self.assertEqual(responses[0]['status'], 201)
+        self.assertIn({'comment_title': 'lights'}, responses[1]['body']['results'])
+
+    def test_shares_the_user_of_the_batch(self):
+        self.client.force_authenticate(User.objects.create_user('resident', password='password123'))
+        responses = self.batch({'path': reverse('search') + '?q=noise'}, {'path': reverse('list-names')}).json()['responses']
+        self.assertEqual([entry['status'] for entry in responses], [403, 200])
+        self.client.force_authenticate(None)
+        self.assertEqual(self.batch({'path': reverse('list-names')}).status_code, 401)
+
+    def test_head_has_no_body(self):
+        paths = [reverse('condominium', args=[self.condominium.pk]), reverse('financial-status') + '?stream=true']
+        responses = self.batch(*({'method': 'HEAD', 'path': path} for path in paths)).json()['responses']
+        self.assertEqual([entry['status'] for entry in responses], [200, 200])
+        self.assertEqual([entry['body'] for entry in responses], [None, None])
+        self.assertTrue(responses[0]['headers']['Content-Type'].startswith('application/json'))
+
+    @override_settings(BATCH_MAX_REQUESTS=2)
+    def test_max_requests(self):
+        response = self.batch(*[{'path': reverse('list-names')}] * 3)
+        self.assertEqual(response.status_code, 400)
+
+
+class CompressionTests(APITestCase):
+    """ Negotiated compression and the compressed bytes of the response cache. """
+
+    def setUp(self):
+        super().setUp()
+        self.condominium = create_condominium('Los Olivos', size=30)
+
+    def test_gzip(self):
+        url = reverse('financial-status')
+        plain = self.client.get(url).getvalue()
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        compressed = response.getvalue()
+        self.assertLess(len(compressed), len(plain) / 4)
+        self.assertEqual(gzip.decompress(compressed), plain)
+
+    def test_negotiation_and_threshold(self):
+        url = reverse('financial-status')
+        self.assertFalse(self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0, identity').has_header('Content-Encoding'))
+        self.assertEqual(compression.accepted_encoding('br;q=0.5, gzip;q=0.8'), 'gzip')
+        self.assertEqual(compression.accepted_encoding('*'), 'br' if compression.brotli else 'gzip')
+        response = self.client.get(reverse('list-names'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    @override_settings(SHARED_CACHE=True)
+    def test_cached_responses_are_compressed_once(self):
+        url = reverse('condominium', args=[self.condominium.pk])
+        with mock.patch.object(compression, 'compress', wraps=compression.compress) as compress:
+            first = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+            second = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(first.content, second.content)
+        self.assertTrue(second['ETag'].startswith('W/"'))
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=second['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    @skipUnless(compression.brotli, 'brotli is not installed')
+    def test_brotli(self):
+        url = reverse('condominium', args=[self.condominium.pk])
+        plain = self.client.get(url).content
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.content), plain)
+
+
+class FinancialSeriesTests(APITestCase):
+    """ Filters, exact amounts and the time series of the financial status. """
+
+    def setUp(self):
+        super().setUp()
+        self.condominium = Condominium.objects.create(name_condominium='Los Olivos')
+        rows = [
+            ((2023, 1, 5), 'fee', '0.10', '0'), ((2023, 1, 20), 'fee', '0.20', '0'),
+            ((2023, 2, 1), 'water', '0', '15.50'), ((2024, 3, 9), 'fee', '100.00', '30.25'),
+        ]
+        with synthetic.explicit_created_at(FinancialStat):
+            for day, type_detail, income, expenses in rows:
+                moment = timezone.make_aware(datetime(*day, 12))
+                FinancialStat.objects.create(
+                    condominium_id=self.condominium, created_at=moment, updated_at=moment, type_detail=type_detail,
+                    income=Decimal(income), expenses=Decimal(expenses), details='row',
+                )
+        self.url = reverse('financial-status-series', args=[self.condominium.pk])
+
+    def test_monthly_series_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        # The condominium, then the series.
+        self.assertEqual(len(queries), 2)
+        self.assertIn('GROUP BY', queries[1]['sql'])
+        self.assertEqual(response.json(), [
+            {'period': '2023-01-01', 'total_income': 0.3, 'total_expenses': 0.0, 'balance': 0.3,
+             'average_income': 0.15, 'average_expenses': 0.0, 'row_count': 2},
+            {'period': '2023-02-01', 'total_income': 0.0, 'total_expenses': 15.5, 'balance': -15.5,
+             'average_income': 0.0, 'average_expenses': 15.5, 'row_count': 1},
+            {'period': '2024-03-01', 'total_income': 100.0, 'total_expenses': 30.25, 'balance': 69.75,
+             'average_income': 100.0, 'average_expenses': 30.25, 'row_count': 1},
+        ])
+        # The rollups are exact too.
+        self.assertEqual(FinancialSummary.objects.get(month='2023-01-01').total_income, Decimal('0.30'))
+
+    def test_buckets_and_filters(self):
+        years = self.client.get(self.url, {'bucket': 'year'}).json()
+        self.assertEqual([(row['period'], row['row_count']) for row in years], [('2023-01-01', 3), ('2024-01-01', 1)])
+        weeks = self.client.get(self.url, {'bucket': 'week', 'from': '2023-01-01', 'to': '2023-01-31'}).json()
+        self.assertEqual([row['period'] for row in weeks], ['2023-01-02', '2023-01-16'])
+        fees = self.client.get(self.url, {'bucket': 'year', 'type_detail': 'fee', 'to': '2023-12-31'}).json()
+        self.assertEqual([row['total_income'] for row in fees], [0.3])
+
+    def test_invalid_parameters(self):
+        missing = reverse('financial-status-series', args=[self.condominium.pk + 1])
+        self.assertEqual(self.client.get(missing).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'bucket': 'hour'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'from': '2024-01-01', 'to': '2023-01-01'}).status_code, 400)
+
+    def test_filtered_financial_status(self):
+        url = reverse('financial-status-retrive', args=[self.condominium.pk])
+        rows = self.client.get(url, {'type_detail': 'fee', 'from': '2023-01-10'}).json()['financial_status']
+        self.assertEqual([row['income'] for row in rows], [0.2, 100.0])
+        self.assertEqual(len(self.client.get(url).json()['financial_status']), 4)
@@ -1,20 +1,40 @@
 from django.contrib import admin
 from django.urls import path
 from .views import *
+from . import async_views
 
 urlpatterns = [
     path('', ShowAPI.as_view(), name='show-api'), # GET only
     path('login/', UserLoginAPIView.as_view(), name='login'), # POST only
     # path('register/', RegisterUserAPIView.as_view(), name='regsiter'), #POST only
     path('register-and-invite/', InviteAPIView.as_view(), name='invite_user'), # POST only
+    path('register-and-invite/bulk/', BulkInviteAPIView.as_view(), name='bulk_invite_users'), # POST only
     path('names-condominiums/', NamesCondominiumsAPIView.as_view(), name="list-names" ), # GET only
     path('condominium-list/', CondominiumListAPIView.as_view(), name="condominium-list"), # GET only
     path('condominium/<int:pk>/', CondominiumAPIView.as_view(), name="condominium"), # GET only
+    path('condominium/<int:pk>/financial-status/', CondominiumFinancialStatusListAPIView.as_view(), name="condominium-financial-status"), # GET only
+    path('condominium/<int:pk>/priority-or-upgrade/', CondominiumPriorityOrUpgradeListAPIView.as_view(), name="condominium-priority-or-upgrade"), # GET only
+    path('condominium/<int:pk>/priority-or-upgrade/board/', PriorityOrUpgradeBoardAPIView.as_view(), name="priority-or-upgrade-board"), # GET only
+    path('condominium/<int:pk>/sugestions/', CondominiumSuggestionsListAPIView.as_view(), name="condominium-suggestions"), # GET only
+    path('condominium/<int:pk>/sync/', CondominiumSyncAPIView.as_view(), name="condominium-sync"), # GET only
     path('condominium/priority-or-upgrade/', PostPriorityOrUpgradeAPIView.as_view(), name="priority-or-update"), # POST and GET only
     path('condominium/priority-or-upgrade/<int:pk>/', GetPriorityOrUpgradeAPIView.as_view(), name="get-priority-or-update"), # GET only
     path('condominium/sugestions/', SendSuggestionsAPIView.as_view(), name="suggestions"), # GET and POST only
     path('financial-status/', FinancialStatusListAPIView.as_view(), name="financial-status"), # POST and GET only
     path('financial-status/<int:pk>/', FinancialStatusRetriveAPIView.as_view(), name="financial-status-retrive"), # GET only
+    path('financial-status/<int:pk>/summary/', FinancialSummaryAPIView.as_view(), name="financial-status-summary"), # GET only
+    path('financial-status/<int:pk>/series/', FinancialSeriesAPIView.as_view(), name="financial-status-series"), # GET only
     path('update/<int:pk>/', UpdatePasswordAPIView.as_view(), name="update_password"),
+    path('search/', SearchAPIView.as_view(), name="search"), # GET only
+    path('batch/', BatchAPIView.as_view(), name="batch"), # POST only
+    path('metrics/', MetricsAPIView.as_view(), name="metrics"), # GET only
+    path('slow-queries/', SlowQueriesAPIView.as_view(), name="slow-queries"), # GET only
+    # Async versions for the ASGI server
+    path('async/login/', async_views.login, name='async-login'), # POST only
+    path('async/update/<int:pk>/', async_views.update_password, name='async-update-password'), # PUT and PATCH only
+    path('async/names-condominiums/', async_views.names_condominiums, name='async-list-names'), # GET only
+    path('async/condominium/<int:pk>/', async_views.condominium, name='async-condominium'), # GET only
+    path('async/condominium/priority-or-upgrade/<int:pk>/', async_views.priority_or_upgrade, name='async-get-priority-or-update'), # GET only
+    path('async/financial-status/<int:pk>/', async_views.financial_status, name='async-financial-status-retrive'), # GET only
 
 ]
\ No newline at end of file
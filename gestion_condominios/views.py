@@ -6,13 +6,16 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.models import User
 from django.template.loader import get_template
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max
+from django.http import HttpResponse
 
 # Django REST Framework
 from rest_framework import status, generics, mixins, viewsets
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.generics import RetrieveAPIView, ListAPIView, UpdateAPIView
 from rest_framework.renderers import JSONRenderer
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -20,6 +23,29 @@ from rest_framework.views import APIView
 # Serializers
 from .serializers import *
 
+# Pagination
+from .pagination import CreatedAtCursorPagination, OptionalCreatedAtCursorPagination
+
+# Mixins
+from .mixins import StreamingListModelMixin, ValuesListModelMixin
+from .sparse import SparseQuerysetMixin
+
+# Emails
+from .emails import queue_email
+
+# Response cache
+from .caching import CachedResponseMixin
+
+# Search, delta sync, batches and financial series
+from . import batch, search, series, sync
+
+# Metrics
+from .metrics import get_store, render_prometheus
+from .slow_queries import slow_query_log
+
+# Parsers
+from .parsers import CSVParser
+
 # Models
 from .models import *
 
@@ -38,15 +64,33 @@ class ShowAPI(APIView):
             'Endpoints': {
                 'https://cb9e26a7474b.ngrok.io/v1/login/',
                 'https://cb9e26a7474b.ngrok.io/v1/register-and-invite/',
+                'https://cb9e26a7474b.ngrok.io/v1/register-and-invite/bulk/',
                 'https://cb9e26a7474b.ngrok.io/v1/names-condominiums/',
                 'https://cb9e26a7474b.ngrok.io/v1/condominium-list/',
                 'https://cb9e26a7474b.ngrok.io/v1/condominium/<int:pk>/',
+                'https://cb9e26a7474b.ngrok.io/v1/condominium/<int:pk>/financial-status/',
+                'https://cb9e26a7474b.ngrok.io/v1/condominium/<int:pk>/priority-or-upgrade/',
+                'https://cb9e26a7474b.ngrok.io/v1/condominium/<int:pk>/priority-or-upgrade/board/',
+                'https://cb9e26a7474b.ngrok.io/v1/condominium/<int:pk>/sugestions/',
+                'https://cb9e26a7474b.ngrok.io/v1/condominium/<int:pk>/sync/',
                 'https://cb9e26a7474b.ngrok.io/v1/condominium/priority-or-upgrade/',
                 'https://cb9e26a7474b.ngrok.io/v1/condominium/priority-or-upgrade/<int:pk>/',
                 'https://cb9e26a7474b.ngrok.io/v1/condominium/sugestions/',
                 'https://cb9e26a7474b.ngrok.io/v1/financial-status/',
                 'https://cb9e26a7474b.ngrok.io/v1/financial-status/<int:pk>/',
+                'https://cb9e26a7474b.ngrok.io/v1/financial-status/<int:pk>/summary/',
+                'https://cb9e26a7474b.ngrok.io/v1/financial-status/<int:pk>/series/',
                 'https://cb9e26a7474b.ngrok.io/v1/update/<int:pk>/',
+                'https://cb9e26a7474b.ngrok.io/v1/search/',
+                'https://cb9e26a7474b.ngrok.io/v1/batch/',
+                'https://cb9e26a7474b.ngrok.io/v1/metrics/',
+                'https://cb9e26a7474b.ngrok.io/v1/slow-queries/',
+                'https://cb9e26a7474b.ngrok.io/v1/async/login/',
+                'https://cb9e26a7474b.ngrok.io/v1/async/update/<int:pk>/',
+                'https://cb9e26a7474b.ngrok.io/v1/async/names-condominiums/',
+                'https://cb9e26a7474b.ngrok.io/v1/async/condominium/<int:pk>/',
+                'https://cb9e26a7474b.ngrok.io/v1/async/condominium/priority-or-upgrade/<int:pk>/',
+                'https://cb9e26a7474b.ngrok.io/v1/async/financial-status/<int:pk>/',
             }
         }
         return Response(data, status=status.HTTP_200_OK)
@@ -70,21 +114,23 @@ class UserLoginAPIView(APIView):
         return Response(data, status=status.HTTP_200_OK)
 
 
-class CondominiumListAPIView(generics.GenericAPIView, mixins.ListModelMixin):
+class CondominiumListAPIView(SparseQuerysetMixin, generics.GenericAPIView, StreamingListModelMixin):
     renderer_classes = [JSONRenderer]
     permission_classes = [IsAuthenticated]
     queryset = Condominium.objects.all()
     serializer_class = CondominiumModelSerializer
+    pagination_class = OptionalCreatedAtCursorPagination
     
     def get(self, request):
         return self.list(request)
 
 
-class FinancialStatusListAPIView(generics.GenericAPIView, mixins.ListModelMixin, mixins.CreateModelMixin):
+class FinancialStatusListAPIView(SparseQuerysetMixin, generics.GenericAPIView, StreamingListModelMixin, mixins.CreateModelMixin):
     renderer_classes = [JSONRenderer]
     permission_classes = [IsAuthenticated]
     queryset = Condominium.objects.all()
     serializer_class = CondominiumStatusModelSerializer
+    pagination_class = OptionalCreatedAtCursorPagination
 
     def get(self, request):
         return self.list(request)
@@ -93,28 +139,39 @@ class FinancialStatusListAPIView(generics.GenericAPIView, mixins.ListModelMixin,
         return self.create(request, *args, **kwargs)
 
 
-class CondominiumAPIView(RetrieveAPIView):
+class CondominiumAPIView(CachedResponseMixin, SparseQuerysetMixin, RetrieveAPIView):
     renderer_classes = [JSONRenderer]
     permission_classes = [IsAuthenticated]
     queryset = Condominium.objects.all()
     serializer_class = CondominiumStatusModelSerializer
+    cache_scope = 'condominium'
+
+    def get_etag_parts(self):
+        return list(
+            Condominium.objects.filter(pk=self.kwargs['pk'])
+            .annotate(last_update=Max('financial_status__updated_at'), rows=Count('financial_status'))
+            .values_list('updated_at', 'last_update', 'rows')
+        )
 
 
-class NamesCondominiumsAPIView(generics.GenericAPIView, mixins.ListModelMixin):
+class NamesCondominiumsAPIView(CachedResponseMixin, SparseQuerysetMixin, StreamingListModelMixin, ListAPIView):
     renderer_classes = [JSONRenderer]
     permission_classes = [IsAuthenticated]
     queryset = Condominium.objects.all()
     serializer_class = NamesCondominiumsModelSerializer
+    pagination_class = OptionalCreatedAtCursorPagination
+    cache_scope = 'names'
 
-    def get(self, request):
-        return self.list(request)
+    def get_etag_parts(self):
+        return Condominium.objects.aggregate(Max('updated_at'), Count('id'))
 
 
-class PostPriorityOrUpgradeAPIView(generics.GenericAPIView, mixins.ListModelMixin, mixins.CreateModelMixin):
+class PostPriorityOrUpgradeAPIView(SparseQuerysetMixin, generics.GenericAPIView, StreamingListModelMixin, mixins.CreateModelMixin):
     renderer_classes = [JSONRenderer]
     permission_classes = [IsAuthenticated]
     queryset = Condominium.objects.all()
     serializer_class = CondominiumPriorityOrUpgradeModelSerializer
+    pagination_class = OptionalCreatedAtCursorPagination
 
     def get(self, request):
         return self.list(request)
@@ -123,25 +180,163 @@ class PostPriorityOrUpgradeAPIView(generics.GenericAPIView, mixins.ListModelMixi
         return self.create(request, *args, **kwargs)
 
 
-class GetPriorityOrUpgradeAPIView(RetrieveAPIView):
+class GetPriorityOrUpgradeAPIView(CachedResponseMixin, SparseQuerysetMixin, RetrieveAPIView):
     renderer_classes = [JSONRenderer]
     permission_classes = [IsAuthenticated]
     queryset = PriorityOrUpgrade.objects.all()
     serializer_class = GetPriorityOrUpgradeByPKModelSerializer
+    cache_scope = 'priority'
+
+    def get_etag_parts(self):
+        return list(
+            PriorityOrUpgrade.objects.filter(pk=self.kwargs['pk'])
+            .values_list('updated_at', 'condominium_id__updated_at')
+        )
+
 
+class FinancialStatusRetriveAPIView(SparseQuerysetMixin, RetrieveAPIView):
+    """
+    Condominium with its financial status.
 
-class FinancialStatusRetriveAPIView(RetrieveAPIView):
+    Query parameters: optional `from` and `to` dates (included) and `type_detail`.
+    """
     renderer_classes = [JSONRenderer]
     permission_classes = [IsAuthenticated]
     queryset = Condominium.objects.all()
     serializer_class = CondominiumStatusModelSerializer
 
+    def get_nested_filters(self):
+        query = FinancialFilterSerializer(data=self.request.query_params)
+        query.is_valid(raise_exception=True)
+        return {'financial_status': lambda queryset: series.filter_financial_status(queryset, **query.validated_data)}
+
+
+class FinancialSummaryAPIView(SparseQuerysetMixin, ValuesListModelMixin, ListAPIView):
+    """ Monthly totals of the financial status of a condominium. """
+    renderer_classes = [JSONRenderer]
+    permission_classes = [IsAuthenticated]
+    queryset = FinancialSummary.objects.all()
+    serializer_class = FinancialSummaryModelSerializer
+
+    def get_queryset(self):
+        return super().get_queryset().filter(condominium_id=self.kwargs['pk']).order_by('month')
+
+
+class FinancialSeriesAPIView(APIView):
+    """
+    Totals and averages of the financial status of a condominium by period, in one GROUP BY query.
+
+    Query parameters: `bucket` (day, week, month or year, month by
+    default), optional `from` and `to` dates (included) and `type_detail`.
+    """
+    renderer_classes = [JSONRenderer]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        """ Handle HTTP Get request. """
+        condominium = get_object_or_404(Condominium, pk=pk)
+        query = FinancialSeriesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        rows = series.series(condominium.pk, **query.validated_data)
+        return Response(FinancialSeriesSerializer(rows, many=True).data, status=status.HTTP_200_OK)
+
+
+class CondominiumFinancialStatusListAPIView(SparseQuerysetMixin, ValuesListModelMixin, ListAPIView):
+    """ Paginated financial status of a condominium. """
+    renderer_classes = [JSONRenderer]
+    permission_classes = [IsAuthenticated]
+    queryset = FinancialStat.objects.all()
+    serializer_class = FinancialStatusModelSerializer
+    pagination_class = CreatedAtCursorPagination
+
+    def get_queryset(self):
+        return super().get_queryset().filter(condominium_id=self.kwargs['pk'])
+
+
+class CondominiumPriorityOrUpgradeListAPIView(SparseQuerysetMixin, ValuesListModelMixin, ListAPIView):
+    """ Paginated priorities and upgrades of a condominium. """
+    renderer_classes = [JSONRenderer]
+    permission_classes = [IsAuthenticated]
+    queryset = PriorityOrUpgrade.objects.all()
+    serializer_class = PriorityOrUpgradeModelSerializer
+    pagination_class = CreatedAtCursorPagination
+
+    def get_queryset(self):
+        return super().get_queryset().filter(condominium_id=self.kwargs['pk'])
+
+
+class CondominiumSyncAPIView(APIView):
+    """
+    Rows of a condominium created, updated or deleted since the previous sync, see `sync`.
+
+    Query parameters: optional `since`, the `cursor` of the previous sync.
+    """
+    renderer_classes = [JSONRenderer]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        """ Handle HTTP Get request. """
+        condominium = get_object_or_404(Condominium.objects.only('name_condominium', 'updated_at'), pk=pk)
+        since = request.query_params.get('since')
+        try:
+            since = sync.decode_cursor(since) if since else None
+        except sync.InvalidCursor as error:
+            return Response({'since': [str(error)]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(sync.changes(condominium, since, context={'request': request}), status=status.HTTP_200_OK)
+
+
+class PriorityOrUpgradeBoardAPIView(APIView):
+    """
+    Kanban board of the priorities and upgrades of a condominium.
+
+    Returns the count of every column and its `limit` (default 10) newest
+    items, with a fixed number of queries whatever the size of the backlog.
+    `kind` filters the board by kind (priority, upgrade, both, none).
+    """
+    renderer_classes = [JSONRenderer]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        """ Handle HTTP Get request. """
+        items = PriorityOrUpgrade.objects.filter(condominium_id=pk)
+        kind = request.query_params.get('kind')
+        if kind:
+            items = items.filter(kind=kind)
+        try:
+            limit = max(0, min(int(request.query_params.get('limit', 10)), 100))
+        except ValueError:
+            return Response({'limit': ['A valid integer is required.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        counts = dict(items.order_by().values_list('status').annotate(Count('id')))
+        columns = []
+        for value, label in PriorityOrUpgrade.STATUS_CHOICES:
+            top = items.filter(status=value).order_by('-created_at', '-id')[:limit] if counts.get(value) else []
+            columns.append({
+                'status': value,
+                'count': counts.get(value, 0),
+                'items': PriorityOrUpgradeModelSerializer(top, many=True).data,
+            })
+        return Response({'condominium_id': pk, 'columns': columns}, status=status.HTTP_200_OK)
+
+
+class CondominiumSuggestionsListAPIView(SparseQuerysetMixin, ValuesListModelMixin, ListAPIView):
+    """ Paginated suggestions of a condominium. """
+    renderer_classes = [JSONRenderer]
+    permission_classes = [IsAuthenticated]
+    queryset = Comment.objects.all()
+    serializer_class = SuggestionsModelSerializer
+    pagination_class = CreatedAtCursorPagination
+
+    def get_queryset(self):
+        return super().get_queryset().filter(condominium_id=self.kwargs['pk'])
+
 
-class SendSuggestionsAPIView(generics.GenericAPIView, mixins.ListModelMixin, mixins.CreateModelMixin):
+class SendSuggestionsAPIView(SparseQuerysetMixin, generics.GenericAPIView, StreamingListModelMixin, mixins.CreateModelMixin):
     renderer_classes = [JSONRenderer]
     permission_classes = [IsAuthenticated]
     queryset = Condominium.objects.all()
     serializer_class = CondominiumSuggestionModelSerializer
+    pagination_class = OptionalCreatedAtCursorPagination
 
     def get(self, request):
         return self.list(request)
@@ -168,19 +363,6 @@ class UpdatePasswordAPIView(generics.UpdateAPIView):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-def create_email(email, subject, template_path, context):
-    template = get_template(template_path)
-    content = template.render(context)
-    mail = EmailMultiAlternatives(
-        subject=subject,
-        body='',
-        from_email=settings.EMAIL_HOST_USER,
-        to=[email]
-    )
-    mail.attach_alternative(content, 'text/html')
-    return mail
-
-
 class InviteAPIView(APIView):
     """
     Invitation sent by an administrator to an user.
@@ -188,8 +370,9 @@ class InviteAPIView(APIView):
     renderer_classes = [JSONRenderer]
     permission_classes = [IsAdminUser]
 
+    @transaction.atomic
     def post(self, request):
-        """ Create an email to invite the new user. """
+        """ Create the user and queue an email to invite them. """
         data_user = User.objects.create(
             username = request.data['username'],
             email    = request.data['email'],
@@ -201,29 +384,35 @@ class InviteAPIView(APIView):
         data_user_password.save()
         
         data_condominium = Condominium.objects.get(name_condominium=request.data['name_condominium'])
-        data_department = Department.objects.create(
-            condominium_id = data_condominium,
-            department_number = request.data['number_department'],
-            department_block = request.data['number_block'],
-            number_habitants = request.data['number_habitants'],
-            department_owner = request.data['name_owner']
-        )
-        data_department.save()
+        try:
+            with transaction.atomic():
+                data_department = Department.objects.create(
+                    condominium_id = data_condominium,
+                    department_number = request.data['number_department'],
+                    department_block = request.data['number_block'],
+                    number_habitants = request.data['number_habitants'],
+                    department_owner = request.data['name_owner']
+                )
+        except IntegrityError:
+            # Without the user created above.
+            transaction.set_rollback(True)
+            return Response(
+                {'number_department': ['This department already exists in the block.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        user_data = User.objects.get(username=request.data['username'])
-        department_data = Department.objects.get(department_owner=request.data['name_owner'])
         data_profile = ProfileHabitant.objects.create(
-            user = user_data,
+            user = data_user_password,
             p_number = request.data['p_number'],
             p_number_emergency = request.data['p_number_emergency'],
-            department_id =department_data
+            department_id = data_department
         )
         data_profile.save()
         user_serializer = UserBaseModelSerializer(data_user)
         department_serializer = DepartmentModelSerializer(data_department)
         profile_serializer = ProfileUserModelSerializer(data_profile)
         condominium_name = BaseCondominiumModelSerializer(data_condominium)
-        invitation_email = create_email(
+        queue_email(
             request.data['email'],
             'Invitación para unirse al condominio',
             'verify_account.html',
@@ -232,12 +421,153 @@ class InviteAPIView(APIView):
                 'password': request.data['password'],
             },
         )
-        invitation_email.send(fail_silently=False)
         final_data = {
-            "message": "Email sent succesfully",
+            "message": "Email queued succesfully",
             "user" : user_serializer.data,
             "profile": profile_serializer.data,
             "department": department_serializer.data,
             "condominium": condominium_name.data
         }
-        return Response(final_data, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        return Response(final_data, status=status.HTTP_201_CREATED)
+
+
+class BulkInviteAPIView(APIView):
+    """
+    Onboard many residents of a condominium at once.
+
+    Takes a JSON object `{"name_condominium": ..., "residents": [...]}`, a
+    JSON array of residents or a CSV with a header row; for the last two the
+    condominium is sent in the `name_condominium` query parameter.
+    """
+    renderer_classes = [JSONRenderer]
+    parser_classes = [JSONParser, CSVParser]
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        """ Create the residents and queue their invitations. """
+        data = request.data
+        if isinstance(data, list):
+            data = {
+                'name_condominium': request.query_params.get('name_condominium'),
+                'residents': data,
+            }
+        serializer = BulkInvitationSerializer(data=data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        users = serializer.save()
+        final_data = {
+            "message": "Emails queued succesfully",
+            "users": UserBaseModelSerializer(users, many=True).data,
+        }
+        return Response(final_data, status=status.HTTP_201_CREATED)
+
+
+
+class SearchAPIView(APIView):
+    """
+    Full-text search over the suggestions and the priorities of every condominium.
+
+    Query parameters: `q`, optional `kind` (comment or priority),
+    `condominium` (pk) and `limit`.
+    """
+    renderer_classes = [JSONRenderer]
+    permission_classes = [IsAdminUser]
+    kinds = {
+        SearchPosting.COMMENT: (Comment, SuggestionsModelSerializer),
+        SearchPosting.PRIORITY: (PriorityOrUpgrade, PriorityOrUpgradeModelSerializer),
+    }
+
+    def get(self, request):
+        """ Handle HTTP Get request. """
+        query = request.query_params.get('q', '').strip()
+        kind = request.query_params.get('kind')
+        if not query:
+            return Response({'q': ['This field is required.']}, status=status.HTTP_400_BAD_REQUEST)
+        if kind and kind not in self.kinds:
+            return Response({'kind': [f'Must be one of: {", ".join(self.kinds)}.']}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), 100))
+            condominium_id = int(request.query_params.get('condominium', 0)) or None
+        except ValueError:
+            return Response({'detail': '`limit` and `condominium` must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        ranked = search.search(query, kind=kind, condominium_id=condominium_id, limit=limit)
+        objects = {
+            name: model.objects.select_related('condominium_id').in_bulk(
+                [object_id for result_kind, object_id, score in ranked if result_kind == name]
+            )
+            for name, (model, serializer) in self.kinds.items()
+        }
+        results = []
+        for result_kind, object_id, score in ranked:
+            instance = objects[result_kind].get(object_id)
+            if instance is None:
+                continue
+            results.append({
+                'kind': result_kind,
+                'id': object_id,
+                'score': round(score, 4),
+                'condominium_data': {
+                    'id': instance.condominium_id_id,
+                    'name_condominium': instance.condominium_id.name_condominium,
+                },
+                'data': self.kinds[result_kind][1](instance).data,
+            })
+        return Response(results, status=status.HTTP_200_OK)
+
+
+class BatchAPIView(APIView):
+    """
+    Several requests to the API in one round trip, see `batch`.
+
+    Body: `requests`, a list of `method`, `path` (with its query string) and
+    optional JSON `body`. The response has the `status`, some `headers` and
+    the `body` of every request, in order.
+    """
+    renderer_classes = [JSONRenderer]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """ Handle HTTP Post request. """
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return HttpResponse(batch.run(request, serializer.validated_data['requests']), content_type='application/json')
+
+
+class MetricsAPIView(APIView):
+    """
+    Request metrics of every worker process in the Prometheus text format.
+
+    Staff only: Prometheus sends the DRF token of a staff user, see `metrics`.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """ Handle HTTP Get request. """
+        return HttpResponse(
+            render_prometheus(get_store().collect()),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
+
+
+class SlowQueriesAPIView(APIView):
+    """
+    Slow query fingerprints of the process ranked by total time, with their plan, staff only.
+
+    Query parameters: optional `limit` of fingerprints.
+    """
+    renderer_classes = [JSONRenderer]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """ Handle HTTP Get request. """
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), 100))
+        except ValueError:
+            return Response({'detail': '`limit` must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        data = {
+            'enabled': bool(settings.SLOW_QUERY_THRESHOLD_MS),
+            'threshold_ms': settings.SLOW_QUERY_THRESHOLD_MS,
+            'fingerprints': slow_query_log.top(limit),
+            'recent': list(slow_query_log.recent),
+        }
+        return Response(data, status=status.HTTP_200_OK)